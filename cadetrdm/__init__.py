@@ -5,6 +5,6 @@ from cadetrdm.options import Options
 from cadetrdm.repositories import ProjectRepo, JupyterInterfaceRepo
 from cadetrdm.initialize_repo import initialize_repo
 from cadetrdm.environment import Environment
-from cadetrdm.batch_running import Study, Case
+from cadetrdm.batch_running import Study, Case, CaseBatch, CaseResult
 from cadetrdm.wrapper import tracks_results
 from cadetrdm.tools.process_example import process_example
@@ -1,2 +1,3 @@
 from .study import Study
 from .case import Case
+from .case_batch import CaseBatch, CaseResult
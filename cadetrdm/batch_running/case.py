@@ -4,14 +4,15 @@ import os
 import traceback
 import warnings
 from pathlib import Path
-import subprocess
 from typing import Any
 
 # from cadetrdm.container.containerAdapter import ContainerAdapter
 from cadetrdm.batch_running import Study
-from cadetrdm.repositories import ProjectRepo
+from cadetrdm.cache import LazyResults
+from cadetrdm.repositories import ProjectRepo, fetch_once
 from cadetrdm import Options
 from cadetrdm.environment import Environment
+from cadetrdm.environment_snapshot import get_current_environment
 
 
 class Case:
@@ -125,17 +126,30 @@ class Case:
         """
         Run specified study commands in the given repository.
 
+        The project repository is fetched at most once, no matter how often results are
+        looked up while running.
+
         :returns
             Return path to results for this case if available (either
            pre-computed or newly computed), else return None.
         """
+        with fetch_once():
+            return self._run_study(force, container_adapter, command, **load_kwargs)
+
+    def _run_study(
+        self,
+        force: bool = False,
+        container_adapter: "ContainerAdapter" | None = None,
+        command: str | None = None,
+        **load_kwargs: Any,
+    ) -> Path | None:
         if not force and self.is_running:
             print(f"{self.project_repo.name} is currently running. Skipping...")
             return False
 
         print(f"Running {self.name} in {self.project_repo.path} with: {self.options}")
         if not self.options.debug:
-            self.project_repo.update()
+            self.project_repo.update(max_age=max_age)
         else:
             print("WARNING: Not updating the repositories while in debug mode.")
 
@@ -183,16 +197,16 @@ class Case:
         )
 
     @property
-    def current_environment(self):
-        if self._current_environment is None:
-            existing_environment = subprocess.check_output(
-                f"conda env export", shell=True
-            ).decode()
-            self._current_environment = Environment.from_yml_string(
-                existing_environment
-            )
+    def current_environment(self) -> Environment:
+        """
+        Environment of the running interpreter.
 
-        return self._current_environment
+        Shared by all cases of the process and only probed again once packages were
+        installed or removed, see get_current_environment.
+        """
+        if self._current_environment is not None:
+            return self._current_environment
+        return get_current_environment()
 
     @property
     def has_results_for_this_run(self):
@@ -224,46 +238,55 @@ class Case:
         """
         options_hash = self.options_hash
         commit_hash = self.project_repo.current_commit_hash
-        log_entries = self.output_repo.output_log.entries
+        log_index = self.output_repo.output_log_index
 
-        for output_repo_branch, entry in reversed(log_entries.items()):
-            environment_ok = entry.fulfils_environment(self.environment)
+        # Only branches recorded with acceptable hashes are considered, most recent first.
+        candidates = log_index.candidates(
+            options_hash,
+            commit_hash,
+            allow_commit_hash_mismatch=allow_commit_hash_mismatch,
+            allow_options_hash_mismatch=allow_options_hash_mismatch,
+        )
 
-            # Exact match (all properties match)
-            if (
-                entry.options_hash == options_hash
-                and entry.project_repo_commit_hash == commit_hash
-                and environment_ok
-            ):
-                return output_repo_branch
+        # Recorded environments are only read if there are requirements to check against.
+        if self.environment is not None and candidates:
+            log_entries = self.output_repo.columnar_output_log.entries
+
+        for output_repo_branch in candidates:
+            if self.environment is None:
+                environment_ok = True
+            else:
+                environment_ok = log_entries[output_repo_branch].fulfils_environment(self.environment)
 
             # Check environment
             if not allow_environment_mismatch and not environment_ok:
                 continue
 
-            # Check study hash
-            if entry.project_repo_commit_hash != commit_hash and not allow_commit_hash_mismatch:
-                continue
+            entry_options_hash, entry_commit_hash = log_index.hashes(output_repo_branch)
 
-            # Check options hash
-            if entry.options_hash != options_hash and not allow_options_hash_mismatch:
-                continue
+            # Exact match (all properties match)
+            if (
+                entry_options_hash == options_hash
+                and entry_commit_hash == commit_hash
+                and environment_ok
+            ):
+                return output_repo_branch
 
             # Semi-correct match (at least one mismatch, but allowed)
             msg_parts = []
-            if entry.options_hash != options_hash:
+            if entry_options_hash != options_hash:
                 msg_parts.append(
                     "mismatched options hash "
                     f"(needs: {options_hash[:7]}, "
-                    f"has: {entry.options_hash[:7]})"
+                    f"has: {entry_options_hash[:7]})"
                 )
-            if entry.project_repo_commit_hash != commit_hash:
+            if entry_commit_hash != commit_hash:
                 msg_parts.append(
                     "mismatched project repo hash "
                     f"(needs: {commit_hash[:7]}, "
-                    f"has: {entry.project_repo_commit_hash[:7]})"
+                    f"has: {entry_commit_hash[:7]})"
                 )
-            if not entry.fulfils_environment(self.environment):
+            if not environment_ok:
                 msg_parts.append("mismatched environment")
 
             if msg_parts:
@@ -282,7 +305,9 @@ class Case:
         allow_commit_hash_mismatch: bool = False,
         allow_options_hash_mismatch: bool = False,
         allow_environment_mismatch: bool = False,
-    ) -> Path | None:
+        lazy: bool = False,
+        max_age: float | None = None,
+    ) -> Path | LazyResults | None:
         """
         Load results for the current case.
 
@@ -290,12 +315,14 @@ class Case:
             allow_commit_hash_mismatch: If True, allow loading results with mismatched study commit hash.
             allow_options_hash_mismatch: If True, allow loading results with mismatched options hash.
             allow_environment_mismatch: If True, allow loading results with mismatched environment.
+            lazy: If True, return a handle that only copies result files into the cache when accessed.
+            max_age: Maximum age in seconds of a previous fetch of the project repository to reuse.
 
         Returns:
             Path to results.
         """
         if not self.options.debug:
-            self.project_repo.update()
+            self.project_repo.update(max_age=max_age)
         else:
             print("WARNING: Not updating the repositories while in debug mode.")
 
@@ -316,7 +343,7 @@ class Case:
             return
 
         # Load results if the path exists, otherwise fetch them
-        results_path = self.project_repo.copy_data_to_cache(results_branch)
+        results_path = self.project_repo.copy_data_to_cache(results_branch, lazy=lazy)
         if not results_path.exists():
             print("Failed to fetch results.")
             return
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+from cadetrdm import Options
+from cadetrdm.batch_running.case import Case
+from cadetrdm.repositories import ProjectRepo, fetch_once, worktree_mode
+
+
+@dataclass
+class CaseResult:
+    """
+    Outcome of running a single Case as part of a CaseBatch.
+
+    :param case:
+        The Case that was run.
+    :param status:
+        One of "skipped" (results already existed), "finished" or "failed".
+    :param results_path:
+        Path to the cached results, if available.
+    :param duration:
+        Wall time in seconds spent running the case. 0 for skipped cases and cases that raised.
+    :param error:
+        Error message if the case failed.
+    """
+    case: Case
+    status: str
+    results_path: Path | None = None
+    duration: float = 0.0
+    error: str | None = None
+
+
+def _timed(function, *args) -> float:
+    """Call a function and return the wall time it took in seconds."""
+    start_time = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start_time
+
+
+def _run_case_in_thread(run_function, options: Options, project_repo_path: str, use_worktrees: bool) -> None:
+    """Run one case in a worker thread, recording results in the given worktree mode."""
+    with worktree_mode(use_worktrees):
+        run_function(options, project_repo_path)
+
+
+def _run_case_in_process(
+    project_repo_path: str,
+    package_dir: str | None,
+    run_method: str,
+    options: Options,
+    use_worktrees: bool,
+) -> None:
+    """Import the project module in a worker process and run one case."""
+    with worktree_mode(use_worktrees):
+        project_repo = ProjectRepo(project_repo_path, package_dir=package_dir)
+        run_function = getattr(project_repo.module, run_method)
+        run_function(options, project_repo_path)
+
+
+def _run_case_in_container(case: Case, container_adapter, command: str | None, use_worktrees: bool) -> None:
+    """Run one case through a container adapter, using a separate ProjectRepo instance."""
+    project_repo = ProjectRepo(
+        case.project_repo.path, package_dir=case.project_repo._package_dir, use_worktrees=use_worktrees
+    )
+    case = Case(
+        project_repo=project_repo,
+        options=case.options,
+        environment=case.environment,
+        name=case.name,
+        run_method=case.run_method,
+    )
+    log, return_code = container_adapter.run_case(case, command=command)
+    if return_code != 0:
+        raise RuntimeError(f"Container run of {case.name} failed with return code {return_code}.")
+
+
+class CaseBatch:
+    def __init__(
+        self,
+        cases: Iterable[Case],
+        max_workers: int | None = None,
+        executor: str = "thread",
+        container_adapter: "ContainerAdapter" | None = None,
+        command: str | None = None,
+        force: bool = False,
+    ) -> None:
+        """
+        Run a batch of cases concurrently.
+
+        Cases that already have results are skipped. The remaining cases are run on a
+        thread or process pool, or through a container adapter. While more than one case
+        runs at a time, results are recorded using worktrees of the output repository,
+        so that concurrent runs do not share a working tree.
+
+        :param cases:
+            Cases to run.
+        :param max_workers:
+            Maximum number of cases to run at the same time. Defaults to the number of CPUs.
+        :param executor:
+            "thread" or "process". Runs through a container adapter always use threads,
+            as the work is done in the containers.
+        :param container_adapter:
+            Optional container adapter used to run the cases.
+        :param command:
+            Optional command handed to the container adapter.
+        :param force:
+            If True, run cases even if results already exist.
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor {executor}. Please use 'thread' or 'process'.")
+
+        self.cases = list(cases)
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.executor = executor
+        self.container_adapter = container_adapter
+        self.command = command
+        self.force = force
+
+    def __len__(self):
+        return len(self.cases)
+
+    def run(self, **load_kwargs: Any) -> list[CaseResult]:
+        """
+        Run all cases that do not have results yet.
+
+        Each project repository is fetched from its remote only once per batch.
+
+        :param load_kwargs:
+            Additional kwargs handed to Case.load when looking up existing results.
+        :return:
+            One CaseResult per case, in the order of the cases.
+        """
+        with fetch_once():
+            return self._run(**load_kwargs)
+
+    def _run(self, **load_kwargs: Any) -> list[CaseResult]:
+        results: dict[int, CaseResult] = {}
+        pending: list[int] = []
+
+        if not self.force:
+            self._fetch_results_branches(**load_kwargs)
+
+        for index, case in enumerate(self.cases):
+            results_path = None if self.force else case.load(**load_kwargs)
+            if results_path:
+                results[index] = CaseResult(case, "skipped", results_path=results_path)
+            elif self.container_adapter is None and case.can_run_study is False:
+                results[index] = CaseResult(
+                    case, "failed", error="Current environment does not match required environment."
+                )
+            else:
+                pending.append(index)
+
+        if pending:
+            print(f"Running {len(pending)} of {len(self.cases)} cases with {self.max_workers} workers.")
+            # Concurrent runs each record their results in their own worktree.
+            use_worktrees = self.max_workers > 1 and len(pending) > 1
+            results.update(self._run_pending(pending, use_worktrees, **load_kwargs))
+
+        return [results[index] for index in range(len(self.cases))]
+
+    def _fetch_results_branches(self, **load_kwargs: Any) -> None:
+        """Fetch the existing results of all cases with one fetch per output repository."""
+        match_kwargs = {key: value for key, value in load_kwargs.items() if key not in ("lazy", "max_age")}
+        branches_by_repo = {}
+        for case in self.cases:
+            results_branch = case._get_results_branch(**match_kwargs)
+            if results_branch is not None:
+                output_repo = case.project_repo.output_repo
+                branches_by_repo.setdefault(output_repo.path, (output_repo, set()))[1].add(results_branch)
+
+        for output_repo, branch_names in branches_by_repo.values():
+            output_repo.fetch_branches(branch_names)
+
+    def _run_pending(self, pending: list[int], use_worktrees: bool, **load_kwargs: Any) -> dict[int, CaseResult]:
+        """Run the given cases on a pool and look up their results once they finish."""
+        if self.executor == "process" and self.container_adapter is None:
+            # Workers are spawned, so they do not inherit the git processes held by this process.
+            pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        results = {}
+        with pool:
+            futures: dict[Future, int] = {}
+            for index in pending:
+                try:
+                    futures[self._submit(pool, self.cases[index], use_worktrees)] = index
+                except Exception as e:
+                    traceback.print_exc()
+                    results[index] = CaseResult(self.cases[index], "failed", error=repr(e))
+
+            # Results are looked up in this thread, so the cases' repositories are never used concurrently.
+            for future in as_completed(futures):
+                index = futures[future]
+                case = self.cases[index]
+                try:
+                    duration = future.result()
+                except Exception as e:
+                    traceback.print_exception(type(e), e, e.__traceback__)
+                    results[index] = CaseResult(case, "failed", error=repr(e))
+                    continue
+
+                results_path = case.load(**load_kwargs)
+                if results_path is None:
+                    results[index] = CaseResult(
+                        case, "failed", duration=duration, error="No results were recorded."
+                    )
+                else:
+                    results[index] = CaseResult(case, "finished", results_path=results_path, duration=duration)
+
+        return results
+
+    def _submit(self, pool, case: Case, use_worktrees: bool) -> Future:
+        print(f"Running {case.name} in {case.project_repo.path} with: {case.options}")
+        if self.container_adapter is not None:
+            return pool.submit(
+                _timed, _run_case_in_container, case, self.container_adapter, self.command, use_worktrees
+            )
+
+        if isinstance(pool, ProcessPoolExecutor):
+            return pool.submit(
+                _timed,
+                _run_case_in_process,
+                str(case.project_repo.path),
+                case.project_repo._package_dir,
+                case.run_method,
+                case.options,
+                use_worktrees,
+            )
+
+        # Importing the module changes the working directory, so it is done before submitting.
+        run_function = getattr(case.project_repo.module, case.run_method)
+        return pool.submit(
+            _timed, _run_case_in_thread, run_function, case.options, str(case.project_repo.path), use_worktrees
+        )
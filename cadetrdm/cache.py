@@ -0,0 +1,605 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from stat import S_IREAD, S_IWRITE
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import git
+
+from cadetrdm.io_utils import delete_path
+
+if TYPE_CHECKING:
+    from cadetrdm.repositories import OutputRepo
+
+
+_LFS_POINTER_PREFIX = b"version https://git-lfs.github.com/spec/"
+_LFS_POINTER_MAX_SIZE = 1024
+
+_SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(size: str | int) -> int:
+    """
+    Parse a size in bytes with an optional binary unit suffix, e.g. "500M" or "10G".
+
+    :param size:
+        Size as an int or a string.
+    :return:
+        Size in bytes.
+    """
+    if isinstance(size, int):
+        return size
+    size = size.strip().upper().removesuffix("IB").removesuffix("B")
+    unit = size[-1] if size and size[-1] in _SIZE_UNITS else ""
+    number = size[: len(size) - len(unit)]
+    try:
+        return int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Could not parse size {size}. Please use e.g. 500M or 10G.")
+
+
+def format_size(size: int) -> str:
+    """Format a size in bytes with a binary unit suffix."""
+    for unit in ["B", "K", "M", "G"]:
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+def _matches_any(path: str, paths: Iterable[str]) -> bool:
+    """True if path is one of the given paths or lies in one of them."""
+    for requested in paths:
+        requested = requested.strip("/")
+        if requested in ("", ".") or path == requested or path.startswith(requested + "/"):
+            return True
+    return False
+
+
+@dataclass
+class CachedBranch:
+    """
+    A branch directory in the results cache.
+
+    :param name:
+        Name of the cache directory, i.e. the branch name with "/" replaced by "_".
+    :param path:
+        Path to the cache directory.
+    :param last_access:
+        Time the branch was last cached or loaded.
+    :param size:
+        Size of the files of the branch in bytes, including files shared with other branches.
+    """
+    name: str
+    path: Path
+    last_access: datetime
+    size: int
+
+
+class ResultsCache:
+    def __init__(self, path: str | Path, output_repo: OutputRepo, max_size: int | str | None = None):
+        """
+        Content-addressed cache of output repository branches.
+
+        Every file is stored once in an object store keyed by its git blob hash. The
+        directory of a cached branch only holds hardlinks into that store (or copies, if
+        the file system does not support hardlinks), so the size of the cache scales with
+        the unique content of all cached branches, and caching a branch whose files are
+        already known does not read them from git again.
+
+        :param path:
+            Root directory of the cache, i.e. the <output>_cached directory.
+        :param output_repo:
+            Output repository the cached branches are read from.
+        :param max_size:
+            Optional budget for the size of the cache in bytes, or a string like "10G".
+            If set, least recently used branches are evicted by prune().
+        """
+        self.path = Path(path)
+        self.output_repo = output_repo
+        self.max_size = parse_size(max_size) if max_size is not None else None
+
+    @property
+    def objects_path(self) -> Path:
+        return self.path / ".objects"
+
+    def object_path(self, blob_hash: str) -> Path:
+        """Path of a blob in the object store."""
+        return self.objects_path / blob_hash[:2] / blob_hash[2:]
+
+    def list_files(self, ref: str) -> Iterator[tuple[str, str, str]]:
+        """
+        List the files of a ref without checking it out.
+
+        :param ref:
+            Branch, ref or commit of the output repository.
+        :return:
+            Iterator over tuples of (mode, blob hash, path). Submodules are skipped.
+        """
+        tree_listing = self.output_repo._git.ls_tree("-r", "-z", "--full-tree", ref)
+        for line in tree_listing.split("\0"):
+            if not line:
+                continue
+            info, path = line.split("\t", 1)
+            mode, object_type, blob_hash = info.split(" ")
+            if object_type != "blob":
+                continue
+            yield mode, blob_hash, path
+
+    def materialize(
+        self,
+        ref: str,
+        target_folder: str | Path,
+        paths: Iterable[str] | None = None,
+        files: list[tuple[str, str, str]] | None = None,
+    ) -> list[str]:
+        """
+        Populate a directory with the files of a ref.
+
+        Blobs missing from the object store are read from git in a single batch, applying
+        filters such as git-lfs, and added to the store. Files are linked into the target
+        directory and are read-only. Files that already exist in the directory are skipped.
+
+        :param ref:
+            Branch, ref or commit of the output repository.
+        :param target_folder:
+            Existing directory to populate.
+        :param paths:
+            Optional paths of files or directories to populate. Defaults to all files.
+        :param files:
+            Optional listing of the ref as returned by list_files, to avoid listing it again.
+        :return:
+            Paths of the files that were added to the directory.
+        """
+        target_folder = Path(target_folder)
+        if files is None:
+            files = list(self.list_files(ref))
+        if paths is not None:
+            files = [file for file in files if _matches_any(file[2], paths)]
+        files = [file for file in files if not os.path.lexists(target_folder / file[2])]
+
+        missing = {}
+        for mode, blob_hash, path in files:
+            if mode != "120000" and not self.object_path(blob_hash).exists():
+                missing.setdefault(blob_hash, path)
+        if missing:
+            self._add_objects(missing)
+
+        for mode, blob_hash, path in files:
+            self._place_file(mode, blob_hash, path, target_folder)
+
+        return [path for _, _, path in files]
+
+    def fetch_lfs_objects(self, ref: str, files: list[tuple[str, str, str]]):
+        """
+        Download the LFS objects of the given files in one request, if they are LFS pointers.
+
+        Used when only some files of a branch are needed, so that only their LFS objects
+        are downloaded instead of those of the entire branch.
+
+        :param ref:
+            Branch, ref or commit of the output repository.
+        :param files:
+            Files as returned by list_files.
+        """
+        odb = self.output_repo._git_repo.odb
+        with self.output_repo._object_read_lock:
+            pointer_paths = [
+                path for mode, blob_hash, path in files
+                if mode != "120000"
+                and not self.object_path(blob_hash).exists()
+                and odb.info(bytes.fromhex(blob_hash)).size <= _LFS_POINTER_MAX_SIZE
+                and odb.stream(bytes.fromhex(blob_hash)).read().startswith(_LFS_POINTER_PREFIX)
+            ]
+        if not pointer_paths or len(self.output_repo.remotes) == 0:
+            return
+        try:
+            self.output_repo._git.lfs("fetch", str(self.output_repo.remotes[0]), ref, "--include", ",".join(pointer_paths))
+        except git.GitCommandError as e:
+            print(f"Could not fetch LFS objects of {pointer_paths}: {e}")
+
+    def is_partial(self, name: str) -> bool:
+        """True if the cache directory of the given name only holds the files accessed so far."""
+        return (self.path / ".partial" / name).exists()
+
+    def mark_partial(self, name: str, partial: bool = True):
+        """
+        Mark the cache directory of the given name as partially or completely populated.
+
+        :param name:
+            Name of the cache directory.
+        :param partial:
+            If False, remove the mark.
+        """
+        marker = self.path / ".partial" / name
+        if partial:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+        elif marker.exists():
+            os.remove(marker)
+
+    def refresh(self, from_commit: str, to_commit: str, target_folder: str | Path):
+        """
+        Update a directory populated from one commit to the files of another commit.
+
+        Only the files that differ between the two commits are touched, so the cost
+        depends on the size of the change rather than on the size of the tree. Applying
+        the same refresh again is harmless, so an interrupted refresh can be repeated.
+
+        :param from_commit:
+            Commit the directory was populated from.
+        :param to_commit:
+            Commit to update the directory to.
+        :param target_folder:
+            Directory populated by materialize() or refresh().
+        """
+        target_folder = Path(target_folder)
+        diff = self.output_repo._git.diff_tree("-r", "-z", "--no-renames", "--no-abbrev", from_commit, to_commit)
+        fields = diff.split("\0")
+
+        removed = []
+        added = []
+        for info, path in zip(fields[0::2], fields[1::2]):
+            if not info:
+                continue
+            _, new_mode, old_blob_hash, new_blob_hash, status = info.lstrip(":").split(" ")
+            removed.append((old_blob_hash, path))
+            if status != "D" and new_mode != "160000":
+                added.append((new_mode, new_blob_hash, path))
+
+        for old_blob_hash, path in removed:
+            file_path = target_folder / path
+            if file_path.is_symlink():
+                os.remove(file_path)
+            elif file_path.exists():
+                delete_path(file_path)
+                # Removing a read-only file on Windows clears its read-only bit, which is
+                # shared with the stored object it is hardlinked to.
+                object_path = self.object_path(old_blob_hash)
+                if object_path.exists():
+                    os.chmod(object_path, S_IREAD)
+            # Remove directories left empty, e.g. when a file was moved into a subdirectory.
+            parent = file_path.parent
+            while parent != target_folder and parent.exists() and not any(parent.iterdir()):
+                parent.rmdir()
+                parent = parent.parent
+
+        missing = {
+            blob_hash: path for mode, blob_hash, path in added
+            if mode != "120000" and not self.object_path(blob_hash).exists()
+        }
+        if missing:
+            self._add_objects(missing)
+
+        for mode, blob_hash, path in added:
+            self._place_file(mode, blob_hash, path, target_folder)
+
+    def cached_commit(self, name: str) -> str | None:
+        """Commit the cache directory of the given name was last populated from, if known."""
+        commit_file = self.path / ".commits" / name
+        if not commit_file.exists():
+            return None
+        return commit_file.read_text().strip() or None
+
+    def record_commit(self, name: str, commit: str | None):
+        """
+        Record the commit the cache directory of the given name was populated from.
+
+        :param name:
+            Name of the cache directory.
+        :param commit:
+            Commit hash, or None to forget the record.
+        """
+        commit_file = self.path / ".commits" / name
+        if commit is None:
+            if commit_file.exists():
+                os.remove(commit_file)
+            return
+        commit_file.parent.mkdir(parents=True, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=commit_file.parent, prefix=".tmp_")
+        with os.fdopen(handle, "w") as file_handle:
+            file_handle.write(commit)
+        os.replace(temporary_path, commit_file)
+
+    def _place_file(self, mode: str, blob_hash: str, path: str, target_folder: Path):
+        """Create a file of a tree in a branch directory, linked to its object in the store."""
+        file_path = target_folder / path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        if mode == "120000":
+            link_target = self.output_repo.read_object(blob_hash)
+            os.symlink(link_target.decode(), file_path)
+            return
+        try:
+            self._link_object(blob_hash, file_path)
+        except FileNotFoundError:
+            # Removed by a concurrent garbage collection before it was linked.
+            self._add_objects({blob_hash: path})
+            self._link_object(blob_hash, file_path)
+
+    def _link_object(self, blob_hash: str, file_path: Path):
+        """
+        Hardlink an object into a branch directory, or copy it if hardlinks are not supported.
+
+        If the file already exists, a concurrent refresh of the same branch has linked it,
+        and it is left as it is.
+        """
+        object_path = self.object_path(blob_hash)
+        try:
+            os.link(object_path, file_path)
+        except FileExistsError:
+            pass
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # Copy under a temporary name, so the copy never writes into a read-only file.
+            handle, temporary_path = tempfile.mkstemp(dir=file_path.parent, prefix=".tmp_")
+            os.close(handle)
+            try:
+                shutil.copyfile(object_path, temporary_path)
+                os.chmod(temporary_path, S_IREAD)
+                os.replace(temporary_path, file_path)
+            except OSError:
+                delete_path(temporary_path)
+                if not file_path.exists():
+                    raise
+
+    def _add_objects(self, blobs: dict[str, str]):
+        """
+        Read blobs from git and add them to the object store.
+
+        :param blobs:
+            Dictionary mapping blob hashes to a path they are stored at, used to select filters.
+        """
+        process = subprocess.Popen(
+            ["git", "cat-file", "--batch", "--filters"],
+            cwd=self.output_repo.path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        try:
+            for blob_hash, path in blobs.items():
+                process.stdin.write(f"{blob_hash} {path}\n".encode())
+                process.stdin.flush()
+
+                header = process.stdout.readline().decode().split()
+                if len(header) != 3:
+                    raise RuntimeError(f"Could not read blob {blob_hash} ({path}) from {self.output_repo.path}.")
+                size = int(header[2])
+                self._write_object(blob_hash, process.stdout, size)
+                # Every object is followed by a newline.
+                process.stdout.read(1)
+        finally:
+            process.stdin.close()
+            process.wait()
+
+    def _write_object(self, blob_hash: str, stream, size: int, chunk_size: int = 1 << 20):
+        """Write a blob to the object store, atomically so concurrent writers do not clash."""
+        object_path = self.object_path(blob_hash)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=object_path.parent, prefix=".tmp_")
+        try:
+            with os.fdopen(handle, "wb") as file_handle:
+                remaining = size
+                while remaining > 0:
+                    chunk = stream.read(min(chunk_size, remaining))
+                    if not chunk:
+                        raise RuntimeError(f"Unexpected end of data while reading blob {blob_hash}.")
+                    file_handle.write(chunk)
+                    remaining -= len(chunk)
+            os.chmod(temporary_path, S_IREAD)
+            os.replace(temporary_path, object_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    def touch(self, branch_folder: str | Path):
+        """Mark a cached branch as used now. Its modification time is used as the last access time."""
+        now = time.time()
+        os.utime(branch_folder, (now, now))
+
+    def _branch_folders(self) -> list[Path]:
+        if not self.path.exists():
+            return []
+        return [path for path in self.path.iterdir() if path.is_dir() and not path.name.startswith(".")]
+
+    def _inodes(self, folder: Path) -> dict[tuple[int, int], int]:
+        """Sizes of the files below a folder, keyed by inode so that links are counted once."""
+        inodes = {}
+        for directory, _, filenames in os.walk(folder):
+            for filename in filenames:
+                file_stat = os.lstat(os.path.join(directory, filename))
+                inodes[(file_stat.st_dev, file_stat.st_ino)] = file_stat.st_size
+        return inodes
+
+    def list_branches(self) -> list[CachedBranch]:
+        """List the cached branches, least recently used first."""
+        branches = []
+        for folder in self._branch_folders():
+            branches.append(CachedBranch(
+                name=folder.name,
+                path=folder,
+                last_access=datetime.fromtimestamp(folder.stat().st_mtime),
+                size=sum(self._inodes(folder).values()),
+            ))
+        return sorted(branches, key=lambda branch: branch.last_access)
+
+    @property
+    def size(self) -> int:
+        """Size of the cache in bytes on disk, counting files shared between branches once."""
+        if not self.path.exists():
+            return 0
+        return sum(self._inodes(self.path).values())
+
+    def prune(self, max_size: int | str | None = None, keep: Iterable[str] = ()) -> list[str]:
+        """
+        Evict least recently used branches until the cache fits into the budget.
+
+        Files of evicted branches are only freed once no other cached branch links to
+        them. Objects no longer used by any branch are removed from the store.
+
+        :param max_size:
+            Budget in bytes or as a string like "10G". Defaults to the budget of the cache.
+            If neither is set, no branch is evicted.
+        :param keep:
+            Names of cache directories that must not be evicted.
+        :return:
+            Names of the evicted cache directories.
+        """
+        if max_size is None:
+            max_size = self.max_size
+        max_size = parse_size(max_size) if max_size is not None else None
+
+        self.collect_garbage()
+        evicted = []
+        if max_size is not None:
+            branches = self.list_branches()
+            # Count for every inode how many branches use it, to know when it is freed.
+            users = {}
+            sizes = {}
+            branch_inodes = {}
+            for branch in branches:
+                branch_inodes[branch.name] = self._inodes(branch.path)
+                for inode, size in branch_inodes[branch.name].items():
+                    users[inode] = users.get(inode, 0) + 1
+                    sizes[inode] = size
+            total_size = self.size
+
+            for branch in branches:
+                if total_size <= max_size:
+                    break
+                if branch.name in keep:
+                    continue
+                print(f"Evicting {branch.name} from the results cache.")
+                delete_path(branch.path)
+                self.record_commit(branch.name, None)
+                self.mark_partial(branch.name, False)
+                evicted.append(branch.name)
+                for inode in branch_inodes[branch.name]:
+                    users[inode] -= 1
+                    if users[inode] == 0:
+                        total_size -= sizes[inode]
+
+        self.collect_garbage()
+        return evicted
+
+    def collect_garbage(self) -> int:
+        """
+        Remove objects from the store that are not linked into any cached branch.
+
+        Objects that are kept are made read-only again: removing a read-only link of an
+        object on Windows clears the read-only bit, which is shared by all its links.
+
+        :return:
+            Number of bytes freed.
+        """
+        freed = 0
+        if not self.objects_path.exists():
+            return freed
+        for directory, _, filenames in os.walk(self.objects_path):
+            for filename in filenames:
+                if filename.startswith(".tmp_"):
+                    continue
+                object_path = Path(directory) / filename
+                object_stat = object_path.stat()
+                if object_stat.st_nlink == 1:
+                    freed += object_stat.st_size
+                    delete_path(object_path)
+                elif object_stat.st_mode & S_IWRITE:
+                    os.chmod(object_path, S_IREAD)
+        return freed
+
+
+class LazyResults:
+    def __init__(self, results_cache: ResultsCache, commit: str, path: str | Path):
+        """
+        Results of an output branch whose files are only copied to the cache when accessed.
+
+        The tree of the branch is listed once without reading any file. Accessing a path
+        with `/`, `materialize` or `glob` extracts only the matching files, downloading only
+        their LFS objects. Using the handle as a path (e.g. `Path(results)`) extracts
+        all files.
+
+        :param results_cache:
+            Cache the files are stored in.
+        :param commit:
+            Commit of the output branch.
+        :param path:
+            Cache directory of the branch.
+        """
+        self.results_cache = results_cache
+        self.commit = commit
+        self.path = Path(path)
+        self._files = None
+
+    def __repr__(self):
+        return f"LazyResults({self.path}, commit={self.commit[:7]})"
+
+    def __fspath__(self) -> str:
+        return str(self.materialize())
+
+    def __truediv__(self, sub_path: str | Path) -> Path:
+        return self.materialize(sub_path)
+
+    @property
+    def files(self) -> list[str]:
+        """Paths of all files of the branch, relative to its root."""
+        return [path for _, _, path in self._listing]
+
+    @property
+    def _listing(self) -> list[tuple[str, str, str]]:
+        if self._files is None:
+            self._files = list(self.results_cache.list_files(self.commit))
+        return self._files
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def materialize(self, sub_path: str | Path | None = None) -> Path:
+        """
+        Copy a file or directory of the branch into the cache, if not done before.
+
+        :param sub_path:
+            Path of a file or directory relative to the root of the branch.
+            If None, all files are copied.
+        :return:
+            Path to the file or directory in the cache.
+        """
+        name = self.path.name
+        if sub_path is None:
+            if self.results_cache.is_partial(name):
+                self.results_cache.materialize(self.commit, self.path, files=self._listing)
+                self.results_cache.record_commit(name, self.commit)
+                self.results_cache.mark_partial(name, False)
+            return self.path
+
+        sub_path = Path(sub_path).as_posix()
+        files = [file for file in self._listing if _matches_any(file[2], [sub_path])]
+        if not files:
+            raise FileNotFoundError(f"{sub_path} does not exist in {self}.")
+        self.results_cache.fetch_lfs_objects(self.commit, files)
+        self.results_cache.materialize(self.commit, self.path, files=files)
+        return self.path / sub_path
+
+    def glob(self, pattern: str) -> list[Path]:
+        """
+        Copy the files matching a glob pattern into the cache.
+
+        :param pattern:
+            Pattern relative to the root of the branch, e.g. "*.h5" or "*/options.json".
+        :return:
+            Paths to the matching files in the cache.
+        """
+        files = [file for file in self._listing if fnmatch.fnmatchcase(file[2], pattern)]
+        if files:
+            self.results_cache.fetch_lfs_objects(self.commit, files)
+            self.results_cache.materialize(self.commit, self.path, files=files)
+        return [self.path / path for _, _, path in files]
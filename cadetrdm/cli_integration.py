@@ -32,11 +32,20 @@ def init(path_to_repo: str = None, output_directory_name: (str | bool) = "output
 
 
 @cli.command(help="Clone a repository into a new empty directory.")
+@click.option('--single-branch-output', is_flag=True,
+              help="Only clone the main branch of the output repository. "
+                   "Result branches are fetched when they are loaded.")
+@click.option('--output-ref-prefix', default=None,
+              help="Additionally track output branches starting with this prefix. Implies --single-branch-output.")
 @click.argument('project_url')
 @click.argument('directory', required=False)
-def clone(project_url, directory: str = None):
+def clone(project_url, directory: str = None, single_branch_output: bool = False, output_ref_prefix: str = None):
     from cadetrdm import ProjectRepo
-    repo = ProjectRepo.clone(url=project_url, to_path=directory)
+    repo = ProjectRepo.clone(
+        url=project_url,
+        to_path=directory,
+        repo_kwargs={"single_branch_output": single_branch_output, "output_ref_prefix": output_ref_prefix},
+    )
     del repo
 
 
@@ -58,9 +67,12 @@ def check():
 
 @cli.command(help="Push all changes to the project and output repositories.")
 @click.option('--single', "-s", is_flag=True, help="Push only changes of the current branch.")
-def push(single=False):
+@click.option('--parallel', "-p", is_flag=True,
+              help="Push to all remotes and both repositories at the same time, pushing only changed branches.")
+@click.option('--retries', default=2, show_default=True, help="Number of retries of failed pushes with --parallel.")
+def push(single=False, parallel=False, retries=2):
     repo = get_project_repo()
-    repo.push(push_all=not single)
+    repo.push(push_all=not single, parallel=parallel, retries=retries)
     del repo
 
 
@@ -249,12 +261,33 @@ def fill_data_from_cadet_rdm_json(re_load=False):
     del repo
 
 
-@data.command(name="cache", help="Copy data from the output repo to the cache.")
-@click.argument("branch")
-def copy_to_cache(branch: str):
+@data.command(name="cache", help="Copy data from the output repo to the cache, or inspect and prune the cache.")
+@click.option('--list', 'list_branches', is_flag=True,
+              help='List cached branches with their size and last access, least recently used first.')
+@click.option('--prune', is_flag=True,
+              help='Evict least recently used branches until the cache fits into --max-size '
+                   'and remove files no longer used by any branch.')
+@click.option('--max-size', default=None,
+              help='Size budget for the cache, e.g. 500M or 10G.')
+@click.argument("branch", required=False)
+def copy_to_cache(branch: str = None, list_branches: bool = False, prune: bool = False, max_size: str = None):
     from cadetrdm.repositories import ProjectRepo
-    repo = ProjectRepo(".")
-    repo.copy_data_to_cache(branch)
+    from cadetrdm.cache import format_size
+    repo = ProjectRepo(".", cache_max_size=max_size)
+    if branch is not None:
+        repo.copy_data_to_cache(branch)
+    if prune:
+        evicted = repo.results_cache.prune()
+        print(f"Evicted {len(evicted)} branches from the cache.")
+    if list_branches:
+        for cached_branch in repo.results_cache.list_branches():
+            print(
+                f"{cached_branch.last_access:%Y-%m-%d %H:%M:%S}  "
+                f"{format_size(cached_branch.size):>8}  {cached_branch.name}"
+            )
+        print(f"Total size on disk: {format_size(repo.results_cache.size)}")
+    if branch is None and not prune and not list_branches:
+        raise click.UsageError("Please supply a BRANCH to cache, --list or --prune.")
     del repo
 
 
@@ -1,12 +1,73 @@
+import functools
 import io
+import json
 import re
-from typing import Self, List
+import threading
+from collections import OrderedDict
+from typing import Self, List, Iterable
 from typing import Dict as DictType
 import subprocess
 
 import yaml
 from semantic_version import Version, SimpleSpec
 
+from cadetrdm.options import short_hash
+
+
+# The C loader is much faster on the large files written by conda env export.
+_yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_ANSI_ESCAPE_PATTERN = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]')
+
+
+class LRUCache:
+    """Thread-safe mapping holding at most maxsize items, dropping the least recently used ones."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# Results of Environment.mismatches, by fingerprint of the installed and the required environment.
+_fulfils_environment_cache = LRUCache(maxsize=4096)
+
+
+@functools.lru_cache(maxsize=4096)
+def _coerce_version(version: str) -> Version:
+    return Version.coerce(version)
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_spec(package: str, version: str) -> SimpleSpec:
+    """Parse a requirement once, falling back to the coerced version for non-standard specs."""
+    try:
+        return SimpleSpec(version)
+    except ValueError as e:
+        spec = SimpleSpec(str(Version.coerce(version)))
+        print(f"Warning: {e} when processing {package}={version}. Using {str(Version.coerce(version))} instead.")
+        return spec
+
 
 class Environment:
 
@@ -28,6 +89,10 @@ class Environment:
         self.name = name
         self.channels = channels
 
+        # Hash of the packages, and the packages it was computed from, see get_hash.
+        self._hash = None
+        self._hashed_packages = None
+
     @classmethod
     def from_yml(cls, yml_path):
         """
@@ -37,9 +102,18 @@ class Environment:
         :return:
         """
         with open(yml_path) as handle:
-            yml_string = "".join(handle.readlines())
-
-        instance = cls.from_yml_string(yml_string)
+            yml_string = handle.read()
+
+        return cls.from_yml_string(yml_string)
+
+    def _copy(self) -> Self:
+        instance = type(self)(
+            conda_packages=dict(self.conda_packages) if self.conda_packages is not None else None,
+            pip_packages=dict(self.pip_packages) if self.pip_packages is not None else None,
+            name=self.name,
+            channels=list(self.channels) if self.channels is not None else None,
+        )
+        instance.packages = dict(self.packages)
         return instance
 
     @classmethod
@@ -52,10 +126,10 @@ class Environment:
         """
 
         # Remove special formatting characters from the string
-        ansi_escape_pattern = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]')
-        yml_string = re.sub(ansi_escape_pattern, "", yml_string)
+        if "\x1b" in yml_string:
+            yml_string = _ANSI_ESCAPE_PATTERN.sub("", yml_string)
 
-        packages = yaml.safe_load(yml_string)
+        packages = yaml.load(yml_string, Loader=_yaml_loader)
 
         instance = cls()
 
@@ -180,13 +254,10 @@ class Environment:
         #   - If more than 3 dot-separated numerical components,
         #       everything from the fourth component belongs to the build part
         #   - Any extra + in the build part will be replaced with dots
-        installed_version = Version.coerce(installed_version)
+        installed_version = _coerce_version(installed_version)
 
-        try:
-            spec = SimpleSpec(version)
-        except ValueError as e:
-            spec = SimpleSpec(str(Version.coerce(version)))
-            print(f"Warning: {e} when processing {package}={version}. Using {str(Version.coerce(version))} instead.")
+        # Versions and specs are parsed once per process, see _coerce_version and _compile_spec.
+        spec = _compile_spec(package, version)
 
         match = spec.match(installed_version)
 
@@ -204,6 +275,27 @@ class Environment:
         if environment is None:
             return True
 
+        mismatches = self.mismatches(environment)
+        self.report_mismatches(mismatches)
+        return not mismatches
+
+    def mismatches(self, environment: Self) -> tuple[tuple[str, str, str | None], ...]:
+        """
+        Find the requirements of a given environment that this environment does not fulfil.
+
+        Results are remembered per pair of environment fingerprints, see get_hash.
+
+        :param environment:
+            Instance of Environment class, with requirements as key: value pairs.
+        :return:
+            Tuples of package, required version and installed version, which is None if the
+            package is not installed.
+        """
+        key = (self.get_hash(), environment.get_hash())
+        cached_mismatches = _fulfils_environment_cache.get(key)
+        if cached_mismatches is not None:
+            return cached_mismatches
+
         mismatches = []
 
         for package, version in environment.packages.items():
@@ -213,12 +305,36 @@ class Environment:
             except ValueError:
                 mismatches.append((package, version, self.package_version(package)))
 
-        if mismatches:
-            for package, version, existing_version in mismatches:
-                print(f"Package {package}: {existing_version} does not fulfil requirements: {version}")
-            return False
+        mismatches = tuple(mismatches)
+        _fulfils_environment_cache[key] = mismatches
+        return mismatches
 
-        return True
+    @staticmethod
+    def report_mismatches(mismatches: Iterable[tuple[str, str, str | None]]):
+        """Print the requirements returned by mismatches that are not fulfilled."""
+        for package, version, existing_version in mismatches:
+            print(f"Package {package}: {existing_version} does not fulfil requirements: {version}")
+
+    def get_hash(self) -> str:
+        """
+        Fingerprint of the packages of the environment, independent of their order.
+
+        Environments with the same conda and pip packages have the same hash. The hash is
+        only computed again if the packages have changed since it was last computed.
+        """
+        packages = (self.conda_packages, self.pip_packages, self.packages)
+        if self._hash is not None and self._hashed_packages == packages:
+            return self._hash
+
+        dump = json.dumps(
+            {"conda": self.conda_packages or {}, "pip": self.pip_packages or {}, "packages": self.packages},
+            sort_keys=True,
+            separators=(',', ':'),
+        )
+        self._hash = short_hash(dump)
+        self._hashed_packages = tuple(dict(package_dict) if package_dict is not None else None
+                                      for package_dict in packages)
+        return self._hash
 
     def prepare_install_instructions(self):
 
@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import ast
+import json
+import os
+import re
+import site
+import sys
+import threading
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+
+import yaml
+
+from cadetrdm.environment import Environment
+from cadetrdm.options import short_hash
+
+
+_HISTORY_SPECS_PATTERN = re.compile(r"^# (install|update|remove) specs: (\[.*\])\s*$")
+_REQUIREMENT_NAME_PATTERN = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+_CONDA_SPEC_NAME_PATTERN = re.compile(r"^(?:[^:]+::)?([A-Za-z0-9_.\-]+)")
+_EXTRA_MARKER_PATTERN = re.compile(r";.*\bextra\s*==")
+# Left out by pip freeze unless --all is given.
+_FREEZE_EXCLUDED = {"pip", "setuptools", "wheel", "distribute"}
+
+_snapshot_cache: dict[tuple, EnvironmentSnapshot] = {}
+_environment_cache: dict[tuple, Environment] = {}
+_snapshot_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class EnvironmentSnapshot:
+    """
+    Description of the software environment of the running interpreter.
+
+    :param conda_environment:
+        Content of the conda environment.yml, as written by `conda env export`.
+    :param conda_independent_environment:
+        Content of the explicitly requested conda packages, as written by `conda env export --from-history`.
+    :param pip_requirements:
+        Installed distributions, as written by `pip freeze`.
+    :param pip_independent_requirements:
+        Distributions no other distribution depends on, as written by `pip list --not-required --format freeze`.
+    """
+    conda_environment: str
+    conda_independent_environment: str
+    pip_requirements: str
+    pip_independent_requirements: str
+
+    file_names = {
+        "conda_environment": "conda_environment.yml",
+        "conda_independent_environment": "conda_independent_environment.yml",
+        "pip_requirements": "pip_requirements.txt",
+        "pip_independent_requirements": "pip_independent_requirements.txt",
+    }
+
+    def get_hash(self) -> str:
+        """
+        Fingerprint of the environment, identical for identical environment files.
+
+        Used to store the files of environments shared by many runs only once.
+        """
+        dump = json.dumps(
+            {attribute: getattr(self, attribute) for attribute in self.file_names},
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(',', ':'),
+        )
+        return short_hash(dump)
+
+    def write(self, target_folder: str | Path):
+        """
+        Write the environment files into a directory.
+
+        :param target_folder:
+            Existing directory to write into.
+        """
+        for attribute, file_name in self.file_names.items():
+            with open(Path(target_folder) / file_name, "w", encoding="utf-8") as file_handle:
+                file_handle.write(getattr(self, attribute))
+
+
+def take_environment_snapshot(use_cache: bool = True) -> EnvironmentSnapshot:
+    """
+    Describe the environment of the running interpreter.
+
+    Installed distributions are read through importlib.metadata and conda packages from the
+    conda-meta directory of the environment, instead of running conda and pip. If the
+    interpreter does not belong to a conda environment, e.g. a venv, the environment file
+    only lists its distributions in the pip section.
+
+    Snapshots are cached for the current interpreter until a package is installed or removed,
+    which is detected from the modification times of the site-packages and conda-meta directories.
+
+    :param use_cache:
+        If False, ignore and replace a cached snapshot.
+    """
+    key = environment_state_key()
+    if use_cache:
+        with _snapshot_cache_lock:
+            if key in _snapshot_cache:
+                return _snapshot_cache[key]
+
+    distributions = _installed_distributions()
+    conda_prefix = _conda_prefix()
+    if conda_prefix is not None:
+        conda_environment = _conda_environment_from_meta(conda_prefix, distributions)
+        conda_independent_environment = _conda_environment_from_history(conda_prefix)
+    else:
+        # Packages of an active conda environment cannot be imported by this interpreter,
+        # so they are not recorded.
+        conda_environment = _dump_conda_yml(Path(sys.prefix), [], _pip_dependencies(distributions, set()))
+        conda_independent_environment = ""
+
+    snapshot = EnvironmentSnapshot(
+        conda_environment=conda_environment,
+        conda_independent_environment=conda_independent_environment,
+        pip_requirements=_pip_freeze(distributions),
+        pip_independent_requirements=_pip_not_required(distributions),
+    )
+    with _snapshot_cache_lock:
+        _snapshot_cache[key] = snapshot
+    return snapshot
+
+
+def get_current_environment() -> Environment:
+    """
+    Parsed Environment of the running interpreter, used to check environment requirements.
+
+    Shared by the whole process and cached like take_environment_snapshot, so checking the
+    requirements of many cases probes the environment only once.
+    """
+    key = environment_state_key()
+    with _snapshot_cache_lock:
+        if key in _environment_cache:
+            return _environment_cache[key]
+
+    environment = Environment.from_yml_string(take_environment_snapshot().conda_environment)
+
+    with _snapshot_cache_lock:
+        _environment_cache[key] = environment
+    return environment
+
+
+def invalidate_environment_snapshot():
+    """Forget all cached environment snapshots, e.g. after installing packages from within the process."""
+    with _snapshot_cache_lock:
+        _snapshot_cache.clear()
+        _environment_cache.clear()
+
+
+def environment_state_key() -> tuple:
+    """
+    Key identifying the current interpreter and the state of its installed packages.
+
+    Consists of the interpreter, its prefix, the active conda prefix and the modification
+    times of the package directories, which change whenever a package is installed or removed.
+    """
+    directories = [*site.getsitepackages(), site.getusersitepackages()]
+    conda_prefix = _conda_prefix()
+    if conda_prefix is not None:
+        directories.append(str(conda_prefix / "conda-meta"))
+
+    modification_times = []
+    for directory in directories:
+        try:
+            modification_times.append((directory, os.stat(directory).st_mtime_ns))
+        except OSError:
+            modification_times.append((directory, None))
+    return sys.executable, sys.prefix, str(conda_prefix), tuple(modification_times)
+
+
+def _conda_prefix() -> Path | None:
+    """
+    Prefix of the conda environment of the interpreter, or None if it is not a conda environment.
+
+    CONDA_PREFIX names the activated conda environment, which is not the environment of the
+    interpreter if it runs in a venv created within it. It is only used if it is sys.prefix.
+    """
+    prefix = Path(sys.prefix)
+    if not (prefix / "conda-meta").is_dir():
+        return None
+
+    conda_prefix = os.environ.get("CONDA_PREFIX")
+    if conda_prefix and Path(conda_prefix).is_dir() and os.path.samefile(conda_prefix, prefix):
+        return Path(conda_prefix)
+    return prefix
+
+
+def _normalize_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _installed_distributions() -> list[metadata.Distribution]:
+    """Installed distributions on sys.path, without duplicates, sorted by name."""
+    distributions = {}
+    for distribution in metadata.distributions():
+        name = distribution.metadata["Name"]
+        if name is None:
+            continue
+        distributions.setdefault(_normalize_name(name), distribution)
+    return [distributions[name] for name in sorted(distributions)]
+
+
+def _freeze_line(distribution: metadata.Distribution) -> str:
+    """Requirement line of a distribution like the one written by pip freeze."""
+    name = distribution.metadata["Name"]
+    direct_url = distribution.read_text("direct_url.json")
+    if direct_url:
+        try:
+            direct_url = json.loads(direct_url)
+        except ValueError:
+            direct_url = {}
+        url = direct_url.get("url")
+        if "vcs_info" in direct_url:
+            vcs_info = direct_url["vcs_info"]
+            return f"{name} @ {vcs_info['vcs']}+{url}@{vcs_info['commit_id']}"
+        if direct_url.get("dir_info", {}).get("editable"):
+            return f"-e {url}"
+        if url and not url.startswith("file://"):
+            return f"{name} @ {url}"
+    return f"{name}=={distribution.version}"
+
+
+def _pip_freeze(distributions: list[metadata.Distribution]) -> str:
+    return "".join(
+        f"{_freeze_line(distribution)}\n" for distribution in distributions
+        if _normalize_name(distribution.metadata["Name"]) not in _FREEZE_EXCLUDED
+    )
+
+
+def _pip_not_required(distributions: list[metadata.Distribution]) -> str:
+    required = set()
+    for distribution in distributions:
+        for requirement in distribution.requires or []:
+            # Dependencies of optional extras are only installed on request.
+            if _EXTRA_MARKER_PATTERN.search(requirement):
+                continue
+            match = _REQUIREMENT_NAME_PATTERN.match(requirement)
+            if match:
+                required.add(_normalize_name(match.group(1)))
+
+    return "".join(
+        f"{distribution.metadata['Name']}=={distribution.version}\n" for distribution in distributions
+        if _normalize_name(distribution.metadata["Name"]) not in required
+    )
+
+
+def _channel_name(channel: str) -> str:
+    """Short name of a conda channel URL, as used by conda env export."""
+    channel = channel.rstrip("/")
+    if "://" not in channel:
+        return channel
+    parts = channel.split("/")
+    if parts[-1] in ("noarch",) or "-" in parts[-1]:
+        parts = parts[:-1]
+    if "repo.anaconda.com" in parts[2]:
+        return "defaults"
+    if parts[2] in ("conda.anaconda.org", "anaconda.org"):
+        return parts[3]
+    return "/".join(parts)
+
+
+def _dump_conda_yml(prefix: Path, channels: list[str], dependencies: list) -> str:
+    yml_dict = {
+        "name": prefix.name,
+        "channels": channels,
+        "dependencies": dependencies,
+        "prefix": str(prefix),
+    }
+    return yaml.safe_dump(yml_dict, sort_keys=False, default_flow_style=False)
+
+
+def _conda_environment_from_meta(prefix: Path, distributions: list[metadata.Distribution]) -> str:
+    """Environment file like the one written by conda env export, read from conda-meta."""
+    records = []
+    for record_path in sorted((prefix / "conda-meta").glob("*.json")):
+        with open(record_path, encoding="utf-8") as file_handle:
+            records.append(json.load(file_handle))
+
+    channels = []
+    for record in records:
+        channel = _channel_name(record.get("channel", ""))
+        if channel and channel not in channels:
+            channels.append(channel)
+
+    dependencies = [f"{record['name']}={record['version']}={record['build']}" for record in records]
+    conda_names = {_normalize_name(record["name"]) for record in records}
+    dependencies.extend(_pip_dependencies(distributions, conda_names))
+
+    return _dump_conda_yml(prefix, channels, dependencies)
+
+
+def _pip_dependencies(distributions: list[metadata.Distribution], conda_names: set[str]) -> list:
+    """Pip section of an environment file, listing the distributions not installed by conda."""
+    pip_packages = [
+        f"{distribution.metadata['Name']}=={distribution.version}" for distribution in distributions
+        if _normalize_name(distribution.metadata["Name"]) not in conda_names
+        and (distribution.read_text("INSTALLER") or "").strip() != "conda"
+    ]
+    return [{"pip": pip_packages}] if pip_packages else []
+
+
+def _conda_environment_from_history(prefix: Path) -> str:
+    """Environment file like the one written by conda env export --from-history."""
+    history_path = prefix / "conda-meta" / "history"
+    specs = {}
+    channels = []
+    if history_path.exists():
+        with open(history_path, encoding="utf-8", errors="replace") as file_handle:
+            for line in file_handle:
+                match = _HISTORY_SPECS_PATTERN.match(line)
+                if match is None:
+                    continue
+                action, spec_list = match.groups()
+                try:
+                    spec_list = ast.literal_eval(spec_list)
+                except (ValueError, SyntaxError):
+                    continue
+                for spec in spec_list:
+                    name_match = _CONDA_SPEC_NAME_PATTERN.match(spec)
+                    if name_match is None:
+                        continue
+                    if action == "remove":
+                        specs.pop(name_match.group(1), None)
+                    else:
+                        specs[name_match.group(1)] = spec
+                    if "::" in spec and spec.split("::")[0] not in channels:
+                        channels.append(spec.split("::")[0])
+
+    return _dump_conda_yml(prefix, channels, list(specs.values()))
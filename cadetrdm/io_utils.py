@@ -1,5 +1,8 @@
 import os
 import shutil
+import socket
+import threading
+import time
 from _stat import S_IWRITE
 from pathlib import Path
 
@@ -70,7 +73,12 @@ def delete_path(filename):
     if os.path.isdir(absolute_path):
         shutil.rmtree(absolute_path, onerror=remove_readonly)
     else:
-        os.remove(absolute_path)
+        try:
+            os.remove(absolute_path)
+        except PermissionError:
+            # Read-only files cannot be removed on Windows
+            os.chmod(absolute_path, S_IWRITE)
+            os.remove(absolute_path)
 
 
 def wait_for_user(message):
@@ -109,3 +117,167 @@ def test_for_lfs():
                            "instructions found below \n"
                            "https://docs.github.com/en/repositories/working-with-files"
                            "/managing-large-files/installing-git-large-file-storage")
+
+
+class FileLock:
+    """
+    Lock shared between processes, based on the atomic creation of a lock file.
+
+    The lock file holds the pid and host name of its owner. A lock file left behind by a
+    process of this host that is no longer running is considered stale and removed.
+    The lock is reentrant: the thread holding it can acquire it again and has to release
+    it as many times. Use FileLock.for_path to share this across all users of a lock file
+    within the process.
+    """
+
+    # Locks shared by all callers of for_path, by resolved path of the lock file.
+    _shared_locks: dict[Path, "FileLock"] = {}
+    _shared_locks_lock = threading.Lock()
+
+    def __init__(self, path: str | Path, timeout: float | None = None, poll_interval: float = 0.1):
+        """
+        :param path:
+            Path of the lock file.
+        :param timeout:
+            Seconds to wait for the lock before raising a TimeoutError. Wait forever if None.
+        :param poll_interval:
+            Seconds to wait between attempts to acquire the lock.
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    @classmethod
+    def for_path(cls, path: str | Path, timeout: float | None = None) -> "FileLock":
+        """
+        Return the FileLock of this process for a lock file, creating it on first use.
+
+        Repository objects created independently for the same repository share one lock,
+        so that a thread holding it through one of them can acquire it through another.
+
+        :param path:
+            Path of the lock file.
+        :param timeout:
+            Seconds to wait for the lock before raising a TimeoutError. Wait forever if None.
+        """
+        path = Path(path).resolve()
+        with cls._shared_locks_lock:
+            lock = cls._shared_locks.get(path)
+            if lock is None:
+                lock = cls._shared_locks[path] = cls(path, timeout=timeout)
+            lock.timeout = timeout
+        return lock
+
+    @property
+    def is_locked(self) -> bool:
+        """True if this instance currently holds the lock."""
+        return self._depth > 0
+
+    def acquire(self):
+        """Acquire the lock, waiting until it is released by its current owner."""
+        if not self._thread_lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+            raise TimeoutError(
+                f"Could not acquire lock {self.path} within {self.timeout} seconds. "
+                f"It is held by another thread of {self._describe_owner()}."
+            )
+        if self._depth > 0:
+            self._depth += 1
+            return
+
+        try:
+            self._acquire_file()
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._depth = 1
+
+    def release(self):
+        """Release the lock once. The lock file is removed when the last hold is released."""
+        if self._depth == 0:
+            raise RuntimeError(f"Cannot release lock {self.path} that is not held.")
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self._thread_lock.release()
+
+    def _acquire_file(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        start_time = time.monotonic()
+        while True:
+            try:
+                file_descriptor = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._remove_if_stale():
+                    continue
+                if self.timeout is not None and time.monotonic() - start_time > self.timeout:
+                    raise TimeoutError(
+                        f"Could not acquire lock {self.path} within {self.timeout} seconds. "
+                        f"It is held by {self._describe_owner()}."
+                    )
+                time.sleep(self.poll_interval)
+            else:
+                with os.fdopen(file_descriptor, "w") as lock_file:
+                    lock_file.write(f"{os.getpid()}\n{socket.gethostname()}\n")
+                return
+
+    def _read_owner(self, path: Path | None = None) -> tuple[int, str] | None:
+        try:
+            pid, hostname = (path or self.path).read_text().split("\n")[:2]
+            return int(pid), hostname
+        except (OSError, ValueError):
+            return None
+
+    def _describe_owner(self) -> str:
+        owner = self._read_owner()
+        if owner is None:
+            return "an unknown process"
+        pid, hostname = owner
+        if pid == os.getpid() and hostname == socket.gethostname():
+            return f"this process (pid {pid} on {hostname})"
+        return f"process {pid} on {hostname}"
+
+    def _remove_if_stale(self) -> bool:
+        """Remove the lock file if its owner is a process of this host that no longer runs."""
+        owner = self._read_owner()
+        # os.kill would terminate the process on Windows, so liveness is only checked on POSIX.
+        if owner is None or os.name == "nt" or owner[1] != socket.gethostname():
+            return False
+        try:
+            os.kill(owner[0], 0)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            return False
+        else:
+            return False
+
+        # Another waiter may have replaced the stale lock file since it was read. Moving it
+        # aside is atomic, so only the file that was moved is checked and removed.
+        taken_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.stale")
+        try:
+            os.rename(self.path, taken_path)
+        except FileNotFoundError:
+            return True
+        if self._read_owner(taken_path) != owner:
+            # The lock was taken by a new owner in the meantime, so it is put back. Linking
+            # does not replace a lock file created by yet another process in the meantime.
+            try:
+                os.link(taken_path, self.path)
+            except FileExistsError:
+                pass
+            os.remove(taken_path)
+            return False
+        os.remove(taken_path)
+        return True
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
@@ -1,10 +1,26 @@
 import csv
+import json
 import os
+import re
+from collections import defaultdict
+from collections.abc import Mapping
+from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+import numpy as np
 from tabulate import tabulate
 
-from cadetrdm.environment import Environment
+from cadetrdm.environment import Environment, LRUCache
+
+if TYPE_CHECKING:
+    from cadetrdm.repositories import OutputRepo
+
+# Recorded environments parsed by LogEntry, by hash of the git blob of the environment file.
+_recorded_environment_cache = LRUCache(maxsize=128)
+# Unfulfilled requirements found by LogEntry.fulfils_environment, by hash of the git blob of
+# the environment file and hash of the requirements.
+_environment_match_cache = LRUCache(maxsize=4096)
 
 
 class LogEntry:
@@ -21,6 +37,7 @@ class LogEntry:
         tags: str,
         options_hash: str,
         filepath: os.PathLike,
+        output_repo: "OutputRepo" = None,
         **kwargs
     ):
         self.output_repo_commit_message = output_repo_commit_message
@@ -34,6 +51,7 @@ class LogEntry:
         self.tags = tags
         self.options_hash = options_hash
         self._filepath = filepath
+        self._output_repo = output_repo
         self._environment: Environment = None
         for key, value in kwargs.items():
             setattr(self, key, value)
@@ -46,21 +64,60 @@ class LogEntry:
 
     @property
     def environment(self):
-        if self._filepath is None:
+        if self._filepath is None and self._output_repo is None:
             raise ValueError("OutputLog was initialized without a filepath, can not load Environment data.")
         if self._environment is None:
             self._load_environment()
 
         return self._environment
 
+    @property
+    def environment_file(self) -> str:
+        """
+        Path of the conda environment file recorded for this run, relative to the output repository.
+
+        Runs recorded with an environment_hash share the files of their environment in
+        environments/<environment_hash>, older runs have a copy in their run_history.
+        Both only exist on the main branch of the output repository.
+        """
+        environment_hash = getattr(self, "environment_hash", None)
+        if environment_hash:
+            return f"environments/{environment_hash}/conda_environment.yml"
+        return f"run_history/{self.output_repo_branch}/conda_environment.yml"
+
+    @property
+    def environment_path(self) -> Path:
+        """Path to the conda environment file recorded for this run, next to the log.tsv file."""
+        return Path(self._filepath).parent / self.environment_file
+
+    def _environment_blob_hash(self) -> str | None:
+        """Hash of the git blob of the environment file on the main branch, if read from a repository."""
+        if self._output_repo is None:
+            return None
+
+        main_branch = self._output_repo.main_branch
+        blob_hash = self._output_repo.resolve(f"{main_branch}:{self.environment_file}")
+        if blob_hash is None:
+            raise FileNotFoundError(
+                f"No environment of {self.output_repo_branch} found at {self.environment_file} "
+                f"on the {main_branch} branch of the output repository."
+            )
+        return blob_hash
+
     def _load_environment(self):
-        environment_path = (
-                Path(self._filepath).parent
-                / "run_history"
-                / self.output_repo_branch
-                / "conda_environment.yml"
-        )
-        self._environment = Environment.from_yml(environment_path)
+        blob_hash = self._environment_blob_hash()
+        if blob_hash is None:
+            self._environment = Environment.from_yml(self.environment_path)
+            return
+
+        # The main branch is not checked out, so the file is read from its git tree. Runs
+        # sharing an environment share the blob, so it is only parsed once.
+        environment = _recorded_environment_cache.get(blob_hash)
+        if environment is None:
+            environment = Environment.from_yml_string(self._output_repo.read_object(blob_hash).decode())
+            _recorded_environment_cache[blob_hash] = environment
+        # Hand out copies, so changes to one entry's environment do not leak into the cache.
+        self._environment = environment._copy()
 
     def matches_options_hash(self, options_hash):
         return self.options_hash == options_hash
@@ -82,10 +139,20 @@ class LogEntry:
         if environment is None:
             return True
 
-        if self._environment is None:
-            self._load_environment()
-
-        return self._environment.fulfils_environment(environment)
+        # Runs sharing a recorded environment share the answer, so their environment
+        # files are read and matched only once per set of requirements.
+        blob_hash = self._environment_blob_hash()
+        key = (blob_hash, environment.get_hash())
+        mismatches = _environment_match_cache.get(key) if blob_hash else None
+        if mismatches is None:
+            if self._environment is None:
+                self._load_environment()
+            mismatches = self._environment.mismatches(environment)
+            if blob_hash:
+                _environment_match_cache[key] = mismatches
+
+        Environment.report_mismatches(mismatches)
+        return not mismatches
 
     def package_version(self, package):
         """
@@ -129,6 +196,7 @@ class LogEntry:
 class OutputLog:
     def __init__(self, filepath=None):
         self._filepath = filepath
+        self._output_repo = None
 
         if filepath is None or not Path(filepath).exists():
             self._entry_list = [[], []]
@@ -144,7 +212,7 @@ class OutputLog:
         return len(self.entries)
 
     @classmethod
-    def from_string(cls, content: str, filepath=None):
+    def from_string(cls, content: str, filepath=None, output_repo: "OutputRepo" = None):
         """
         Create an OutputLog from the raw contents of a log.tsv file.
 
@@ -159,6 +227,7 @@ class OutputLog:
         """
         instance = cls()
         instance._filepath = filepath
+        instance._output_repo = output_repo
 
         lines = [line.split("\t") for line in content.splitlines() if line]
         if not lines:
@@ -188,7 +257,10 @@ class OutputLog:
             entry_dictionaries.append(
                 {key: value for key, value in zip(header, entry)}
             )
-        return {entry["output_repo_branch"]: LogEntry(**entry, filepath=self._filepath) for entry in entry_dictionaries}
+        return {
+            entry["output_repo_branch"]: LogEntry(**entry, filepath=self._filepath, output_repo=self._output_repo)
+            for entry in entry_dictionaries
+        }
 
     def _read_file(self, filepath):
         with open(filepath) as handle:
@@ -196,7 +268,8 @@ class OutputLog:
         lines = [line.replace("\n", "").split("\t") for line in lines]
         return lines
 
-    def _convert_header(self, header):
+    @staticmethod
+    def _convert_header(header):
         return [entry.lower().replace(" ", "_") for entry in header]
 
     def __str__(self):
@@ -215,6 +288,63 @@ class OutputLog:
 
         return collection_of_keys.keys()
 
+    @classmethod
+    def append_entry(cls, filepath, entry: LogEntry):
+        """
+        Append a single entry to a log.tsv file without rewriting it.
+
+        Only the header line of the existing file is read. The file is rewritten only if
+        the entry has a column that is not part of the header yet; rows written before
+        that keep fewer fields and are padded with empty values when the log is read.
+
+        :param filepath:
+            Path to the log.tsv file. Created if it does not exist.
+        :param entry:
+            LogEntry to append.
+        """
+        filepath = Path(filepath)
+        entry_dict = entry.to_dict()
+
+        if not filepath.exists() or filepath.stat().st_size == 0:
+            with open(filepath, "w", newline="") as tsv_file_handle:
+                writer = csv.DictWriter(tsv_file_handle, fieldnames=entry_dict.keys(), delimiter="\t")
+                writer.writeheader()
+                writer.writerow(entry_dict)
+            return
+
+        with open(filepath, "r", newline="") as tsv_file_handle:
+            header_line = tsv_file_handle.readline()
+        header = header_line.rstrip("\r\n").split("\t")
+        fieldnames = cls._convert_header(header)
+
+        new_columns = [key for key in entry_dict if key not in fieldnames]
+        if new_columns:
+            cls._widen_header(filepath, header + new_columns)
+            fieldnames += new_columns
+
+        with open(filepath, "rb") as tsv_file_handle:
+            tsv_file_handle.seek(-1, os.SEEK_END)
+            ends_with_newline = tsv_file_handle.read(1) == b"\n"
+
+        with open(filepath, "a", newline="") as tsv_file_handle:
+            if not ends_with_newline:
+                tsv_file_handle.write("\r\n")
+            writer = csv.DictWriter(tsv_file_handle, fieldnames=fieldnames, delimiter="\t")
+            writer.writerow(entry_dict)
+
+    @staticmethod
+    def _widen_header(filepath, header: list[str]):
+        """Replace the header line of a log.tsv file, leaving all rows untouched."""
+        with open(filepath, "r", newline="") as tsv_file_handle:
+            tsv_file_handle.readline()
+            rows = tsv_file_handle.read()
+
+        temporary_path = Path(filepath).with_name(f"{Path(filepath).name}.{os.getpid()}.tmp")
+        with open(temporary_path, "w", newline="") as tsv_file_handle:
+            tsv_file_handle.write("\t".join(header) + "\r\n")
+            tsv_file_handle.write(rows)
+        os.replace(temporary_path, filepath)
+
     def write(self):
         if self._filepath is None:
             raise ValueError("No filepath set for output log. Can not write to filepath")
@@ -224,3 +354,366 @@ class OutputLog:
             writer.writeheader()
             for entry in self.entries.values():
                 writer.writerow(entry.to_dict())
+
+
+class ColumnarOutputLog:
+    """
+    Column-oriented representation of a log.tsv file.
+
+    Every column of the log is stored as one numpy array instead of one LogEntry object
+    per row. LogEntry instances are only created for the rows that are accessed, and
+    filters are evaluated on the arrays without materializing any entries.
+
+    Hash and branch columns are fixed-width string arrays. All other columns hold free text
+    of any length, e.g. commit messages, and are object arrays, so that a single long value
+    does not widen every row of its column.
+    """
+
+    _fixed_width_columns = {
+        "output_repo_branch",
+        "output_repo_commit_hash",
+        "project_repo_branch",
+        "project_repo_commit_hash",
+        "options_hash",
+        "environment_hash",
+    }
+    _timestamp_pattern = re.compile(r"(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})")
+
+    def __init__(self, columns: dict[str, np.ndarray] = None, filepath=None, output_repo: "OutputRepo" = None):
+        """
+        :param columns:
+            Mapping of column name to an array holding that column's value for every row.
+            All arrays must have the same length.
+        :param filepath:
+            Optional path of the log.tsv file, used by LogEntry to locate the run history.
+        :param output_repo:
+            Optional output repository the log was read from, used by LogEntry to read the
+            run history from its main branch.
+        """
+        if columns is None:
+            columns = {}
+
+        self._columns = columns
+        self._filepath = filepath
+        self._output_repo = output_repo
+        self._timestamps = None
+        self._positions = None
+        self._entry_cache: dict[int, LogEntry] = {}
+
+    @classmethod
+    def from_string(cls, content: str, filepath=None, output_repo: "OutputRepo" = None):
+        """
+        Create a ColumnarOutputLog from the raw contents of a log.tsv file.
+
+        :param content:
+            Raw tab-separated contents of a log.tsv file.
+        :param filepath:
+            Optional path the contents belong to.
+        :param output_repo:
+            Optional output repository the contents were read from.
+        """
+        lines = [line.split("\t") for line in content.splitlines() if line]
+        return cls.from_list(lines, filepath=filepath, output_repo=output_repo)
+
+    @classmethod
+    def from_file(cls, filepath):
+        if not Path(filepath).exists():
+            return cls(filepath=filepath)
+
+        with open(filepath) as handle:
+            content = handle.read()
+        return cls.from_string(content, filepath=filepath)
+
+    @classmethod
+    def from_list(cls, entry_list: list[list[str]], filepath=None, output_repo: "OutputRepo" = None):
+        if not entry_list:
+            return cls(filepath=filepath, output_repo=output_repo)
+
+        header = [entry.lower().replace(" ", "_") for entry in entry_list[0]]
+        if len(header) < 9:
+            header.append("options_hash")
+
+        rows = entry_list[1:]
+        columns = {}
+        for column_index, key in enumerate(header):
+            values = [row[column_index] if column_index < len(row) else "" for row in rows]
+            columns[key] = np.array(values, dtype=str if key in cls._fixed_width_columns else object)
+
+        return cls(columns, filepath=filepath, output_repo=output_repo)
+
+    @property
+    def header(self) -> list[str]:
+        return list(self._columns.keys())
+
+    @property
+    def n_entries(self) -> int:
+        """int: Number of results stored in the repository."""
+        if not self._columns:
+            return 0
+        return len(next(iter(self._columns.values())))
+
+    def __len__(self):
+        return self.n_entries
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the array holding all values of a column."""
+        return self._columns[name]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """
+        np.ndarray: Time each run was recorded, parsed from the output branch names.
+
+        Rows whose branch name carries no timestamp are set to NaT.
+        """
+        if self._timestamps is None:
+            timestamps = []
+            for branch in self._columns.get("output_repo_branch", []):
+                match = self._timestamp_pattern.search(branch)
+                if match is None:
+                    timestamps.append("NaT")
+                else:
+                    date, hours, minutes, seconds = match.groups()
+                    timestamps.append(f"{date}T{hours}:{minutes}:{seconds}")
+            self._timestamps = np.array(timestamps, dtype="datetime64[s]")
+
+        return self._timestamps
+
+    def mask(
+        self,
+        options_hash: str = None,
+        project_repo_commit_hash: str = None,
+        branch_prefix: str = None,
+        since: datetime | str = None,
+        until: datetime | str = None,
+    ) -> np.ndarray:
+        """
+        Return a boolean array marking all rows matching the given criteria.
+
+        :param options_hash:
+            Only match runs recorded with this options hash.
+        :param project_repo_commit_hash:
+            Only match runs recorded at this project repo commit.
+        :param branch_prefix:
+            Only match runs whose output branch name starts with this prefix.
+        :param since:
+            Only match runs recorded at or after this time.
+        :param until:
+            Only match runs recorded at or before this time.
+        """
+        mask = np.ones(self.n_entries, dtype=bool)
+        if self.n_entries == 0:
+            return mask
+
+        if options_hash is not None:
+            mask &= self._columns["options_hash"] == options_hash
+        if project_repo_commit_hash is not None:
+            mask &= self._columns["project_repo_commit_hash"] == project_repo_commit_hash
+        if branch_prefix is not None:
+            mask &= np.char.startswith(self._columns["output_repo_branch"], branch_prefix)
+        if since is not None:
+            mask &= self.timestamps >= np.datetime64(since, "s")
+        if until is not None:
+            mask &= self.timestamps <= np.datetime64(until, "s")
+
+        return mask
+
+    def filter(self, **criteria) -> "ColumnarOutputLog":
+        """
+        Return a new ColumnarOutputLog holding only the rows matching the criteria.
+
+        Accepts the same keyword arguments as `mask`.
+        """
+        mask = self.mask(**criteria)
+        columns = {key: values[mask] for key, values in self._columns.items()}
+        instance = ColumnarOutputLog(columns, filepath=self._filepath, output_repo=self._output_repo)
+        if self._timestamps is not None:
+            instance._timestamps = self._timestamps[mask]
+        return instance
+
+    def row(self, position: int) -> LogEntry:
+        """Return the LogEntry of a row, creating it on first access."""
+        if position < 0:
+            position += self.n_entries
+
+        entry = self._entry_cache.get(position)
+        if entry is None:
+            values = {key: str(values[position]) for key, values in self._columns.items()}
+            entry = LogEntry(**values, filepath=self._filepath, output_repo=self._output_repo)
+            self._entry_cache[position] = entry
+
+        return entry
+
+    def __getitem__(self, position: int) -> LogEntry:
+        return self.row(position)
+
+    def __iter__(self):
+        for position in range(self.n_entries):
+            yield self.row(position)
+
+    @property
+    def entries(self) -> "ColumnarEntries":
+        """Read-only mapping of output branch to LogEntry, created lazily on access."""
+        if self._positions is None:
+            branches = self._columns.get("output_repo_branch", [])
+            # Like OutputLog.entries, later rows win for duplicated branch names.
+            self._positions = {str(branch): position for position, branch in enumerate(branches)}
+        return ColumnarEntries(self)
+
+    def __str__(self):
+        rows = zip(*self._columns.values()) if self._columns else []
+        return tabulate(list(rows), headers=self.header)
+
+    def __repr__(self):
+        return f"ColumnarOutputLog(n_entries={self.n_entries})"
+
+
+class ColumnarEntries(Mapping):
+    """Mapping view of the entries of a ColumnarOutputLog, keyed by output branch."""
+
+    def __init__(self, output_log: ColumnarOutputLog):
+        self._output_log = output_log
+
+    def __getitem__(self, output_repo_branch: str) -> LogEntry:
+        return self._output_log.row(self._output_log._positions[output_repo_branch])
+
+    def __iter__(self):
+        return iter(self._output_log._positions)
+
+    def __len__(self):
+        return len(self._output_log._positions)
+
+    def __contains__(self, output_repo_branch):
+        return output_repo_branch in self._output_log._positions
+
+
+class OutputLogIndex:
+    """
+    Lookup index over the entries of an OutputLog.
+
+    Buckets the recorded output branches by options hash and project repo commit hash, so
+    that finding the results of a run does not require scanning the whole log. The index
+    remembers the commit of the output repository's main branch it was built from, which
+    is used to decide whether a stored index is still valid.
+    """
+
+    def __init__(self, rows: list[tuple[str, str, str]] = None, main_commit_hash: str = None):
+        """
+        :param rows:
+            List of (output_repo_branch, options_hash, project_repo_commit_hash) tuples in
+            the order in which they were recorded.
+        :param main_commit_hash:
+            Commit hash of the output repository's main branch the rows were read from.
+        """
+        if rows is None:
+            rows = []
+
+        self.main_commit_hash = main_commit_hash
+        self._rows = [tuple(row) for row in rows]
+
+        self._positions = {row[0]: position for position, row in enumerate(self._rows)}
+        self._by_key = defaultdict(list)
+        self._by_options_hash = defaultdict(list)
+        self._by_commit_hash = defaultdict(list)
+        for position, (_, options_hash, commit_hash) in enumerate(self._rows):
+            self._by_key[(options_hash, commit_hash)].append(position)
+            self._by_options_hash[options_hash].append(position)
+            self._by_commit_hash[commit_hash].append(position)
+
+    def __len__(self):
+        return len(self._rows)
+
+    @classmethod
+    def from_output_log(cls, output_log: "OutputLog", main_commit_hash: str = None):
+        rows = [
+            (branch, entry.options_hash, entry.project_repo_commit_hash)
+            for branch, entry in output_log.entries.items()
+        ]
+        return cls(rows, main_commit_hash=main_commit_hash)
+
+    @classmethod
+    def from_columnar_output_log(cls, output_log: ColumnarOutputLog, main_commit_hash: str = None):
+        if output_log.n_entries == 0:
+            return cls(main_commit_hash=main_commit_hash)
+
+        # Collect through a dict to resolve duplicated branches the same way OutputLog does.
+        hashes = {}
+        for branch, options_hash, commit_hash in zip(
+            output_log.column("output_repo_branch").tolist(),
+            output_log.column("options_hash").tolist(),
+            output_log.column("project_repo_commit_hash").tolist(),
+        ):
+            hashes[branch] = (options_hash, commit_hash)
+
+        rows = [(branch, options_hash, commit_hash) for branch, (options_hash, commit_hash) in hashes.items()]
+        return cls(rows, main_commit_hash=main_commit_hash)
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Load an index from a json file.
+
+        :param filepath:
+            Path to the index file.
+        :return:
+            The stored index or None, if the file does not exist or can not be read.
+        """
+        try:
+            with open(filepath, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            return cls(data["rows"], main_commit_hash=data["main_commit_hash"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def dump(self, filepath):
+        """
+        Write the index to a json file.
+
+        The file is replaced atomically, so concurrent readers never see a partial index.
+        """
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = filepath.with_name(f"{filepath.name}.{os.getpid()}.tmp")
+        with open(temporary_path, "w", encoding="utf-8") as handle:
+            json.dump({"main_commit_hash": self.main_commit_hash, "rows": self._rows}, handle)
+        os.replace(temporary_path, filepath)
+
+    def hashes(self, output_repo_branch: str) -> tuple[str, str]:
+        """Return the (options_hash, project_repo_commit_hash) recorded for a branch."""
+        _, options_hash, commit_hash = self._rows[self._positions[output_repo_branch]]
+        return options_hash, commit_hash
+
+    def exact_matches(self, options_hash: str, commit_hash: str) -> list[str]:
+        """Return all branches recorded with both hashes, most recent first."""
+        positions = self._by_key.get((options_hash, commit_hash), [])
+        return [self._rows[position][0] for position in reversed(positions)]
+
+    def candidates(
+        self,
+        options_hash: str,
+        commit_hash: str,
+        allow_commit_hash_mismatch: bool = False,
+        allow_options_hash_mismatch: bool = False,
+    ) -> list[str]:
+        """
+        Return all branches that are acceptable for the given hashes, most recent first.
+
+        :param options_hash:
+            Options hash that should be matched.
+        :param commit_hash:
+            Project repo commit hash that should be matched.
+        :param allow_commit_hash_mismatch:
+            If True, include branches recorded at other commits.
+        :param allow_options_hash_mismatch:
+            If True, include branches recorded with other options.
+        """
+        if allow_commit_hash_mismatch and allow_options_hash_mismatch:
+            positions = range(len(self._rows))
+        elif allow_options_hash_mismatch:
+            positions = self._by_commit_hash.get(commit_hash, [])
+        elif allow_commit_hash_mismatch:
+            positions = self._by_options_hash.get(options_hash, [])
+        else:
+            positions = self._by_key.get((options_hash, commit_hash), [])
+
+        return [self._rows[position][0] for position in reversed(positions)]
@@ -6,6 +6,23 @@ from addict import Dict
 import numpy as np
 
 
+def short_hash(content: str) -> str:
+    """Hash a string with sha1 and encode it with an unambiguous base32 alphabet."""
+    hash_alphabet = "abcdefghjkmnpqrstvwxyz0123456789"
+    hash_base = len(hash_alphabet)
+
+    def to_base(number, base):
+        result = ""
+        while number:
+            result += hash_alphabet[number % base]
+            number //= base
+        return result[::-1] or "0"
+
+    base_16_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    base_10_hash = int(base_16_hash, 16)
+    return to_base(base_10_hash, hash_base)
+
+
 def remove_invalid_keys(dicti, excluded_keys=None):
     if excluded_keys is None:
         excluded_keys = []
@@ -96,22 +113,7 @@ class Options(Dict):
             indent=None,
             separators=(',', ':'),
         )
-
-        hash_alphabet = "abcdefghjkmnpqrstvwxyz0123456789"
-        hash_base = len(hash_alphabet)
-
-        def to_base(number, base):
-            result = ""
-            while number:
-                result += hash_alphabet[number % base]
-                number //= base
-            return result[::-1] or "0"
-
-        base_16_hash = hashlib.sha1(dump.encode('utf-8')).hexdigest()
-        base_10_hash = int(base_16_hash, 16)
-        base_32_hash = to_base(base_10_hash, hash_base)
-
-        return base_32_hash
+        return short_hash(dump)
 
     def __eq__(self, other):
         if not isinstance(other, Options):
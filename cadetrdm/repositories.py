@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import contextlib
+import contextvars
 import csv
 from functools import wraps
-import glob
 import importlib
 import json
 import os
@@ -12,13 +12,17 @@ import sys
 import traceback
 import warnings
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from stat import S_IREAD, S_IWRITE
 import tarfile
 import tempfile
+import threading
+import time
 from types import ModuleType
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Iterable
 from urllib.request import urlretrieve
 import uuid
 
@@ -26,11 +30,14 @@ from semantic_version import Version
 
 import cadetrdm
 from cadetrdm import Options
-from cadetrdm.io_utils import delete_path, test_for_lfs
+from cadetrdm.cache import ResultsCache, LazyResults
+from cadetrdm.environment_snapshot import EnvironmentSnapshot, take_environment_snapshot
+from cadetrdm.io_utils import delete_path, test_for_lfs, FileLock
 from cadetrdm.io_utils import recursive_chmod, write_lines_to_file, wait_for_user, init_lfs
 from cadetrdm.jupyter_functionality import Notebook
-from cadetrdm.logging import OutputLog, LogEntry
+from cadetrdm.logging import OutputLog, ColumnarOutputLog, OutputLogIndex, LogEntry
 from cadetrdm.remote_integration import GitHubRemote, GitLabRemote
+from cadetrdm.results_view import ResultsPath
 from cadetrdm.web_utils import ssh_url_to_http_url
 
 try:
@@ -40,6 +47,87 @@ except ImportError:
     raise ImportError("No module named git, please install the gitpython package")
 
 
+# Time of the last fetch per repository path, shared by all GitRepo instances of this process.
+_last_fetch_times: dict[str, float] = {}
+# Repositories fetched within each active fetch_once() context.
+_fetch_once_sessions: list[set[str]] = []
+_fetch_registry_lock = threading.Lock()
+
+
+# Default of ProjectRepo(use_worktrees=None) set by worktree_mode() for the current thread.
+_worktree_mode: contextvars.ContextVar[bool | None] = contextvars.ContextVar("worktree_mode", default=None)
+
+
+@contextlib.contextmanager
+def worktree_mode(use_worktrees: bool):
+    """
+    Context in which ProjectRepo instances created by the current thread use worktrees or not.
+
+    Unlike the CADET_RDM_USE_WORKTREES environment variable, this does not change the mode
+    of ProjectRepo instances created by other threads.
+
+    :param use_worktrees:
+        Default for the use_worktrees argument of ProjectRepo within the context.
+    """
+    token = _worktree_mode.set(use_worktrees)
+    try:
+        yield
+    finally:
+        _worktree_mode.reset(token)
+
+
+@contextlib.contextmanager
+def fetch_once():
+    """
+    Context in which every repository is fetched from its remotes at most once.
+
+    Further calls to GitRepo.fetch and GitRepo.update for an already fetched repository
+    only compare against the remote refs fetched before. Used to look up many cases
+    against the same project repository with a single fetch.
+    """
+    fetched_paths = set()
+    with _fetch_registry_lock:
+        _fetch_once_sessions.append(fetched_paths)
+    try:
+        yield
+    finally:
+        with _fetch_registry_lock:
+            _fetch_once_sessions.remove(fetched_paths)
+
+
+@dataclass
+class PushResult:
+    """
+    Outcome of pushing one repository to one remote.
+
+    :param repository:
+        Path of the pushed repository.
+    :param remote:
+        Name of the remote.
+    :param refspecs:
+        Refspecs that were pushed.
+    :param success:
+        True if the push succeeded.
+    :param attempts:
+        Number of push attempts.
+    :param error:
+        Error message of the last attempt if the push failed.
+    """
+    repository: Path
+    remote: str
+    refspecs: list[str] = field(default_factory=list)
+    success: bool = True
+    attempts: int = 0
+    error: str | None = None
+
+    def __str__(self):
+        if self.success:
+            return f"Pushed {len(self.refspecs)} refs of {self.repository} to {self.remote}."
+        return (
+            f"Pushing {self.repository} to {self.remote} failed after {self.attempts} attempts:\n{self.error}"
+        )
+
+
 def validate_is_output_repo(path_to_repo):
     with open(os.path.join(path_to_repo, ".cadet-rdm-data.json"), "r", encoding="utf-8") as file_handle:
         rdm_data = json.load(file_handle)
@@ -75,6 +163,8 @@ class GitRepo:
 
         self._most_recent_branch = self.active_branch.name
         self._earliest_commit = None
+        # GitPython's persistent cat-file processes are not thread-safe.
+        self._object_read_lock = threading.RLock()
 
         existing_branches = [branch.name for branch in self._git_repo.branches]
         if len(existing_branches) != 0 and "main" not in existing_branches and "master" in existing_branches:
@@ -126,6 +216,50 @@ class GitRepo:
     def current_commit_hash(self):
         return str(self.head.commit)
 
+    @property
+    def main_commit_hash(self) -> str | None:
+        """Commit hash the main branch points to, or None if it has no commits yet."""
+        return self.resolve(f"{self.main_branch}^{{commit}}")
+
+    def resolve(self, revision: str) -> str | None:
+        """
+        Resolve a revision such as a branch, a commit or "<branch>:<path>" to an object hash.
+
+        Uses a long-lived `git cat-file --batch-check` process instead of spawning
+        `git rev-parse` for every call.
+
+        :param revision:
+            Revision to resolve.
+        :return:
+            Hash of the object, or None if the revision does not exist.
+        """
+        with self._object_read_lock:
+            try:
+                hexsha, _, _ = self._git.get_object_header(revision)
+            except ValueError:
+                return None
+        return hexsha.decode()
+
+    def read_object(self, revision: str) -> bytes | None:
+        """
+        Read the content of an object, e.g. of a blob given as "<branch>:<path>".
+
+        Uses a long-lived `git cat-file --batch` process instead of spawning a git process
+        for every read. The content is returned exactly as stored, without applying filters
+        such as git-lfs.
+
+        :param revision:
+            Revision of the object to read.
+        :return:
+            Content of the object, or None if the revision does not exist.
+        """
+        with self._object_read_lock:
+            try:
+                _, _, _, content = self._git.get_object_data(revision)
+            except ValueError:
+                return None
+        return content
+
     @property
     def path(self):
         return Path(self._git_repo.working_dir)
@@ -178,55 +312,90 @@ class GitRepo:
 
     @property
     def has_changes_upstream(self):
+        return self.check_for_changes_upstream()
+
+    def check_for_changes_upstream(self, max_age: float | None = None) -> bool:
+        """
+        Fetch from the first remote and check if it has commits the active branch lacks.
+
+        :param max_age:
+            Maximum age in seconds of a previous fetch to reuse, see fetch().
+        :return:
+            True if the active branch is behind its upstream branch.
+        """
         if len(self.remotes) == 0:
             return False
 
         try:
             remote = self.remotes[0]
-            remote_branches = remote.fetch()
-            correct_remote_branches = [
-                remote_branch for remote_branch in remote_branches
-                if remote_branch.name == f"{remote.name}/{self.active_branch.name}"
-            ]
-
-            if len(correct_remote_branches) > 1:
-                raise RuntimeError(
-                    f"Remote has multiple branches matching local branch {self.active_branch.name}: "
-                    f"{[branch.name for branch in correct_remote_branches]}"
-                )
-
-            if not correct_remote_branches:
+            self.fetch(max_age=max_age)
+            remote_hash = self.resolve(f"refs/remotes/{remote.name}/{self.active_branch.name}^{{commit}}")
+            if remote_hash is None:
                 print(f"Branch {self.active_branch.name} does not exist upstream yet.")
                 return False
 
-            remote_hash = str(correct_remote_branches[0].commit)
-
-            if self.current_commit_hash != remote_hash and remote_hash not in self.log:
-                return True
-            elif self.current_commit_hash != remote_hash and remote_hash in self.log:
-                print("Local repository is ahead of remote. This could be due to CADET-RDM version updates.")
+            if self.current_commit_hash == remote_hash:
                 return False
+            elif not self.is_ancestor(remote_hash):
+                return True
             else:
+                print("Local repository is ahead of remote. This could be due to CADET-RDM version updates.")
                 return False
 
         except git.GitCommandError:
             traceback.print_exc()
             return False
 
-    def fetch(self):
+    def fetch(self, max_age: float | None = None) -> bool:
+        """
+        Fetch from the first remote, unless its refs are still fresh.
+
+        The refs are considered fresh if this repository was fetched within the current
+        fetch_once() context or less than max_age seconds ago.
+
+        :param max_age:
+            Maximum age in seconds of a previous fetch to reuse. If None, only fetches
+            within a fetch_once() context are reused.
+        :return:
+            True if a fetch was run.
+        """
         if len(self.remotes) == 0:
-            return
-        self._git.fetch()
+            return False
+
+        key = str(Path(self._git_repo.common_dir).resolve())
+        with _fetch_registry_lock:
+            last_fetch_time = _last_fetch_times.get(key)
+            is_fresh = (
+                any(key in session for session in _fetch_once_sessions)
+                or max_age is not None and last_fetch_time is not None
+                and time.monotonic() - last_fetch_time < max_age
+            )
+            if is_fresh:
+                for session in _fetch_once_sessions:
+                    session.add(key)
+                return False
+
+        self._git.fetch(self.remotes[0].name)
+
+        with _fetch_registry_lock:
+            _last_fetch_times[key] = time.monotonic()
+            for session in _fetch_once_sessions:
+                session.add(key)
+        return True
+
+    def update(self, max_age: float | None = None):
+        """
+        Fetch from the remote and pull if there are new changes upstream.
 
-    def update(self):
+        :param max_age:
+            Maximum age in seconds of a previous fetch to reuse, see fetch().
+        """
         if len(self.remotes) == 0:
             print(f"No remote configured for repo at {self.path}. Skipping update.")
             return
 
         try:
-            self.fetch()
-
-            if self.has_changes_upstream:
+            if self.check_for_changes_upstream(max_age=max_age):
                 print(f"New changes detected in {self.remotes[0]}, pulling updates...")
                 self.remotes[0].pull(rebase=True)
                 self._git.reset(["--hard", f"{self.remotes[0]}/{self.active_branch}"])
@@ -236,7 +405,14 @@ class GitRepo:
             print(f"Git command error in {self.path}: {e}")
 
     @classmethod
-    def clone(cls, url: str, to_path: str | Path = None, multi_options: Optional[List[str]] = None, **kwargs):
+    def clone(
+        cls,
+        url: str,
+        to_path: str | Path = None,
+        multi_options: Optional[List[str]] = None,
+        repo_kwargs: dict | None = None,
+        **kwargs
+    ):
         """
         Clone a remote repository
 
@@ -246,6 +422,8 @@ class GitRepo:
             One option per list item which is passed exactly as specified to clone.
             For example: ['--config core.filemode=false', '--config core.ignorecase',
             '--recurse-submodule=repo1_path', '--recurse-submodule=repo2_path']
+        :param repo_kwargs:
+            Optional kwargs handed to the constructor of the cloned repository.
         :return:
         """
 
@@ -270,7 +448,7 @@ class GitRepo:
         finally:
             cls._git_environ_reset(previous_environment_variables)
 
-        instance = cls(to_path)
+        instance = cls(to_path, **(repo_kwargs or {}))
         return instance
 
     @staticmethod
@@ -365,6 +543,38 @@ class GitRepo:
     def log(self):
         return self._git.log()
 
+    def is_ancestor(self, ancestor: str, descendant: str = "HEAD") -> bool:
+        """
+        Check whether a commit is an ancestor of (or equal to) another commit.
+
+        :param ancestor:
+            Commit, branch or ref that might be an ancestor.
+        :param descendant:
+            Commit, branch or ref to check against. Defaults to HEAD.
+        """
+        try:
+            self._git.merge_base("--is-ancestor", ancestor, descendant)
+        except git.GitCommandError as e:
+            if e.status == 1:
+                return False
+            raise
+        return True
+
+    def ahead_behind(self, upstream: str, local: str = "HEAD") -> tuple[int, int]:
+        """
+        Count the commits by which a local commit and an upstream commit have diverged.
+
+        :param upstream:
+            Upstream commit, branch or ref, e.g. "origin/main".
+        :param local:
+            Local commit, branch or ref. Defaults to HEAD.
+        :return:
+            Tuple of the number of commits only in local (ahead) and only in upstream (behind).
+        """
+        counts = self._git.rev_list("--left-right", "--count", f"{local}...{upstream}")
+        ahead, behind = counts.split()
+        return int(ahead), int(behind)
+
     def log_oneline(self):
         return self._git.log("--oneline")
 
@@ -414,7 +624,15 @@ class GitRepo:
         if self.has_uncomitted_changes:
             raise RuntimeError(f"Found uncommitted changes in the repository {self.path}.")
 
-    def push(self, remote=None, local_branch=None, remote_branch=None, push_all=True):
+    def push(
+        self,
+        remote=None,
+        local_branch=None,
+        remote_branch=None,
+        push_all=True,
+        parallel=False,
+        retries=2,
+    ):
         """
         Push local branch to remote.
 
@@ -424,7 +642,15 @@ class GitRepo:
             Name of the local branch to push.
         :param remote_branch:
             Name of the remote branch to push to.
+        :param push_all:
+            If True, push all branches and, for project repositories, the output repository as well.
+        :param parallel:
+            If True, push to all remotes, and the project and output repositories, at the same time.
+            Only branches that changed since they were last pushed to a remote are pushed.
+        :param retries:
+            Number of times a failed push is retried in parallel mode. Rejected pushes are not retried.
         :return:
+            In parallel mode, one PushResult per repository and remote.
         """
         if local_branch is None:
             local_branch = self.active_branch
@@ -437,6 +663,27 @@ class GitRepo:
         else:
             remote_list = [remote]
 
+        if parallel:
+            return self._push_in_parallel(remote_list, local_branch, remote_branch, push_all, retries)
+
+        self._pull_before_push(remote_list, local_branch, push_all)
+
+        for remote in remote_list:
+            remote_interface = self._git_repo.remotes[remote]
+
+            if push_all:
+                push_results = remote_interface.push(all=True)
+            else:
+                push_results = remote_interface.push(refspec=f'{local_branch}:{remote_branch}')
+
+            for push_res in push_results:
+                print(push_res.summary)
+
+        if hasattr(self, "output_repo") and push_all:
+            self.output_repo.push()
+
+    def _pull_before_push(self, remote_list, local_branch, push_all):
+        """Rebase the main branch onto the remotes before pushing it."""
         if local_branch == self.main_branch or push_all:
             if push_all:
                 self.checkout(self.main_branch)
@@ -448,19 +695,101 @@ class GitRepo:
                     print("Pulling from this remote failed with the following error:")
                     print(e)
 
-        for remote in remote_list:
-            remote_interface = self._git_repo.remotes[remote]
+    def _push_in_parallel(self, remote_list, local_branch, remote_branch, push_all, retries) -> list[PushResult]:
+        """
+        Push this repository, and its output repository if push_all, to all remotes concurrently.
 
-            if push_all:
-                push_results = remote_interface.push(all=True)
+        The main branches are rebased onto their remotes first, one thread per repository.
+        Then one push per repository and remote runs at the same time.
+        """
+        targets = [(self, remote_list)]
+        if hasattr(self, "output_repo") and push_all:
+            output_remotes = [str(remote.name) for remote in self.output_repo.remotes]
+            if len(output_remotes) == 0:
+                print(f"No remote has been set for {self.output_repo.path} yet. Skipping it.")
             else:
-                push_results = remote_interface.push(refspec=f'{local_branch}:{remote_branch}')
+                targets.append((self.output_repo, output_remotes))
+
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            list(pool.map(
+                lambda target: target[0]._pull_before_push(target[1], local_branch, push_all), targets
+            ))
+
+        jobs = []
+        for repo, remotes in targets:
+            for remote in remotes:
+                if push_all:
+                    changed_branches = repo._branches_changed_since_push(remote)
+                    if changed_branches:
+                        jobs.append((repo, remote, changed_branches))
+                else:
+                    jobs.append((repo, remote, {f"{local_branch}:{remote_branch}": None}))
 
-            for push_res in push_results:
-                print(push_res.summary)
+        if not jobs:
+            print("Everything up-to-date.")
+            return []
 
-        if hasattr(self, "output_repo") and push_all:
-            self.output_repo.push()
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(
+                lambda job: job[0]._push_refspecs(job[1], job[2], retries=retries), jobs
+            ))
+
+        for result in results:
+            print(result)
+        return results
+
+    def _branches_changed_since_push(self, remote: str) -> dict[str, str]:
+        """
+        Local branches that differ from their remote-tracking branch on the given remote.
+
+        :return:
+            Refspecs of the changed branches mapped to the commit they push.
+        """
+        refs = self._git.for_each_ref(
+            "--format=%(refname) %(objectname)", "refs/heads", f"refs/remotes/{remote}"
+        ).splitlines()
+        commits = dict(line.split(" ", 1) for line in refs)
+        remote_prefix = f"refs/remotes/{remote}/"
+        return {
+            f"{ref}:{ref}": commit for ref, commit in commits.items()
+            if ref.startswith("refs/heads/")
+            and commits.get(remote_prefix + ref[len("refs/heads/"):]) != commit
+        }
+
+    def _push_refspecs(self, remote: str, refspecs: dict[str, str | None], retries: int = 2) -> PushResult:
+        """
+        Push refspecs to a remote, retrying failed pushes that were not rejected.
+
+        :param remote:
+            Name of the remote.
+        :param refspecs:
+            Refspecs mapped to the commit they push, if known. Remote-tracking branches
+            are moved to these commits after a successful push.
+        :param retries:
+            Number of retries after a failed push.
+        """
+        result = PushResult(self.path, remote, list(refspecs))
+        for attempt in range(retries + 1):
+            result.attempts = attempt + 1
+            try:
+                self._git.push("--porcelain", remote, *refspecs)
+            except git.GitCommandError as e:
+                result.success = False
+                result.error = f"{e.stdout}\n{e.stderr}".strip()
+                if "rejected" in result.error:
+                    break
+                if attempt < retries:
+                    time.sleep(2 ** attempt)
+                continue
+
+            result.success = True
+            result.error = None
+            for refspec, commit in refspecs.items():
+                if commit is not None and refspec.startswith("refs/heads/"):
+                    branch = refspec.split(":", 1)[0][len("refs/heads/"):]
+                    self._git.update_ref(f"refs/remotes/{remote}/{branch}", commit)
+            break
+        return result
 
     def delete_active_branch_if_branch_is_empty(self):
         """
@@ -471,7 +800,7 @@ class GitRepo:
         if previous_branch == self.main_branch:
             return
 
-        commit_of_current_main = str(self._git.rev_parse(self.main_branch))
+        commit_of_current_main = self.main_commit_hash
         commit_of_current_branch = str(self.head.commit)
         if commit_of_current_branch == commit_of_current_main:
             print("Removing empty branch", previous_branch)
@@ -751,52 +1080,73 @@ class BaseRepo(GitRepo):
 
     def dump_package_list(self, target_folder):
         """
-        Use "conda env export" and "pip freeze" to create environment.yml and pip_requirements.txt files.
+        Write conda environment.yml and pip requirements.txt files describing the current environment.
+
+        The files match the output of "conda env export" and "pip freeze", but are created from the
+        installed package metadata, see take_environment_snapshot.
         """
         if target_folder is not None:
             dump_path = target_folder
         else:
             dump_path = self.path
-        print("Dumping conda environment.yml, this might take a moment.")
-        try:
-            os.system(f"conda env export > {dump_path}/conda_environment.yml")
-            print("Dumping conda independent environment.yml, this might take a moment.")
-            os.system(f"conda env export --from-history > {dump_path}/conda_independent_environment.yml")
-        except Exception as e:
-            print("Could not dump conda environment due to the following error:")
-            print(e)
-        print("Dumping pip requirements.txt.")
-        os.system(f"pip freeze > {dump_path}/pip_requirements.txt")
-        print("Dumping pip independent requirements.txt.")
-        os.system(f"pip list --not-required --format freeze > {dump_path}/pip_independent_requirements.txt")
+        print("Dumping conda and pip environment files.")
+        take_environment_snapshot().write(dump_path)
 
     def add_list_of_remotes_in_readme_file(self, repo_identifier: str, remotes_url_list: list):
         if len(remotes_url_list) > 0:
-            remotes_url_list_http = [ssh_url_to_http_url(remote)
-                                     for remote in remotes_url_list]
-            output_link_line = " and ".join(f"[{repo_identifier}]({output_repo_remote})"
-                                            for output_repo_remote in remotes_url_list_http) + "\n"
-
             readme_filepath = self.path / "README.md"
             with open(readme_filepath, "r", encoding="utf-8") as file_handle:
                 filelines = file_handle.readlines()
-                filelines_giving_output_repo = [i for i in range(len(filelines))
-                                                if filelines[i].strip().startswith(f"[{repo_identifier}](")]
-                if len(filelines_giving_output_repo) == 1:
-                    line_to_be_modified = filelines_giving_output_repo[0]
-                    filelines[line_to_be_modified] = output_link_line
-                elif len(filelines_giving_output_repo) == 0:
-                    filelines.append("The output repository can be found at:\n") #method can be used for project and output repositories, "the corresponding repository can be found at... would be better"
-                    filelines.append(output_link_line)
-                else:
-                    raise RuntimeError(f"Multiple lines in the README.md at {readme_filepath}"
-                                       f" link to the {repo_identifier}. "
-                                       "Can't automatically update the link.")
+
+            filelines = self._link_remotes_in_readme_lines(
+                filelines, repo_identifier, remotes_url_list, readme_filepath
+            )
 
             with open(readme_filepath, "w", encoding="utf-8") as file_handle:
                 file_handle.writelines(filelines)
             self.add(readme_filepath)
 
+    @staticmethod
+    def _link_remotes_in_readme_lines(
+        filelines: list[str],
+        repo_identifier: str,
+        remotes_url_list: list,
+        readme_filepath: os.PathLike | str = "README.md",
+    ) -> list[str]:
+        """
+        Replace or append the line of a README linking to the remotes of a repository.
+
+        :param filelines:
+            Lines of the README, including line endings.
+        :param repo_identifier:
+            Link text of the line, e.g. "Link to Project Repository".
+        :param remotes_url_list:
+            Remote URLs to link to.
+        :param readme_filepath:
+            Path of the README, used in error messages.
+        :return:
+            Updated lines of the README.
+        """
+        remotes_url_list_http = [ssh_url_to_http_url(remote)
+                                 for remote in remotes_url_list]
+        output_link_line = " and ".join(f"[{repo_identifier}]({output_repo_remote})"
+                                        for output_repo_remote in remotes_url_list_http) + "\n"
+
+        filelines = list(filelines)
+        filelines_giving_output_repo = [i for i in range(len(filelines))
+                                        if filelines[i].strip().startswith(f"[{repo_identifier}](")]
+        if len(filelines_giving_output_repo) == 1:
+            line_to_be_modified = filelines_giving_output_repo[0]
+            filelines[line_to_be_modified] = output_link_line
+        elif len(filelines_giving_output_repo) == 0:
+            filelines.append("The output repository can be found at:\n") #method can be used for project and output repositories, "the corresponding repository can be found at... would be better"
+            filelines.append(output_link_line)
+        else:
+            raise RuntimeError(f"Multiple lines in the README.md at {readme_filepath}"
+                               f" link to the {repo_identifier}. "
+                               "Can't automatically update the link.")
+        return filelines
+
 
 class ProjectRepo(BaseRepo):
     def __init__(
@@ -808,6 +1158,10 @@ class ProjectRepo(BaseRepo):
         url: str = None,
         branch: str = None,
         package_dir: str | None = None,
+        use_worktrees: bool | None = None,
+        cache_max_size: int | str | None = None,
+        single_branch_output: bool = False,
+        output_ref_prefix: str | None = None,
          *args: Any,
          **kwargs: Any,
      ) -> None:
@@ -831,6 +1185,21 @@ class ProjectRepo(BaseRepo):
             Optional branch to check out upon initialization
         :param package_dir:
             Name of the directory containing the main package.
+        :param use_worktrees:
+            If True, results of every tracked run are written to a separate git worktree
+            of the output repository instead of checking out branches in its working tree.
+            This allows several runs to be tracked at the same time. Defaults to the mode set
+            with worktree_mode() in the current thread, which CaseBatch uses while running
+            cases concurrently, and otherwise to the CADET_RDM_USE_WORKTREES environment variable.
+        :param cache_max_size:
+            Optional budget for the size of the results cache in bytes, or a string like "10G".
+            If set, least recently used branches are evicted from the cache when caching results.
+        :param single_branch_output:
+            If the output repository needs to be cloned, only clone its main branch. Result
+            branches are then fetched one at a time, with a shallow history, when loaded.
+        :param output_ref_prefix:
+            If the output repository needs to be cloned, additionally track the result branches
+            starting with this prefix. Implies single_branch_output.
         :param args:
             Additional args to be handed to BaseRepo.
         :param kwargs:
@@ -862,7 +1231,7 @@ class ProjectRepo(BaseRepo):
 
         if not (self.path / self.output_directory).exists():
             print("Output repository was missing, cloning now.")
-            self._clone_output_repo()
+            self._clone_output_repo(single_branch=single_branch_output, ref_prefix=output_ref_prefix)
 
         self.output_repo = OutputRepo(
             self.path / self.output_directory,
@@ -872,6 +1241,15 @@ class ProjectRepo(BaseRepo):
         self._on_context_enter_commit_hash = None
         self._is_in_context_manager = False
 
+        if use_worktrees is None:
+            use_worktrees = _worktree_mode.get()
+        if use_worktrees is None:
+            use_worktrees = os.environ.get("CADET_RDM_USE_WORKTREES", "0").lower() in ("1", "true", "yes")
+        self._use_worktrees = use_worktrees
+        self._results_worktree = None
+        self._log_commit_attempts = 5
+        self._cache_max_size = cache_max_size
+
         if branch is not None:
             self.checkout(branch)
 
@@ -959,7 +1337,30 @@ class ProjectRepo(BaseRepo):
 
         return changes_were_made
 
-    def _clone_output_repo(self, multi_options: List[str] = None):
+    def _clone_output_repo(
+        self,
+        multi_options: List[str] = None,
+        single_branch: bool = False,
+        ref_prefix: str | None = None,
+    ):
+        """
+        Clone the output repository from the first reachable output remote.
+
+        :param multi_options:
+            Options handed to git clone. Defaults to a partial clone without blobs.
+        :param single_branch:
+            If True, only clone the main branch. Result branches are fetched individually
+            when they are loaded. Added to multi_options if they do not contain it.
+        :param ref_prefix:
+            Optional prefix of result branches that are fetched along with the main branch,
+            e.g. "2024-". Implies single_branch.
+        """
+        single_branch = single_branch or ref_prefix is not None
+        multi_options = ["--filter=blob:none"] if multi_options is None else list(multi_options)
+        if single_branch and "--no-single-branch" in multi_options:
+            raise ValueError("single_branch conflicts with the --no-single-branch clone option.")
+        if single_branch and "--single-branch" not in multi_options:
+            multi_options.append("--single-branch")
         output_remotes = self.metadata["output_remotes"]
         output_path = self.path / output_remotes["output_directory_name"]
         ssh_remotes = list(output_remotes["output_remotes"].values())
@@ -968,9 +1369,14 @@ class ProjectRepo(BaseRepo):
         for output_remote in ssh_remotes:
             try:
                 print(f"Attempting to clone {output_remote} into {output_path}")
-                if multi_options is None:
-                    multi_options = ["--filter=blob:none"]
-                _ = OutputRepo.clone(output_remote, output_path, multi_options=multi_options)
+                output_repo = OutputRepo.clone(output_remote, output_path, multi_options=multi_options)
+                if ref_prefix is not None:
+                    remote_name = output_repo.remotes[0].name
+                    output_repo._git.config(
+                        "--add", f"remote.{remote_name}.fetch",
+                        f"+refs/heads/{ref_prefix}*:refs/remotes/{remote_name}/{ref_prefix}*"
+                    )
+                    output_repo._git.fetch(remote_name)
                 break
             except Exception:
                 traceback.print_exc()
@@ -1095,26 +1501,25 @@ class ProjectRepo(BaseRepo):
         Dumps all the metadata information about the project repositories state and
         the commit hash and branch name of the ouput repository into the main branch of
         the output repository.
-        This is the write path for the output log: it intentionally checks out the
-        output repository's main branch, updates the run history, commits it, and then
-        returns to the result branch.
+        This is the write path for the output log. The run history is written to a staging
+        directory and committed onto the main branch through a temporary index, so neither
+        the working tree of the output repository nor the result branch checked out in it
+        are touched.
         :param output_dict:
         Dictionary containing key-value pairs to be added to the log.
         """
         if output_dict is None:
             output_dict = {}
 
-        output_branch_name = str(self.output_repo.active_branch)
+        results_repo = self._results_repo
+        output_branch_name = str(results_repo.active_branch)
 
-        output_repo_hash = str(self.output_repo.head.commit)
-        output_commit_message = self.output_repo.active_branch.commit.message
+        output_repo_hash = str(results_repo.head.commit)
+        output_commit_message = results_repo.active_branch.commit.message
         output_commit_message = output_commit_message.replace("\n", "; ")
 
-        self.output_repo._git.checkout(self.output_repo.main_branch)
-
-        logs_dir = self.output_repo.path / "run_history" / output_branch_name
-        if not logs_dir.exists():
-            os.makedirs(logs_dir)
+        print("Capturing the conda and pip environment.")
+        environment_snapshot = take_environment_snapshot()
 
         entry = LogEntry(
             output_repo_commit_message=output_commit_message,
@@ -1127,33 +1532,87 @@ class ProjectRepo(BaseRepo):
             python_sys_args=str(sys.argv),
             tags=", ".join(self.tags),
             options_hash=options.get_hash() if options else None,
+            environment_hash=environment_snapshot.get_hash(),
             filepath=None,
             **output_dict
         )
 
+        output_repo = self.output_repo
+        with tempfile.TemporaryDirectory(prefix="cadet-rdm-") as staging_dir:
+            staging_dir = Path(staging_dir)
+            self._write_run_history(staging_dir, entry, options, environment_snapshot)
+
+            # The log commit is built on top of the current main commit. If main is moved by
+            # someone not holding the lock in the meantime, the log is rebuilt and committed again.
+            for attempt in range(1, self._log_commit_attempts + 1):
+                with output_repo.lock():
+                    parent_commit = output_repo.main_commit_hash
+                    # The log is not parsed, only the new row is appended to the copy from main.
+                    # git stores log.tsv as a single blob though, so the whole file is still
+                    # written and hashed when it is committed.
+                    log_file = staging_dir / "log.tsv"
+                    log_content = output_repo.read_blob(parent_commit, "log.tsv")
+                    if log_content is not None:
+                        log_file.write_bytes(log_content)
+                    elif log_file.exists():
+                        log_file.unlink()
+                    OutputLog.append_entry(log_file, entry)
+
+                    try:
+                        output_repo.commit_directory_to_main(
+                            staging_dir,
+                            message=f"log for '{output_commit_message}' of branch '{output_branch_name}'",
+                            parent_commit=parent_commit,
+                        )
+                        break
+                    except git.GitCommandError:
+                        if attempt == self._log_commit_attempts or output_repo.main_commit_hash == parent_commit:
+                            raise
+                print("Main branch of the output repository was updated concurrently, retrying log commit.")
+
+        self._most_recent_branch = output_branch_name
+
+    def _write_run_history(
+        self,
+        staging_dir: Path,
+        entry: LogEntry,
+        options: Options | None = None,
+        environment_snapshot: EnvironmentSnapshot | None = None,
+    ):
+        """
+        Write the run history files of a run into a directory mirroring the main branch.
+
+        Metadata, options and code go to run_history/<branch>. The environment files go
+        to environments/<environment_hash>, which is shared by all runs in the same
+        environment, so recording a run in a known environment adds no new files.
+
+        :param staging_dir:
+            Directory whose contents are committed onto the main branch.
+        :param entry:
+            LogEntry describing the run.
+        :param options:
+            Optional case options.
+        :param environment_snapshot:
+            Environment of the run. Defaults to the current environment.
+        """
+        logs_dir = staging_dir / "run_history" / entry.output_repo_branch
+        if not logs_dir.exists():
+            os.makedirs(logs_dir)
+
         with open(logs_dir / "metadata.json", "w", encoding="utf-8") as f:
             json.dump(entry.to_dict(), f, indent=2)
 
         if options:
             options.dump_json_file(logs_dir / "options.json", indent=2)
 
-        log = OutputLog(self.output_log_file)
-        log.entries[output_branch_name] = entry
-        log.write()
-
-        self.dump_package_list(logs_dir)
+        if environment_snapshot is None:
+            environment_snapshot = take_environment_snapshot()
+        environment_dir = staging_dir / "environments" / environment_snapshot.get_hash()
+        environment_dir.mkdir(parents=True, exist_ok=True)
+        environment_snapshot.write(environment_dir)
 
         self._copy_code(logs_dir)
 
-        self.output_repo.add(".")
-        self.output_repo._git.commit(
-            "-m",
-            f"log for '{output_commit_message}' of branch '{output_branch_name}'",
-        )
-
-        self.output_repo._git.checkout(output_branch_name)
-        self._most_recent_branch = output_branch_name
-
     def _copy_code(self, target_path):
         """
         Clone only the current branch of the project repo to the target_path
@@ -1195,6 +1654,15 @@ class ProjectRepo(BaseRepo):
             super().commit(message="Update remote links", verbosity=1)
 
         # update urls in main branch of output_repo
+        if self._use_worktrees:
+            if self.output_repo.readme_links_remotes("Link to Project Repository", self.remote_urls):
+                return
+            with self.output_repo.main_worktree() as main_worktree:
+                main_worktree.add_list_of_remotes_in_readme_file("Link to Project Repository", self.remote_urls)
+                if commit:
+                    main_worktree.commit(message="Update remote links", verbosity=1)
+            return
+
         self.output_repo._git.checkout(self.output_repo.main_branch)
         self.output_repo.add_list_of_remotes_in_readme_file("Link to Project Repository", self.remote_urls)
         if commit:
@@ -1225,16 +1693,18 @@ class ProjectRepo(BaseRepo):
         absolute_file_path = self.output_data(file_path)
         return urlretrieve(url, absolute_file_path)
 
-    def input_data(self, branch_name: str) -> Path:
+    def input_data(self, branch_name: str, lazy: bool = False) -> Path | LazyResults:
         """
         Load previously generated results to iterate upon. Copies entire branch of output repo
         to the output_cached / branch_name directory.
         :param branch_name:
             Name of the branch of the output repository in which the results are stored.
+        :param lazy:
+            If True, return a LazyResults handle that only copies the files that are accessed.
         :return:
             Absolute path to the newly copied directory.
         """
-        cached_branch_path = self.copy_data_to_cache(branch_name)
+        cached_branch_path = self.copy_data_to_cache(branch_name, lazy=lazy)
 
         return cached_branch_path
 
@@ -1249,10 +1719,18 @@ class ProjectRepo(BaseRepo):
         :param sub_path:
         :return:
         """
+        output_path = self._results_repo.path.absolute()
         if sub_path is None:
-            return self.output_repo.path.absolute()
+            return output_path
         else:
-            return self.output_repo.path.absolute() / sub_path
+            return output_path / sub_path
+
+    @property
+    def _results_repo(self) -> OutputRepo:
+        """The output repository, or the worktree of it that receives the current results."""
+        if self._results_worktree is not None:
+            return self._results_worktree
+        return self.output_repo
 
     def remove_cached_files(self):
         """
@@ -1269,12 +1747,16 @@ class ProjectRepo(BaseRepo):
         :param commit_message:
         :return:
         """
-        new_branch_name = self._get_new_output_branch(force=True)
-        if Path(source_path).is_dir():
-            shutil.copytree(source_path, self.output_path / Path(source_path).name)
-        else:
-            shutil.copy(source_path, self.output_path)
-        self._commit_output_data(commit_message, output_dict={})
+        self._acquire_output_lock()
+        try:
+            new_branch_name = self._get_new_output_branch(force=True)
+            if Path(source_path).is_dir():
+                shutil.copytree(source_path, self.output_path / Path(source_path).name)
+            else:
+                shutil.copy(source_path, self.output_path)
+            self._commit_output_data(commit_message, output_dict={})
+        finally:
+            self._release_output_lock()
         return new_branch_name
 
     def enter_context(
@@ -1307,12 +1789,33 @@ class ProjectRepo(BaseRepo):
             return
 
         self.test_for_uncommitted_changes()
+        self._acquire_output_lock()
         self._on_context_enter_commit_hash = self.current_commit_hash
         self._is_in_context_manager = True
 
-        new_branch_name = self._get_new_output_branch(force, branch_prefix)
+        try:
+            new_branch_name = self._get_new_output_branch(force, branch_prefix)
+        except Exception:
+            self._release_output_lock()
+            raise
         return new_branch_name
 
+    def _acquire_output_lock(self):
+        """
+        Lock the output repository for a run.
+
+        Without worktrees, all runs share the working tree of the output repository, so it
+        is locked from creating the result branch until the results are committed. With
+        worktrees, only updates of the main branch are locked.
+        """
+        if not self._use_worktrees:
+            self.output_repo.lock().acquire()
+
+    def _release_output_lock(self):
+        """Release the lock taken by _acquire_output_lock, if it is held."""
+        if not self._use_worktrees and self.output_repo.lock().is_locked:
+            self.output_repo.lock().release()
+
     def _get_new_output_branch(
         self,
         force: bool = False,
@@ -1330,6 +1833,9 @@ class ProjectRepo(BaseRepo):
         :param branch_prefix:
             Optional branch name prefix.
         """
+        if self._use_worktrees:
+            return self._get_new_output_worktree(branch_prefix)
+
         output_repo = self.output_repo
 
         # ensure that LFS is properly initialized
@@ -1350,14 +1856,16 @@ class ProjectRepo(BaseRepo):
         # Create the new branch
         output_repo._git.checkout('-b', new_branch_name)  # equivalent to $ git checkout -b %branch_name
         code_backup_path = output_repo.path / "run_history"
+        environments_path = output_repo.path / "environments"
         logs_path = output_repo.path / "log.tsv"
-        if code_backup_path.exists():
-            try:
-                # Remove previous code backup
+        for history_path in (code_backup_path, environments_path):
+            if history_path.exists():
+                try:
+                    # Remove previous code backup and environments
 
-                delete_path(code_backup_path)
-            except Exception as e:
-                print(e)
+                    delete_path(history_path)
+                except Exception as e:
+                    print(e)
         if logs_path.exists():
             try:
                 # Remove previous logs
@@ -1366,6 +1874,63 @@ class ProjectRepo(BaseRepo):
                 print(e)
         return new_branch_name
 
+    def _get_new_output_worktree(self, branch_prefix: str | None = None):
+        """
+        Prepares a new branch to receive data in its own worktree of the output repository.
+        Neither the working tree of the output repository nor any other run's worktree is
+        touched, so that several runs can be tracked at the same time.
+
+        :param branch_prefix:
+            Optional branch name prefix.
+        """
+        output_repo = self.output_repo
+
+        # ensure that LFS is properly initialized
+        os.system("git lfs install")
+
+        new_branch_name = self.get_new_output_branch_name(branch_prefix)
+
+        # update urls in main branch of output_repo, only if they changed
+        if not output_repo.readme_links_remotes("Link to Project Repository", self.remote_urls):
+            with output_repo.main_worktree() as main_worktree:
+                main_worktree.add_list_of_remotes_in_readme_file("Link to Project Repository", self.remote_urls)
+                main_worktree.commit("Update urls", verbosity=0)
+
+        self._results_worktree = output_repo.add_results_worktree(new_branch_name)
+        return new_branch_name
+
+    def _remove_results_worktree(self, delete_branch_if_empty: bool = False):
+        """
+        Remove the worktree of the current run.
+
+        The error stack of a failed run is copied next to the worktree as
+        "<worktree name>.error.stack" before the worktree is removed.
+
+        :param delete_branch_if_empty:
+            If True, also delete the run's branch if no results were committed to it.
+        """
+        results_worktree = self._results_worktree
+        if results_worktree is None:
+            return
+
+        self._results_worktree = None
+        branch_name = str(results_worktree.active_branch)
+        # A branch without result commits still points to a commit of the main branch.
+        is_empty = self.output_repo.is_ancestor(branch_name, self.output_repo.main_branch)
+        results_worktree._git_repo.close()
+
+        # Keep the error stack of a failed run, which would be removed with the worktree.
+        error_stack_path = results_worktree.path / "error.stack"
+        if error_stack_path.exists():
+            kept_error_stack_path = error_stack_path.parent.parent / f"{error_stack_path.parent.name}.error.stack"
+            shutil.copyfile(error_stack_path, kept_error_stack_path)
+            print(f"The error stack of branch {branch_name} was kept at {kept_error_stack_path}")
+
+        self.output_repo._git.worktree("remove", "--force", str(results_worktree.path))
+        if delete_branch_if_empty and is_empty:
+            print("Removing empty branch", branch_name)
+            self.output_repo._git.branch("-D", branch_name)
+
     def cache_folder_for_branch(self, branch_name=None):
         """
         Returns the path to the cache directory for the given branch
@@ -1383,58 +1948,159 @@ class ProjectRepo(BaseRepo):
         cache_folder = self.path / f"{self.output_directory}_cached" / str(branch_name_path)
         return cache_folder
 
-    def copy_data_to_cache(self, branch_name=None, target_folder=None):
+    @property
+    def results_cache(self) -> ResultsCache:
+        """Content-addressed store backing the cache directories of all branches."""
+        return ResultsCache(
+            self.path / f"{self.output_directory}_cached",
+            self.output_repo,
+            max_size=self._cache_max_size,
+        )
+
+    def copy_data_to_cache(self, branch_name=None, target_folder=None, lazy=False):
         """
         Copy all existing output results into a cached directory and make it read-only.
 
+        Files in the default cache directory are hardlinks into the results cache's
+        object store, so files shared between branches are stored only once. If the
+        branch moved since it was cached, only the changed files are updated. An explicit
+        target_folder receives independent copies.
+
         :param branch_name:
         optional branch name, if None, current branch is used.
         :param target_folder:
         optional target directory, if None, default cache directory is used.
+        :param lazy:
+        if True, return a LazyResults handle that only copies files into the default cache
+        directory when they are accessed. Cannot be combined with target_folder.
 
         :return Path:
         Path to directory in cache
         """
         # Determine the branch name if not provided
         if branch_name is None:
-            branch_name = self.output_repo._git_repo.active_branch.name
+            branch_name = self._results_repo._git_repo.active_branch.name
+
+        if lazy and target_folder is not None:
+            raise ValueError("Lazy loading is only supported for the default cache directory.")
 
+        use_results_cache = target_folder is None
         if target_folder is None:
             target_folder = self.cache_folder_for_branch(branch_name)
         target_folder = Path(target_folder)
 
-        archive_ref = branch_name
-        local_branches = [head.name for head in self.output_repo._git_repo.heads]
-        if branch_name not in local_branches:
-            archive_ref = f"origin/{branch_name}"
+        archive_ref = self.output_repo.branch_ref(branch_name)
+
+        if use_results_cache:
+            results_cache = self.results_cache
+            commit = self.output_repo._git.rev_parse(f"{archive_ref}^{{commit}}")
+            cached_commit = results_cache.cached_commit(target_folder.name)
+            if target_folder.exists() and results_cache.is_partial(target_folder.name):
+                # A previous lazy load only copied some files of the branch.
+                with self.output_repo.lock():
+                    if cached_commit != commit:
+                        delete_path(target_folder)
+                        results_cache.record_commit(target_folder.name, None)
+                        results_cache.mark_partial(target_folder.name, False)
+                    elif lazy:
+                        return LazyResults(results_cache, commit, target_folder)
+                    else:
+                        LazyResults(results_cache, commit, target_folder).materialize()
+            elif target_folder.exists() and cached_commit is not None and cached_commit != commit:
+                # The branch moved since it was cached (e.g. main), only apply the difference.
+                with self.output_repo.lock():
+                    results_cache.refresh(cached_commit, commit, target_folder)
+                    results_cache.record_commit(target_folder.name, commit)
+
+            if lazy:
+                if not target_folder.exists():
+                    with self.output_repo.lock():
+                        target_folder.mkdir(parents=True, exist_ok=True)
+                        results_cache.mark_partial(target_folder.name)
+                        results_cache.record_commit(target_folder.name, commit)
+                results_cache.touch(target_folder)
+                return LazyResults(results_cache, commit, target_folder)
+        else:
+            commit = archive_ref
 
-        # Create the target directory if it doesn't exist
         if not target_folder.exists():
-            target_folder.mkdir(parents=True, exist_ok=True)
-
-            # Create a temporary file for the archive and perform extraction
-            handle, temp_archive_name = tempfile.mkstemp(suffix=".tar")
-            os.close(handle)
-            # Create an archive of the specified branch
-            self.output_repo._git_repo.git.archive(
-                archive_ref, output=temp_archive_name
-            )
+            target_folder.parent.mkdir(parents=True, exist_ok=True)
+            # Extract into a temporary sibling directory that is renamed once complete, so
+            # an interrupted extraction never leaves a partial cache behind.
+            partial_folder = Path(tempfile.mkdtemp(prefix=f".{target_folder.name}_", dir=target_folder.parent))
+            try:
+                if use_results_cache:
+                    results_cache.materialize(commit, partial_folder)
+                else:
+                    self._extract_archive(archive_ref, partial_folder)
+                os.replace(partial_folder, target_folder)
+                if use_results_cache:
+                    results_cache.record_commit(target_folder.name, commit)
+            except BaseException:
+                delete_path(partial_folder)
+                if not target_folder.exists():
+                    raise
+                # Another process cached the same branch in the meantime.
+
+        if use_results_cache:
+            results_cache.touch(target_folder)
+            if results_cache.max_size is not None:
+                results_cache.prune(keep=[target_folder.name])
 
-            # Open the temporary file in read mode
-            with open(temp_archive_name, 'rb') as archive_file:
-                # Extract the archive to the specified directory
-                with tarfile.open(fileobj=archive_file, mode='r', errorlevel=0, debug=1) as tar:
-                    tar.extractall(path=target_folder)
-            Path(temp_archive_name).unlink()
+        return target_folder
 
-            # Set all files to read only
-            for filename in glob.iglob(f"{target_folder}/**/*", recursive=True):
-                absolute_path = os.path.abspath(filename)
-                if os.path.isdir(absolute_path):
-                    continue
-                os.chmod(os.path.abspath(filename), S_IREAD)
+    def results_view(self, branch_name: str = None) -> ResultsPath:
+        """
+        Read-only view of the results of an output branch that reads files straight from git.
 
-        return target_folder
+        Nothing is extracted to disk, which makes it cheap to read a few files from many
+        branches. Use copy_data_to_cache or input_data if the files are needed on disk.
+
+        :param branch_name:
+        optional branch name, if None, current branch is used.
+
+        :return ResultsPath:
+        Path-like view of the root of the branch, supporting open, read_bytes, glob and iterdir.
+        """
+        if branch_name is None:
+            branch_name = self._results_repo._git_repo.active_branch.name
+
+        ref = self.output_repo.branch_ref(branch_name)
+        commit = self.output_repo._git.rev_parse(f"{ref}^{{commit}}")
+        return ResultsPath(self.output_repo, commit)
+
+    def _extract_archive(self, archive_ref: str, target_folder: Path):
+        """
+        Extract the files of an output repository ref into a directory and make them read-only.
+
+        The archive is streamed from git straight into the tar reader, so it is never
+        written to disk, and file modes are set while extracting.
+
+        :param archive_ref:
+            Branch, ref or commit of the output repository.
+        :param target_folder:
+            Existing directory to extract into.
+        """
+        def read_only_members(tar):
+            for member in tar:
+                if member.isfile():
+                    member.mode = S_IREAD
+                yield member
+
+        process = self.output_repo._git.archive(archive_ref, as_process=True)
+        try:
+            with tarfile.open(fileobj=process.stdout, mode="r|", errorlevel=0) as tar:
+                tar.extractall(path=target_folder, members=read_only_members(tar))
+            # Drain the zero padding after the end of the archive, so git can exit.
+            process.stdout.read()
+        except BaseException:
+            process.proc.kill()
+            if process.proc.wait() > 0:
+                # git failed before the archive was complete, raise its error instead.
+                process.wait()
+            raise
+        # Raises a GitCommandError if the archive could not be created.
+        process.wait()
 
     def exit_context(
         self,
@@ -1456,11 +2122,14 @@ class ProjectRepo(BaseRepo):
         if self._on_context_enter_commit_hash is None:
             # This means the context was not entered during enter_context
             return
-        self.test_for_uncommitted_changes()
-        if self._on_context_enter_commit_hash != self.current_commit_hash:
-            raise RuntimeError("Code has changed since starting the context. Don't do that.")
+        try:
+            self.test_for_uncommitted_changes()
+            if self._on_context_enter_commit_hash != self.current_commit_hash:
+                raise RuntimeError("Code has changed since starting the context. Don't do that.")
 
-        self._commit_output_data(message, output_dict, options)
+            self._commit_output_data(message, output_dict, options)
+        finally:
+            self._release_output_lock()
 
     def _commit_output_data(
         self,
@@ -1481,19 +2150,27 @@ class ProjectRepo(BaseRepo):
             Optional case options.
         """
         print("Completed computations, commiting results")
-        self.output_repo.add(".")
+        results_repo = self._results_repo
+        results_repo.add(".")
         try:
             # This has to be using ._git.commit to raise an error if no results have been written.
-            commit_return = self.output_repo._git.commit("-m", message)
+            commit_return = results_repo._git.commit("-m", message)
             self.copy_data_to_cache()
             self.update_output_main_logs(output_dict, options)
-            main_cach_path = self.path / (self.output_directory + "_cached") / self.output_repo.main_branch
-            if main_cach_path.exists():
-                delete_path(main_cach_path)
-            self.copy_data_to_cache(self.output_repo.main_branch)
+            with self.output_repo.lock():
+                main_cach_path = self.cache_folder_for_branch(self.output_repo.main_branch)
+                if main_cach_path.exists() and self.results_cache.cached_commit(main_cach_path.name) is None:
+                    # Cached before commits were recorded, so it cannot be updated incrementally.
+                    delete_path(main_cach_path)
+                self.copy_data_to_cache(self.output_repo.main_branch)
         except git.exc.GitCommandError as e:
-            self.output_repo.delete_active_branch_if_branch_is_empty()
+            if self._results_worktree is not None:
+                self._remove_results_worktree(delete_branch_if_empty=True)
+            else:
+                self.output_repo.delete_active_branch_if_branch_is_empty()
             raise e
+        else:
+            self._remove_results_worktree()
         finally:
             # self.remove_cached_files()
             self._is_in_context_manager = False
@@ -1535,9 +2212,15 @@ class ProjectRepo(BaseRepo):
         )
         try:
             yield new_branch_name
-        except Exception as e:
-            self.capture_error(e)
-            raise e
+        except BaseException as e:
+            # Also clean up on KeyboardInterrupt, so a later run in this process does not wait
+            # for the lock. The error is written before the run's worktree is removed.
+            try:
+                self.capture_error(e)
+            finally:
+                self._release_output_lock()
+                self._remove_results_worktree(delete_branch_if_empty=True)
+            raise
         else:
             self.exit_context(message=results_commit_message, options=options)
 
@@ -1547,6 +2230,10 @@ class ProjectRepo(BaseRepo):
 
 
 class OutputRepo(BaseRepo):
+    # Seconds to wait for the output lock. Without worktrees, runs hold it until their results
+    # are committed, so this has to cover the duration of a run.
+    lock_timeout: float | None = 3600
+
     def __init__(
         self,
         *args: Any,
@@ -1554,6 +2241,11 @@ class OutputRepo(BaseRepo):
         **kwargs: Any,
     ):
         self.project_repo = project_repo
+        self._output_log_cache = None
+        self._output_log_derived = {}
+        self._columnar_output_log_cache = None
+        self._output_log_index = None
+        self._lock = None
         super().__init__(*args, **kwargs)
 
         self._update_version()
@@ -1564,6 +2256,11 @@ class OutputRepo(BaseRepo):
             self.checkout(self.main_branch)
         return self.path / "log.tsv"
 
+    @property
+    def output_log_blob_hash(self) -> str | None:
+        """Hash of the log.tsv blob on the main branch, or None if there is no log yet."""
+        return self.resolve(f"{self.main_branch}:log.tsv")
+
     @property
     def output_log(self):
         """
@@ -1573,14 +2270,397 @@ class OutputRepo(BaseRepo):
         checks out that branch nor touches the working tree. Reading the log used to
         discard uncommitted changes and check out the main branch, which made loading
         results a destructive operation.
+
+        The parsed log is kept in memory for as long as the log.tsv blob on the main
+        branch is unchanged, so repeated reads only cost a single rev-parse. The returned
+        instance is shared between callers and should be treated as read-only.
         """
-        try:
-            log_content = self._git.show(f"{self.main_branch}:log.tsv")
-        except git.GitCommandError:
+        blob_hash = self.output_log_blob_hash
+        if blob_hash is None:
             # No log.tsv on the main branch yet, e.g. in a freshly initialized repo.
             return OutputLog()
 
-        return OutputLog.from_string(log_content, filepath=self.path / "log.tsv")
+        if self._output_log_cache is not None and self._output_log_cache[0] == blob_hash:
+            return self._output_log_cache[1]
+
+        log_content = self.read_object(blob_hash).decode()
+        output_log = OutputLog.from_string(log_content, filepath=self.path / "log.tsv", output_repo=self)
+
+        self._output_log_cache = (blob_hash, output_log)
+        self._output_log_derived = {}
+        return output_log
+
+    @property
+    def columnar_output_log(self) -> ColumnarOutputLog:
+        """
+        ColumnarOutputLog: The run history on the main branch, stored column by column.
+
+        Cheaper to build than `output_log` for long run histories, because LogEntry
+        instances are only created for the rows that are accessed. Like `output_log`, it
+        is kept in memory for as long as the log.tsv blob on the main branch is unchanged.
+        """
+        blob_hash = self.output_log_blob_hash
+        if blob_hash is None:
+            return ColumnarOutputLog(filepath=self.path / "log.tsv", output_repo=self)
+
+        cache = self._columnar_output_log_cache
+        if cache is not None and cache[0] == blob_hash:
+            return cache[1]
+
+        log_content = self.read_object(blob_hash).decode()
+        output_log = ColumnarOutputLog.from_string(log_content, filepath=self.path / "log.tsv", output_repo=self)
+
+        self._columnar_output_log_cache = (blob_hash, output_log)
+        return output_log
+
+    def _from_output_log(self, key: str, compute):
+        """
+        Compute a value from the output log once per revision of log.tsv.
+
+        :param key:
+            Name under which the value is memoized.
+        :param compute:
+            Callable receiving the OutputLog and returning the derived value.
+        """
+        output_log = self.output_log
+        if self._output_log_cache is None or self._output_log_cache[1] is not output_log:
+            return compute(output_log)
+
+        if key not in self._output_log_derived:
+            self._output_log_derived[key] = compute(output_log)
+        return self._output_log_derived[key]
+
+    @property
+    def output_log_index_path(self) -> Path:
+        """Location of the persisted OutputLogIndex, inside the git directory."""
+        return Path(self._git_repo.common_dir) / "cadet-rdm" / "log_index.json"
+
+    @property
+    def output_log_index(self) -> OutputLogIndex:
+        """
+        OutputLogIndex: Index of the run history by options hash and project repo commit hash.
+
+        The index is stored next to the git objects and tagged with the commit of the main
+        branch it was built from. It is only rebuilt from log.tsv after the main branch
+        moved, so repeated lookups neither re-read nor re-parse the log.
+        """
+        main_commit_hash = self.main_commit_hash
+
+        index = self._output_log_index
+        if index is not None and index.main_commit_hash == main_commit_hash:
+            return index
+
+        index = OutputLogIndex.load(self.output_log_index_path)
+        if index is None or index.main_commit_hash != main_commit_hash:
+            index = OutputLogIndex.from_columnar_output_log(
+                self.columnar_output_log, main_commit_hash=main_commit_hash
+            )
+            try:
+                index.dump(self.output_log_index_path)
+            except OSError:
+                traceback.print_exc()
+
+        self._output_log_index = index
+        return index
+
+    @property
+    def worktrees_path(self) -> Path:
+        """
+        Directory holding the additional worktrees of this repository.
+
+        It is placed next to the main working tree, e.g. "output_worktrees" for "output",
+        and ignores itself, so it shows up neither in the output nor in the project repository.
+        """
+        main_working_tree = Path(self._git_repo.common_dir).absolute().parent
+        return main_working_tree.parent / f"{main_working_tree.name}_worktrees"
+
+    def _make_worktrees_path(self) -> Path:
+        """Create the worktrees directory with a .gitignore that ignores all of its content."""
+        worktrees_path = self.worktrees_path
+        worktrees_path.mkdir(parents=True, exist_ok=True)
+        gitignore_path = worktrees_path / ".gitignore"
+        if not gitignore_path.exists():
+            gitignore_path.write_text("*\n", encoding="utf-8")
+        return worktrees_path
+
+    def readme_links_remotes(self, repo_identifier: str, remotes_url_list: list) -> bool:
+        """
+        Check if the README.md of the main branch already links to the given remotes.
+
+        :param repo_identifier:
+            Link text of the line, e.g. "Link to Project Repository".
+        :param remotes_url_list:
+            Remote URLs to link to.
+        :return:
+            True if updating the links would not change the README.md.
+        """
+        if len(remotes_url_list) == 0:
+            return True
+
+        readme = self.read_blob(self.main_branch, "README.md")
+        if readme is None:
+            return False
+        filelines = readme.decode("utf-8").replace("\r\n", "\n").splitlines(keepends=True)
+        try:
+            updated_lines = self._link_remotes_in_readme_lines(filelines, repo_identifier, remotes_url_list)
+        except RuntimeError:
+            # Let the update raise the error.
+            return False
+        return updated_lines == filelines
+
+    def add_results_worktree(self, branch_name: str) -> OutputRepo:
+        """
+        Create a new branch from the main branch and check it out in a separate worktree.
+
+        Like a new output branch created by checking out, the worktree holds the files of
+        the main branch except for the run history, environments and the log. These are removed from the
+        index before any file is written, so the run history is never checked out.
+
+        :param branch_name:
+            Name of the new branch.
+        :return:
+            OutputRepo of the new worktree.
+        """
+        path = self._make_worktrees_path() / branch_name.replace("/", "_")
+        self._git.worktree("add", "--no-checkout", "-b", branch_name, str(path), self.main_branch)
+
+        worktree_git = git.Git(path)
+        worktree_git.read_tree("HEAD")
+        worktree_git.rm("-r", "-q", "--cached", "--ignore-unmatch", "run_history", "environments", "log.tsv")
+        worktree_git.checkout_index("-a")
+
+        return OutputRepo(path, project_repo=self.project_repo)
+
+    @contextlib.contextmanager
+    def main_worktree(self, sparse_directories: list[str] | None = None):
+        """
+        Check out the main branch in a temporary worktree.
+
+        Commits made in the worktree are moved onto the main branch when the context
+        exits, without touching the working tree of this repository. The output
+        repository is locked while the context is active. Only the top-level files and
+        the given directories are written to disk, so the run history of previous runs is
+        not checked out. The other files are kept in the index with the skip-worktree bit
+        set, which needs no sparse-checkout configuration of the repository.
+
+        :param sparse_directories:
+            Additional directories to check out.
+        """
+        checked_out_prefixes = tuple(
+            directory.strip("/") + "/" for directory in (sparse_directories or [])
+        )
+
+        with self.lock():
+            start_commit = self.main_commit_hash
+            path = Path(tempfile.mkdtemp(prefix="main_", dir=self._make_worktrees_path()))
+            self._git.worktree("add", "--no-checkout", "--detach", str(path), start_commit)
+            try:
+                worktree_git = git.Git(path)
+                worktree_git.read_tree("HEAD")
+                skipped_paths = [
+                    repo_path for repo_path in worktree_git.ls_files("-z").split("\0")
+                    if "/" in repo_path and not repo_path.startswith(checked_out_prefixes)
+                ]
+                if len(skipped_paths) > 0:
+                    with tempfile.TemporaryFile() as path_list:
+                        path_list.write(("\0".join(skipped_paths) + "\0").encode("utf-8"))
+                        path_list.seek(0)
+                        worktree_git.update_index("-z", "--skip-worktree", "--stdin", istream=path_list)
+                worktree_git.checkout_index("-a")
+
+                with OutputRepo(path, project_repo=self.project_repo) as worktree:
+                    yield worktree
+                    new_commit = worktree.current_commit_hash
+
+                if new_commit != start_commit:
+                    self.update_main_branch(new_commit, start_commit)
+            finally:
+                self._git.worktree("remove", "--force", str(path))
+
+    def branch_ref(self, branch_name: str) -> str:
+        """
+        Ref to read an output branch from.
+
+        Local branches are used directly. Other branches are read from the remote-tracking
+        branch, which is fetched on demand if it is not known yet, e.g. because the output
+        repository was cloned with only its main branch.
+
+        :param branch_name:
+            Name of the output branch.
+        :return:
+            Name of the local branch or of the remote-tracking branch.
+        """
+        if branch_name in [head.name for head in self._git_repo.heads]:
+            return branch_name
+
+        remote_name = self.remotes[0].name if len(self.remotes) > 0 else "origin"
+        # LFS objects are downloaded by the smudge filter when the files are read.
+        self.fetch_branches([branch_name], lfs=False)
+        return f"{remote_name}/{branch_name}"
+
+    @property
+    def fetches_all_branches(self) -> bool:
+        """
+        Whether the first remote fetches all branches.
+
+        This is False for output repositories cloned with only their main branch, i.e.
+        with single_branch_output or output_ref_prefix.
+        """
+        if len(self.remotes) == 0:
+            return True
+
+        remote_name = self.remotes[0].name
+        try:
+            refspecs = self._git.config("--get-all", f"remote.{remote_name}.fetch").splitlines()
+        except git.GitCommandError:
+            return False
+        return any(refspec.lstrip("+").startswith("refs/heads/*:") for refspec in refspecs)
+
+    def fetch_branches(self, branch_names: Iterable[str], depth: int | None = None, lfs: bool = True) -> list[str]:
+        """
+        Fetch the given branches from the first remote in a single fetch.
+
+        Branches that exist locally or as remote-tracking branches are skipped, so loading
+        the results of many cases costs one round trip for the branches that are missing.
+        Branches that do not exist on the remote are skipped as well.
+
+        :param branch_names:
+            Names of the output branches, e.g. the results branches of a list of cases.
+        :param depth:
+            Number of commits of history to fetch. If None, only the last commit is fetched
+            for repositories cloned with only their main branch, which keeps them shallow, and
+            the full history otherwise.
+        :param lfs:
+            If True, also download the LFS objects of the fetched branches in one git-lfs call.
+        :return:
+            Names of the branches that were fetched.
+        """
+        if len(self.remotes) == 0:
+            return []
+
+        remote_name = self.remotes[0].name
+        local_branches = {head.name for head in self._git_repo.heads}
+        missing_branches = sorted(
+            branch_name for branch_name in set(branch_names)
+            if branch_name not in local_branches
+            and self.resolve(f"refs/remotes/{remote_name}/{branch_name}^{{commit}}") is None
+        )
+        if not missing_branches:
+            return []
+
+        if depth is None and not self.fetches_all_branches:
+            depth = 1
+        depth_options = [] if depth is None else [f"--depth={depth}"]
+
+        def fetch(branches):
+            refspecs = [f"+refs/heads/{branch}:refs/remotes/{remote_name}/{branch}" for branch in branches]
+            self._git.fetch(*depth_options, remote_name, *refspecs)
+
+        try:
+            fetch(missing_branches)
+        except git.GitCommandError:
+            # A single missing branch fails the whole fetch, retry with the branches that exist.
+            remote_heads = self._git.ls_remote("--heads", remote_name, *missing_branches).splitlines()
+            existing_branches = {line.split("\trefs/heads/", 1)[-1] for line in remote_heads}
+            missing_branches = [branch for branch in missing_branches if branch in existing_branches]
+            if not missing_branches:
+                return []
+            fetch(missing_branches)
+
+        if lfs:
+            try:
+                self._git.lfs(
+                    "fetch", remote_name, *[f"refs/remotes/{remote_name}/{branch}" for branch in missing_branches]
+                )
+            except git.GitCommandError as e:
+                print(f"Could not fetch LFS objects of {len(missing_branches)} branches: {e}")
+
+        return missing_branches
+
+    def lock(self) -> FileLock:
+        """
+        Lock guarding changes to the output repository across processes.
+
+        The lock file is placed in the common git directory, so it is shared by all
+        worktrees of this repository. The same reentrant FileLock is returned on every call,
+        also by other OutputRepo instances of the same repository in this process.
+        Waiting for the lock raises a TimeoutError naming its holder after lock_timeout seconds.
+        """
+        if self._lock is None:
+            self._lock = FileLock.for_path(
+                Path(self._git_repo.common_dir) / "cadet-rdm" / "output.lock", timeout=self.lock_timeout
+            )
+        return self._lock
+
+    def read_blob(self, revision: str, path: str) -> bytes | None:
+        """
+        Read the content of a file at a revision without checking it out.
+
+        :param revision:
+            Commit or branch to read from.
+        :param path:
+            Path of the file in the repository.
+        :return:
+            Content of the file, or None if it does not exist at the revision.
+        """
+        return self.read_object(f"{revision}:{path}")
+
+    def commit_directory_to_main(
+        self,
+        directory: Path,
+        message: str,
+        parent_commit: str | None = None,
+    ) -> str:
+        """
+        Commit the files of a directory onto the main branch without touching the working tree.
+
+        The files are written to the object database and added to a temporary index that
+        holds the tree of the main branch, so only the added paths are hashed and no
+        branch is checked out. Filters configured in .gitattributes (e.g. LFS) are applied.
+
+        :param directory:
+            Directory with the files to commit. Paths relative to it are the paths in the repository.
+        :param message:
+            Commit message.
+        :param parent_commit:
+            Commit to build on. Defaults to the current main commit. If main no longer
+            points to it, the main branch is not updated and a GitCommandError is raised.
+        :return:
+            Hash of the new commit.
+        """
+        directory = Path(directory)
+        if parent_commit is None:
+            parent_commit = self.main_commit_hash
+
+        with tempfile.TemporaryDirectory(prefix="cadet-rdm-index-") as index_dir:
+            with self._git.custom_environment(GIT_INDEX_FILE=str(Path(index_dir) / "index")):
+                self._git.read_tree(parent_commit)
+                for file in sorted(path for path in directory.rglob("*") if path.is_file()):
+                    repo_path = file.relative_to(directory).as_posix()
+                    blob_hash = self._git.hash_object("-w", "--path", repo_path, str(file))
+                    self._git.update_index("--add", "--cacheinfo", f"100644,{blob_hash},{repo_path}")
+                tree_hash = self._git.write_tree()
+
+        new_commit = self._git.commit_tree(tree_hash, "-p", parent_commit, "-m", message)
+        with self.lock():
+            self.update_main_branch(new_commit, parent_commit)
+        return new_commit
+
+    def update_main_branch(self, new_commit: str, expected_commit: str):
+        """
+        Move the main branch to a new commit, if it still points to the expected commit.
+
+        If the main branch is checked out in this repository's working tree, the
+        working tree is moved along, keeping uncommitted changes.
+
+        :param new_commit:
+            Commit the main branch should point to.
+        :param expected_commit:
+            Commit the main branch is expected to point to before the update.
+        """
+        self._git.update_ref(f"refs/heads/{self.main_branch}", new_commit, expected_commit)
+        if self.active_branch.name == self.main_branch:
+            self._git.read_tree("-m", "-u", expected_commit, new_commit)
 
     def print_output_log(self):
         self.checkout(self.main_branch)
@@ -1593,26 +2673,26 @@ class OutputRepo(BaseRepo):
     @property
     def project_repo_branches(self) -> set[str]:
         """All project repo branches that have been run."""
-        return set([
-            entry.project_repo_branch
-            for entry in self.output_log.entries.values()
-        ])
+        return self._from_output_log(
+            "project_repo_branches",
+            lambda output_log: set(entry.project_repo_branch for entry in output_log.entries.values()),
+        )
 
     @property
     def project_repo_commit_hashes(self) -> set[str]:
         """All project repo commit hashes that have been run."""
-        return set([
-            entry.project_repo_commit_hash
-            for entry in self.output_log.entries.values()
-        ])
+        return self._from_output_log(
+            "project_repo_commit_hashes",
+            lambda output_log: set(entry.project_repo_commit_hash for entry in output_log.entries.values()),
+        )
 
     @property
     def options_hashes(self) -> set[str]:
         """All option hashes that have been run."""
-        return set([
-            entry.options_hash
-            for entry in self.output_log.entries.values()
-        ])
+        return self._from_output_log(
+            "options_hashes",
+            lambda output_log: set(entry.options_hash for entry in output_log.entries.values()),
+        )
 
     @property
     def options_to_commit_map(self) -> dict[str, list[str]]:
@@ -1622,10 +2702,13 @@ class OutputRepo(BaseRepo):
         Returns:
             dict: Keys are option hashes, values are lists of commit hashes.
         """
-        mapping = defaultdict(list)
-        for entry in self.output_log.entries.values():
-            mapping[entry.options_hash].append(entry.project_repo_commit_hash)
-        return dict(mapping)
+        def compute(output_log):
+            mapping = defaultdict(list)
+            for entry in output_log.entries.values():
+                mapping[entry.options_hash].append(entry.project_repo_commit_hash)
+            return dict(mapping)
+
+        return self._from_output_log("options_to_commit_map", compute)
 
     @property
     def commit_to_options_map(self) -> dict[str, list[str]]:
@@ -1635,10 +2718,13 @@ class OutputRepo(BaseRepo):
         Returns:
             dict: Keys are commit hashes, values are lists of option hashes.
         """
-        mapping = defaultdict(list)
-        for entry in self.output_log.entries.values():
-            mapping[entry.project_repo_commit_hash].append(entry.options_hash)
-        return dict(mapping)
+        def compute(output_log):
+            mapping = defaultdict(list)
+            for entry in output_log.entries.values():
+                mapping[entry.project_repo_commit_hash].append(entry.options_hash)
+            return dict(mapping)
+
+        return self._from_output_log("commit_to_options_map", compute)
 
     def add_filetype_to_lfs(self, file_type):
         """
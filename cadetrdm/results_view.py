@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import fnmatch
+import io
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Iterator
+
+import git
+
+from cadetrdm.cache import _LFS_POINTER_MAX_SIZE, _LFS_POINTER_PREFIX
+
+if TYPE_CHECKING:
+    from cadetrdm.repositories import OutputRepo
+
+
+class ResultsPath:
+    def __init__(self, output_repo: OutputRepo, commit: str, path: str | PurePosixPath = ""):
+        """
+        Read-only, path-like view of a file or directory of an output branch.
+
+        Files are read straight from the git object database and are never extracted to
+        disk. Files stored with git-lfs are read from the local LFS store. The view is bound
+        to a commit, so it does not change when the branch moves.
+
+        :param output_repo:
+            Output repository holding the branch.
+        :param commit:
+            Commit of the branch.
+        :param path:
+            Path relative to the root of the branch.
+        """
+        self.output_repo = output_repo
+        self.commit = commit
+        self._path = PurePosixPath(path)
+        self._object = None
+
+    def __repr__(self):
+        return f"ResultsPath({self.commit[:7]}:{self.as_posix()})"
+
+    def __str__(self):
+        return self.as_posix()
+
+    def __eq__(self, other):
+        if not isinstance(other, ResultsPath):
+            return NotImplemented
+        return self.commit == other.commit and self._path == other._path
+
+    def __hash__(self):
+        return hash((self.commit, self._path))
+
+    def __truediv__(self, sub_path: str | PurePosixPath) -> ResultsPath:
+        return ResultsPath(self.output_repo, self.commit, self._path / sub_path)
+
+    @property
+    def name(self) -> str:
+        return self._path.name
+
+    @property
+    def suffix(self) -> str:
+        return self._path.suffix
+
+    @property
+    def parent(self) -> ResultsPath:
+        return ResultsPath(self.output_repo, self.commit, self._path.parent)
+
+    def as_posix(self) -> str:
+        posix_path = self._path.as_posix()
+        return "" if posix_path == "." else posix_path
+
+    @property
+    def _git_object(self) -> git.Tree | git.Blob | None:
+        """Tree or blob at this path, or None if the path does not exist."""
+        if self._object is None:
+            with self.output_repo._object_read_lock:
+                tree = self.output_repo._git_repo.commit(self.commit).tree
+                if self.as_posix() == "":
+                    self._object = tree
+                else:
+                    try:
+                        self._object = tree / self.as_posix()
+                    except KeyError:
+                        return None
+        return self._object
+
+    def exists(self) -> bool:
+        return self._git_object is not None
+
+    def is_dir(self) -> bool:
+        return isinstance(self._git_object, git.Tree)
+
+    def is_file(self) -> bool:
+        return isinstance(self._git_object, git.Blob)
+
+    def iterdir(self) -> Iterator[ResultsPath]:
+        """Yield the files and directories directly within this directory."""
+        tree = self._git_object
+        if not isinstance(tree, git.Tree):
+            raise NotADirectoryError(f"{self!r} is not a directory.")
+        with self.output_repo._object_read_lock:
+            items = list(tree)
+        for item in items:
+            if isinstance(item, (git.Tree, git.Blob)):
+                child = self / item.name
+                child._object = item
+                yield child
+
+    def glob(self, pattern: str) -> Iterator[ResultsPath]:
+        """
+        Yield the files and directories matching a glob pattern relative to this directory.
+
+        :param pattern:
+            Pattern such as "*.h5", "*/options.json" or "**/*.csv".
+        """
+        yield from self._glob(PurePosixPath(pattern).parts)
+
+    def rglob(self, pattern: str) -> Iterator[ResultsPath]:
+        """Yield the files and directories matching a pattern anywhere below this directory."""
+        yield from self.glob(f"**/{pattern}")
+
+    def _glob(self, parts: tuple[str, ...]) -> Iterator[ResultsPath]:
+        if not parts or not self.is_dir():
+            return
+        part, remaining_parts = parts[0], parts[1:]
+        if part == "**":
+            yield from self._glob(remaining_parts)
+            for child in self.iterdir():
+                if child.is_dir():
+                    yield from child._glob(parts)
+            return
+        for child in self.iterdir():
+            if fnmatch.fnmatchcase(child.name, part):
+                if remaining_parts:
+                    yield from child._glob(remaining_parts)
+                else:
+                    yield child
+
+    def read_bytes(self) -> bytes:
+        """
+        Read the content of the file, resolving git-lfs pointers from the local LFS store.
+
+        :raises FileNotFoundError:
+            If the file does not exist or its LFS object has not been downloaded.
+        """
+        blob = self._git_object
+        if blob is None:
+            raise FileNotFoundError(f"{self!r} does not exist.")
+        if not isinstance(blob, git.Blob):
+            raise IsADirectoryError(f"{self!r} is a directory.")
+
+        content = self.output_repo.read_object(blob.hexsha)
+        if len(content) <= _LFS_POINTER_MAX_SIZE and content.startswith(_LFS_POINTER_PREFIX):
+            return self._read_lfs_object(content)
+        return content
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        return self.read_bytes().decode(encoding)
+
+    def open(self, mode: str = "r", encoding: str | None = None):
+        """
+        Open the file for reading.
+
+        :param mode:
+            "r" or "rb". The file cannot be written.
+        :param encoding:
+            Encoding used in text mode. Defaults to utf-8.
+        """
+        if mode not in ("r", "rt", "rb"):
+            raise ValueError(f"{self!r} is read-only, mode {mode} is not supported.")
+        content = io.BytesIO(self.read_bytes())
+        if mode == "rb":
+            return content
+        return io.TextIOWrapper(content, encoding=encoding or "utf-8")
+
+    def _read_lfs_object(self, pointer: bytes) -> bytes:
+        """Read the LFS object a pointer file refers to from the local LFS store."""
+        fields = dict(
+            line.split(" ", 1) for line in pointer.decode().splitlines() if " " in line
+        )
+        oid = fields["oid"].split(":", 1)[-1]
+        object_path = Path(self.output_repo._git_repo.common_dir) / "lfs" / "objects" / oid[0:2] / oid[2:4] / oid
+        if not object_path.exists():
+            raise FileNotFoundError(
+                f"The LFS object of {self!r} is not available locally. "
+                f"Please run 'git lfs fetch' in the output repository."
+            )
+        return object_path.read_bytes()
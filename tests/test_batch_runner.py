@@ -1,10 +1,13 @@
 import os
 from pathlib import Path
 
+import git
 import pytest
 
-from cadetrdm import Options, Case, Environment, ProjectRepo, initialize_repo
+from cadetrdm import Options, Case, CaseBatch, Environment, ProjectRepo, initialize_repo
+from cadetrdm.cache import LazyResults
 from cadetrdm.io_utils import delete_path
+from cadetrdm.repositories import fetch_once
 
 
 @pytest.fixture(autouse=True)
@@ -253,5 +256,112 @@ def test_results_loading_from_within():
         os.chdir(root_dir)
 
 
+MAIN_MODULE = """
+from cadetrdm import tracks_results
+
+
+@tracks_results
+def main(repo, options):
+    if options.value < 0:
+        raise ValueError("Negative values are not supported.")
+    (repo.output_path / "result.txt").write_text(str(options.value * 2))
+"""
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_case_batch(tmp_path, executor):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    (path_to_repo / "project").mkdir()
+    (path_to_repo / "project" / "__init__.py").write_text(MAIN_MODULE)
+    project_repo = ProjectRepo(path_to_repo)
+    project_repo.add(".")
+    project_repo.commit("Add main module")
+
+    def make_case(value):
+        options = Options({"value": value, "commit_message": f"Run {value}", "debug": False})
+        return Case(project_repo=project_repo, options=options)
+
+    cases = [make_case(value) for value in [1, 2, -1]]
+    results = CaseBatch(cases, max_workers=2, executor=executor).run()
+
+    assert [result.status for result in results] == ["finished", "finished", "failed"]
+    assert (results[0].results_path / "result.txt").read_text() == "2"
+    assert (results[1].results_path / "result.txt").read_text() == "4"
+    assert "Negative values" in results[2].error
+    assert all(result.duration > 0 for result in results[:2])
+    assert str(project_repo.output_repo.active_branch) == project_repo.output_repo.main_branch
+    assert project_repo.output_repo._git.worktree("list").count("\n") == 0
+    assert len(project_repo.output_repo._git_repo.heads) == 3
+
+    results = CaseBatch(cases[:2] + [make_case(3)], max_workers=2, executor=executor).run()
+    assert [result.status for result in results] == ["skipped", "skipped", "finished"]
+
+
+def test_project_repo_is_fetched_once_per_batch(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    project_repo = ProjectRepo(path_to_repo)
+    git.Repo.init(tmp_path / "remote.git", bare=True)
+    project_repo._git.remote("add", "origin", str(tmp_path / "remote.git"))
+    project_repo._git.push("-u", "origin", str(project_repo.active_branch))
+
+    fetched_paths = []
+
+    def count_fetch(self, *args, **kwargs):
+        fetched_paths.append(self._working_dir)
+        return self._call_process("fetch", *args, **kwargs)
+
+    monkeypatch.setattr(git.Git, "fetch", count_fetch, raising=False)
+
+    cases = [
+        Case(project_repo=project_repo, options=Options({"value": value, "debug": False}))
+        for value in range(3)
+    ]
+    results = CaseBatch(cases).run()
+    assert [result.status for result in results] == ["failed"] * 3
+    assert len(fetched_paths) == 1
+
+    fetched_paths.clear()
+    with fetch_once():
+        for case in cases:
+            case.load()
+    assert len(fetched_paths) == 1
+
+    fetched_paths.clear()
+    project_repo.update()
+    project_repo.update(max_age=60)
+    assert len(fetched_paths) == 1
+    project_repo.update()
+    assert len(fetched_paths) == 2
+
+    fetched_paths.clear()
+    cases[0].load(max_age=60)
+    assert project_repo.check_for_changes_upstream(max_age=60) is False
+    assert len(fetched_paths) == 0
+    assert project_repo.has_changes_upstream is False
+    assert len(fetched_paths) == 1
+
+
+def test_case_batch_forwards_load_kwargs_to_finished_cases(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    (path_to_repo / "project").mkdir()
+    (path_to_repo / "project" / "__init__.py").write_text(MAIN_MODULE)
+    project_repo = ProjectRepo(path_to_repo)
+    project_repo.add(".")
+    project_repo.commit("Add main module")
+
+    cases = [
+        Case(project_repo=project_repo, options=Options({"value": value, "commit_message": "Run", "debug": False}))
+        for value in [1, 2]
+    ]
+    results = CaseBatch(cases, max_workers=2).run(lazy=True)
+
+    assert [result.status for result in results] == ["finished", "finished"]
+    assert all(isinstance(result.results_path, LazyResults) for result in results)
+    assert "CADET_RDM_USE_WORKTREES" not in os.environ
+
+
 if __name__ == "__main__":
     test_results_loading_from_within()
@@ -0,0 +1,239 @@
+"""Tests for the content-addressed results cache."""
+
+import os
+import stat
+import time
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from cadetrdm import ProjectRepo, initialize_repo
+from cadetrdm import cache as cache_module
+from cadetrdm.cache import ResultsCache
+from cadetrdm.cli_integration import cli
+
+
+def record_result(repo, files):
+    with repo.track_results(results_commit_message="Add result") as new_branch:
+        for name, content in files.items():
+            (repo.output_path / name).write_text(content)
+    return new_branch
+
+
+def test_branches_share_identical_files(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+
+    first_branch = record_result(repo, {"shared.csv": "1,2,3\n", "first.csv": "1\n"})
+    second_branch = record_result(repo, {"shared.csv": "1,2,3\n", "second.csv": "2\n"})
+
+    first_cache = repo.cache_folder_for_branch(first_branch)
+    second_cache = repo.cache_folder_for_branch(second_branch)
+
+    assert (first_cache / "shared.csv").stat().st_ino == (second_cache / "shared.csv").stat().st_ino
+    assert (second_cache / "second.csv").read_text() == "2\n"
+    assert (first_cache / "first.csv").stat().st_mode & 0o777 == stat.S_IREAD
+
+    shared_blob = repo.output_repo._git.rev_parse(f"{first_branch}:shared.csv")
+    assert repo.results_cache.object_path(shared_blob).stat().st_nlink >= 3
+
+
+def test_materializing_known_content_does_not_read_from_git(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    branch = record_result(repo, {"result.csv": "1,2,3\n"})
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Blobs were read again although they are in the object store.")
+
+    monkeypatch.setattr(type(repo.results_cache), "_add_objects", fail)
+
+    target_folder = tmp_path / "materialized"
+    target_folder.mkdir()
+    repo.results_cache.materialize(branch, target_folder)
+    assert (target_folder / "result.csv").read_text() == "1,2,3\n"
+
+
+def test_least_recently_used_branches_are_evicted(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+
+    branches = [record_result(repo, {"result.bin": str(index) * 100_000}) for index in range(3)]
+    cache = repo.results_cache
+    for age, branch in zip([100, 300, 200], branches):
+        access_time = time.time() - age
+        os.utime(repo.cache_folder_for_branch(branch), (access_time, access_time))
+
+    assert [branch.name for branch in cache.list_branches()][:3] == [branches[1], branches[2], branches[0]]
+
+    evicted = cache.prune(max_size=cache.size - 50_000)
+    assert evicted == [branches[1]]
+    assert not repo.cache_folder_for_branch(branches[1]).exists()
+    assert repo.cache_folder_for_branch(branches[2]).exists()
+
+    evicted_blob = repo.output_repo._git.rev_parse(f"{branches[1]}:result.bin")
+    assert not cache.object_path(evicted_blob).exists()
+
+    monkeypatch.chdir(path_to_repo)
+    result = CliRunner().invoke(cli, ["data", "cache", "--prune", "--max-size", "1", "--list"])
+    assert result.exit_code == 0, result.output
+    assert "Evicted 3 branches" in result.output
+    assert cache.list_branches() == []
+
+
+def test_shared_objects_stay_read_only_after_pruning(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    first_branch = record_result(repo, {"shared.csv": "1,2,3\n", "first.bin": "1" * 100_000})
+    second_branch = record_result(repo, {"shared.csv": "1,2,3\n"})
+    cache = repo.results_cache
+    access_time = time.time() - 100
+    os.utime(repo.cache_folder_for_branch(first_branch), (access_time, access_time))
+
+    delete_path = cache_module.delete_path
+
+    def delete_path_like_windows(path):
+        # Windows clears the read-only bit of a file, and so of all its links, to remove it.
+        for file_path in [Path(path)] + list(Path(path).rglob("*")):
+            if file_path.is_file():
+                os.chmod(file_path, stat.S_IREAD | stat.S_IWRITE)
+        delete_path(path)
+
+    monkeypatch.setattr(cache_module, "delete_path", delete_path_like_windows)
+    assert cache.prune(max_size=cache.size - 50_000, keep=[second_branch]) == [first_branch]
+
+    shared_blob = repo.output_repo._git.rev_parse(f"{second_branch}:shared.csv")
+    assert cache.object_path(shared_blob).stat().st_mode & 0o777 == stat.S_IREAD
+    assert (repo.cache_folder_for_branch(second_branch) / "shared.csv").read_text() == "1,2,3\n"
+
+
+def test_cache_budget_is_applied_when_caching(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo, cache_max_size="500K")
+
+    branches = [record_result(repo, {"result.bin": str(index) * 300_000}) for index in range(2)]
+
+    assert not repo.cache_folder_for_branch(branches[0]).exists()
+    assert repo.cache_folder_for_branch(branches[1]).exists()
+
+
+def test_main_cache_is_refreshed_incrementally(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    output_repo = repo.output_repo
+    first_branch = record_result(repo, {"result.csv": "1\n"})
+
+    listed_refs = []
+    list_files = ResultsCache.list_files
+
+    def spy_list_files(self, ref):
+        listed_refs.append(ref)
+        return list_files(self, ref)
+
+    monkeypatch.setattr(ResultsCache, "list_files", spy_list_files)
+    second_branch = record_result(repo, {"result.csv": "2\n"})
+
+    main_commit = output_repo.main_commit_hash
+    assert main_commit not in listed_refs
+
+    main_cache = repo.cache_folder_for_branch(output_repo.main_branch)
+    cached_files = sorted(
+        path.relative_to(main_cache).as_posix() for path in main_cache.rglob("*") if path.is_file()
+    )
+    assert cached_files == sorted(output_repo._git.ls_tree("-r", "--name-only", main_commit).splitlines())
+    assert (main_cache / "run_history" / first_branch / "metadata.json").exists()
+    assert (main_cache / "run_history" / second_branch / "metadata.json").exists()
+    assert repo.results_cache.cached_commit(output_repo.main_branch) == main_commit
+
+
+def test_main_cache_is_refreshed_with_read_only_files(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    output_repo = repo.output_repo
+    record_result(repo, {"result.csv": "1\n"})
+
+    remove = os.remove
+
+    def remove_like_windows(path, *args, **kwargs):
+        # Windows refuses to delete files without write permission.
+        if not os.path.islink(path) and not os.stat(path).st_mode & stat.S_IWRITE:
+            raise PermissionError(13, "Access is denied", str(path))
+        remove(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "remove", remove_like_windows)
+    record_result(repo, {"result.csv": "2\n"})
+
+    main_commit = output_repo.main_commit_hash
+    assert repo.results_cache.cached_commit(output_repo.main_branch) == main_commit
+    main_cache = repo.cache_folder_for_branch(output_repo.main_branch)
+    assert (main_cache / "log.tsv").read_bytes() == output_repo.read_blob(main_commit, "log.tsv")
+    for object_path in repo.results_cache.objects_path.rglob("*"):
+        if object_path.is_file():
+            assert not object_path.stat().st_mode & stat.S_IWRITE
+
+
+def test_linking_an_already_linked_file_keeps_it(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    branch = record_result(repo, {"result.csv": "1,2,3\n"})
+    cache = repo.results_cache
+    blob_hash = repo.output_repo._git.rev_parse(f"{branch}:result.csv")
+
+    target_folder = tmp_path / "linked"
+    target_folder.mkdir()
+    cache._link_object(blob_hash, target_folder / "result.csv")
+    cache._link_object(blob_hash, target_folder / "result.csv")
+    assert (target_folder / "result.csv").stat().st_ino == cache.object_path(blob_hash).stat().st_ino
+
+    def link_unsupported(*args, **kwargs):
+        raise OSError("Hardlinks are not supported")
+
+    monkeypatch.setattr(os, "link", link_unsupported)
+    copied_folder = tmp_path / "copied"
+    copied_folder.mkdir()
+    cache._link_object(blob_hash, copied_folder / "result.csv")
+    cache._link_object(blob_hash, copied_folder / "result.csv")
+    assert (copied_folder / "result.csv").read_text() == "1,2,3\n"
+    assert (copied_folder / "result.csv").stat().st_mode & 0o777 == stat.S_IREAD
+    assert [path.name for path in copied_folder.iterdir()] == ["result.csv"]
+
+
+def test_lazy_results_only_copy_accessed_files(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    (repo.output_path / "profiles").mkdir()
+    branch = record_result(repo, {"summary.csv": "1\n", "profiles/a.csv": "2\n", "profiles/b.csv": "3\n"})
+    repo.remove_cached_files()
+
+    results = repo.input_data(branch, lazy=True)
+    cache_folder = repo.cache_folder_for_branch(branch)
+    assert {"profiles/a.csv", "profiles/b.csv", "summary.csv"}.issubset(results.files)
+    assert list(cache_folder.iterdir()) == []
+
+    assert (results / "summary.csv").read_text() == "1\n"
+    assert not (cache_folder / "profiles").exists()
+
+    assert [path.name for path in results.glob("profiles/a*")] == ["a.csv"]
+    assert not (cache_folder / "profiles" / "b.csv").exists()
+
+    try:
+        results / "missing.csv"
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("Accessing a missing file did not raise.")
+
+    # A regular load completes the partial cache directory.
+    assert repo.input_data(branch) == cache_folder
+    assert (cache_folder / "profiles" / "b.csv").read_text() == "3\n"
+    assert not repo.results_cache.is_partial(branch)
+    assert repo.results_cache.cached_commit(branch) == repo.output_repo._git.rev_parse(branch)
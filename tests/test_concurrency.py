@@ -0,0 +1,157 @@
+"""Tests for recording results from several processes into one output repository."""
+
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cadetrdm import ProjectRepo, initialize_repo
+from cadetrdm.io_utils import FileLock
+from cadetrdm.repositories import OutputRepo
+
+
+def test_file_lock_is_exclusive_and_reentrant(tmp_path):
+    lock_path = tmp_path / "output.lock"
+    lock = FileLock(lock_path)
+    other_lock = FileLock(lock_path, timeout=0.2, poll_interval=0.05)
+
+    with lock:
+        with lock:
+            assert lock.is_locked
+        assert lock_path.exists()
+        with pytest.raises(TimeoutError):
+            other_lock.acquire()
+
+    assert not lock.is_locked
+    assert not lock_path.exists()
+    with other_lock:
+        assert other_lock.is_locked
+
+
+def test_file_lock_removes_stale_lock_file(tmp_path):
+    process = multiprocessing.get_context("spawn").Process(target=os.getpid)
+    process.start()
+    process.join()
+
+    lock_path = tmp_path / "output.lock"
+    lock_path.write_text(f"{process.pid}\n{socket.gethostname()}\n")
+
+    with FileLock(lock_path, timeout=1) as lock:
+        assert lock.is_locked
+
+
+def _record_result(path_to_repo, value):
+    repo = ProjectRepo(path_to_repo, use_worktrees=True)
+    with repo.track_results(results_commit_message=f"Add result {value}") as new_branch:
+        (repo.output_path / "result.txt").write_text(f"{value}\n")
+    return new_branch
+
+
+def test_results_are_recorded_concurrently_from_a_process_pool(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        branches = pool.starmap(_record_result, [(path_to_repo, value) for value in range(4)])
+
+    output_repo = ProjectRepo(path_to_repo).output_repo
+    entries = output_repo.output_log.entries
+    for value, branch in enumerate(branches):
+        assert branch in entries
+        assert output_repo._git.show(f"{branch}:result.txt") == str(value)
+    assert not output_repo.lock().path.exists()
+
+
+def test_log_commit_is_retried_when_main_moves(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    output_repo = repo.output_repo
+
+    commit_directory_to_main = output_repo.commit_directory_to_main
+    moved_main = []
+
+    def move_main_before_first_commit(*args, **kwargs):
+        if not moved_main:
+            with output_repo.main_worktree() as main_worktree:
+                (main_worktree.path / "concurrent.txt").write_text("written by someone else\n")
+                main_worktree.add(".")
+                main_worktree._git.commit("-m", "Concurrent commit")
+            moved_main.append(output_repo.main_commit_hash)
+        return commit_directory_to_main(*args, **kwargs)
+
+    monkeypatch.setattr(output_repo, "commit_directory_to_main", move_main_before_first_commit)
+
+    with repo.track_results(results_commit_message="Add result") as new_branch:
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+
+    assert output_repo._git.rev_parse(f"{output_repo.main_branch}~1") == moved_main[0]
+    assert new_branch in output_repo.output_log.entries
+
+
+def test_interrupted_run_releases_the_output_lock(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+
+    with pytest.raises(KeyboardInterrupt):
+        with repo.track_results(results_commit_message="Interrupted"):
+            (repo.output_path / "result.txt").write_text("1\n")
+            raise KeyboardInterrupt
+    assert not repo.output_repo.lock().path.exists()
+
+    monkeypatch.setattr(OutputRepo, "lock_timeout", 5)
+    other_repo = ProjectRepo(path_to_repo)
+    with other_repo.track_results(results_commit_message="Add result", force=True) as new_branch:
+        (other_repo.output_path / "result.txt").write_text("2\n")
+    assert other_repo.output_repo._git.show(f"{new_branch}:result.txt") == "2"
+
+
+def test_output_lock_timeout_names_the_holder(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    monkeypatch.setattr(OutputRepo, "lock_timeout", 0.2)
+
+    with ProjectRepo(path_to_repo).output_repo.lock():
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            waiting = pool.submit(lambda: ProjectRepo(path_to_repo).output_repo.lock().acquire())
+            with pytest.raises(TimeoutError, match=f"another thread of this process \\(pid {os.getpid()}"):
+                waiting.result()
+
+
+def test_output_lock_is_shared_by_repos_of_one_process(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    monkeypatch.setattr(OutputRepo, "lock_timeout", 1)
+    repo = ProjectRepo(path_to_repo)
+    with repo.track_results(results_commit_message="Add result") as first_branch:
+        (repo.output_path / "result.txt").write_text("1\n")
+
+    with repo.track_results(results_commit_message="Add result") as second_branch:
+        # The lock is held by this thread for the whole run without worktrees.
+        previous_results = ProjectRepo(path_to_repo).input_data(first_branch, lazy=True)
+        assert (previous_results / "result.txt").read_text() == "1\n"
+        (repo.output_path / "result.txt").write_text("2\n")
+    assert repo.output_repo._git.show(f"{second_branch}:result.txt") == "2"
+
+
+def test_file_lock_does_not_remove_a_lock_taken_over_by_another_waiter(tmp_path):
+    process = multiprocessing.get_context("spawn").Process(target=os.getpid)
+    process.start()
+    process.join()
+
+    lock_path = tmp_path / "output.lock"
+    lock_path.write_text(f"{os.getpid()}\n{socket.gethostname()}\n")
+
+    class RacingFileLock(FileLock):
+        def _read_owner(self, path=None):
+            if path is None:
+                # Read before another waiter replaced the stale lock file with its own.
+                return process.pid, socket.gethostname()
+            return super()._read_owner(path)
+
+    assert not RacingFileLock(lock_path)._remove_if_stale()
+    assert lock_path.read_text() == f"{os.getpid()}\n{socket.gethostname()}\n"
+    assert [path.name for path in tmp_path.iterdir()] == ["output.lock"]
@@ -0,0 +1,153 @@
+"""Tests for describing the current environment without running conda and pip."""
+
+import json
+import os
+import sys
+
+import yaml
+
+from cadetrdm import Environment
+from cadetrdm.environment_snapshot import EnvironmentSnapshot, take_environment_snapshot
+
+
+def write_conda_record(conda_meta, name, version, build, channel):
+    record = {"name": name, "version": version, "build": build, "channel": channel}
+    (conda_meta / f"{name}-{version}-{build}.json").write_text(json.dumps(record))
+
+
+def test_environment_snapshot_reads_conda_meta(tmp_path, monkeypatch):
+    prefix = tmp_path / "my_env"
+    conda_meta = prefix / "conda-meta"
+    conda_meta.mkdir(parents=True)
+    write_conda_record(conda_meta, "python", "3.11.7", "h1_0", "https://conda.anaconda.org/conda-forge/linux-64")
+    write_conda_record(conda_meta, "numpy", "1.26.4", "py311_0", "https://repo.anaconda.com/pkgs/main/linux-64")
+    (conda_meta / "history").write_text(
+        "==> 2024-01-01 00:00:00 <==\n"
+        "# install specs: [\"python=3.11\", \"conda-forge::numpy\", \"scipy\"]\n"
+        "==> 2024-01-02 00:00:00 <==\n"
+        "# remove specs: [\"scipy\"]\n"
+    )
+    monkeypatch.setattr(sys, "prefix", str(prefix))
+    monkeypatch.setenv("CONDA_PREFIX", str(prefix))
+
+    snapshot = take_environment_snapshot()
+
+    environment = Environment.from_yml_string(snapshot.conda_environment)
+    assert environment.name == "my_env"
+    assert environment.conda_packages["python"] == "3.11.7"
+    assert environment.conda_packages["numpy"] == "1.26.4"
+    assert environment.channels == ["defaults", "conda-forge"]
+    assert "semantic-version" in environment.pip_packages
+
+    history = yaml.safe_load(snapshot.conda_independent_environment)
+    assert history["dependencies"] == ["python=3.11", "conda-forge::numpy"]
+    assert any(line.lower().startswith("gitpython==") for line in snapshot.pip_requirements.splitlines())
+
+    # Unchanged package directories reuse the snapshot, a changed environment does not.
+    assert take_environment_snapshot() is snapshot
+    write_conda_record(conda_meta, "scipy", "1.12.0", "py311_0", "https://repo.anaconda.com/pkgs/main/linux-64")
+    os.utime(conda_meta, ns=(0, os.stat(conda_meta).st_mtime_ns + 1_000_000_000))
+    updated_snapshot = take_environment_snapshot()
+    assert updated_snapshot is not snapshot
+    assert "scipy=1.12.0=py311_0" in updated_snapshot.conda_environment
+
+    snapshot.write(tmp_path)
+    assert (tmp_path / "pip_requirements.txt").read_text() == snapshot.pip_requirements
+    assert (tmp_path / "conda_independent_environment.yml").exists()
+
+
+def test_active_conda_environment_of_a_venv_is_not_recorded(tmp_path, monkeypatch):
+    base_prefix = tmp_path / "base"
+    (base_prefix / "conda-meta").mkdir(parents=True)
+    write_conda_record(base_prefix / "conda-meta", "numpy", "1.26.4", "py311_0", "defaults")
+    venv_prefix = tmp_path / "venv"
+    venv_prefix.mkdir()
+    monkeypatch.setattr(sys, "prefix", str(venv_prefix))
+    monkeypatch.setenv("CONDA_PREFIX", str(base_prefix))
+
+    snapshot = take_environment_snapshot(use_cache=False)
+
+    environment = Environment.from_yml_string(snapshot.conda_environment)
+    assert environment.name == "venv"
+    assert "numpy" not in environment.conda_packages
+    assert "semantic-version" in environment.pip_packages
+    assert snapshot.conda_independent_environment == ""
+
+
+def test_runs_in_the_same_environment_share_environment_files(tmp_path):
+    from cadetrdm import ProjectRepo, initialize_repo
+
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    branches = []
+    for index in range(2):
+        with repo.track_results(results_commit_message="Add result") as branch:
+            (repo.output_path / "result.csv").write_text(f"{index}\n")
+        branches.append(branch)
+
+    output_repo = repo.output_repo
+    entries = output_repo.output_log.entries
+    environment_hash = entries[branches[0]].environment_hash
+    assert environment_hash == take_environment_snapshot().get_hash()
+    assert entries[branches[1]].environment_hash == environment_hash
+
+    main_files = output_repo._git.ls_tree("-r", "--name-only", output_repo.main_branch).splitlines()
+    environment_files = [path for path in main_files if path.startswith("environments/")]
+    assert sorted(environment_files) == sorted(
+        f"environments/{environment_hash}/{file_name}" for file_name in EnvironmentSnapshot.file_names.values()
+    )
+    for branch in branches:
+        assert f"run_history/{branch}/metadata.json" in main_files
+        assert f"run_history/{branch}/pip_requirements.txt" not in main_files
+    assert not (output_repo.path / "environments").exists()
+
+
+def test_current_environment_is_probed_once_per_process(tmp_path, monkeypatch):
+    from cadetrdm import Case, Options, ProjectRepo, initialize_repo
+    from cadetrdm import environment_snapshot
+
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+
+    probes = []
+    installed_distributions = environment_snapshot._installed_distributions
+
+    def count_probes():
+        probes.append(1)
+        return installed_distributions()
+
+    monkeypatch.setattr(environment_snapshot, "_installed_distributions", count_probes)
+    environment_snapshot.invalidate_environment_snapshot()
+
+    requirements = Environment(pip_packages={"GitPython": ">=3.1"})
+    cases = [
+        Case(project_repo=repo, options=Options({"value": value}), environment=requirements)
+        for value in range(20)
+    ]
+    assert all(case.can_run_study for case in cases)
+    assert len(probes) == 1
+
+    environment_snapshot.invalidate_environment_snapshot()
+    assert cases[0].can_run_study
+    assert len(probes) == 2
+
+
+def test_recorded_environment_is_read_from_the_main_branch(tmp_path):
+    from cadetrdm import Case, Options, ProjectRepo, initialize_repo
+
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    options = Options({"value": 1})
+    with repo.track_results(results_commit_message="Add result", options=options) as branch:
+        (repo.output_path / "result.csv").write_text("1\n")
+
+    entry = repo.output_repo.columnar_output_log.entries[branch]
+    assert not entry.environment_path.exists()
+    assert "GitPython" in entry.environment.pip_packages
+
+    for requirement, expected_branch in ((">=3.1", branch), ("<1.0", None)):
+        case = Case(project_repo=repo, options=options, environment=Environment(pip_packages={"GitPython": requirement}))
+        assert case.results_branch == expected_branch
@@ -9,7 +9,7 @@ import pytest
 from cadetrdm import initialize_repo, ProjectRepo, Options
 from cadetrdm.initialize_repo import init_lfs
 from cadetrdm.io_utils import delete_path
-from cadetrdm.repositories import OutputRepo, BaseRepo
+from cadetrdm.repositories import OutputRepo, BaseRepo, GitRepo
 from cadetrdm.web_utils import ssh_url_to_http_url
 from cadetrdm.wrapper import tracks_results
 
@@ -394,6 +394,57 @@ def test_with_detached_head():
     os.chdir("..")
 
 
+def test_ahead_behind(tmp_path):
+    upstream = git.Repo.init(tmp_path / "upstream", initial_branch="main")
+    upstream.git.commit("--allow-empty", "-m", "initial commit")
+    git.Repo.clone_from(tmp_path / "upstream", tmp_path / "local")
+    local_repo = GitRepo(tmp_path / "local")
+
+    assert local_repo.ahead_behind("origin/main") == (0, 0)
+    assert not local_repo.has_changes_upstream
+
+    local_repo._git.commit("--allow-empty", "-m", "local commit")
+    assert local_repo.ahead_behind("origin/main") == (1, 0)
+    assert local_repo.is_ancestor("origin/main")
+    assert not local_repo.has_changes_upstream
+
+    upstream.git.commit("--allow-empty", "-m", "first upstream commit")
+    upstream.git.commit("--allow-empty", "-m", "second upstream commit")
+    assert local_repo.has_changes_upstream
+    assert local_repo.ahead_behind("origin/main") == (1, 2)
+    assert not local_repo.is_ancestor("origin/main")
+    assert not local_repo.is_ancestor("HEAD", "origin/main")
+
+
+def test_object_reads_reuse_cat_file_process(tmp_path, monkeypatch):
+    git_repo = git.Repo.init(tmp_path / "repo", initial_branch="main")
+    (tmp_path / "repo" / "log.tsv").write_text("header\n")
+    git_repo.git.add("log.tsv")
+    git_repo.git.commit("-m", "initial commit")
+    repo = GitRepo(tmp_path / "repo")
+    main_commit = git_repo.head.commit.hexsha
+    repo.resolve("main")
+    repo.read_object("main:log.tsv")
+
+    executed_commands = []
+    execute = git.Git.execute
+
+    def spy_execute(self, command, *args, **kwargs):
+        executed_commands.append(command)
+        return execute(self, command, *args, **kwargs)
+
+    monkeypatch.setattr(git.Git, "execute", spy_execute)
+    for _ in range(10):
+        assert repo.main_commit_hash == main_commit
+        assert repo.read_object("main:log.tsv") == b"header\n"
+    assert repo.resolve("main:missing.tsv") is None
+    assert repo.read_object("missing_branch:log.tsv") is None
+    assert executed_commands == []
+
+    git_repo.git.commit("--allow-empty", "-m", "second commit")
+    assert repo.main_commit_hash == git_repo.head.commit.hexsha
+
+
 # def test_with_external_repos():
 #     path_to_repo = Path("test_repo_external_data")
 #     if path_to_repo.exists():
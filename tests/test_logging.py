@@ -1,10 +1,15 @@
 import io
 import subprocess
+from datetime import datetime
 
+import numpy as np
 import pytest
 
-from cadetrdm import Environment
-from cadetrdm.logging import OutputLog
+from cadetrdm import Environment, ProjectRepo, initialize_repo
+from cadetrdm import environment as environment_module
+from cadetrdm import logging as logging_module
+from cadetrdm.environment import LRUCache
+from cadetrdm.logging import ColumnarOutputLog, LogEntry, OutputLog, OutputLogIndex
 
 
 def test_environment_from_yml():
@@ -153,6 +158,144 @@ def test_environment():
     assert complex_environment.prepare_install_instructions() == install_instructions
 
 
+def test_output_log_index(tmp_path):
+    header = [
+        "output_repo_commit_message", "output_repo_branch", "output_repo_commit_hash",
+        "project_repo_branch", "project_repo_commit_hash", "project_repo_directory_name",
+        "project_repo_remotes", "python_sys_args", "tags", "options_hash",
+    ]
+    rows = [
+        ["first", "branch_a", "c1", "main", "commit_1", "project", "", "", "", "options_1"],
+        ["second", "branch_b", "c2", "main", "commit_1", "project", "", "", "", "options_2"],
+        ["third", "branch_c", "c3", "main", "commit_2", "project", "", "", "", "options_1"],
+        ["fourth", "branch_d", "c4", "main", "commit_1", "project", "", "", "", "options_1"],
+    ]
+    output_log = OutputLog.from_list([header] + rows)
+
+    index = OutputLogIndex.from_output_log(output_log, main_commit_hash="abc")
+    assert len(index) == 4
+    assert index.hashes("branch_c") == ("options_1", "commit_2")
+    assert index.exact_matches("options_1", "commit_1") == ["branch_d", "branch_a"]
+    assert index.exact_matches("options_3", "commit_1") == []
+
+    assert index.candidates("options_1", "commit_1") == ["branch_d", "branch_a"]
+    assert index.candidates(
+        "options_1", "commit_1", allow_commit_hash_mismatch=True
+    ) == ["branch_d", "branch_c", "branch_a"]
+    assert index.candidates(
+        "options_1", "commit_1", allow_options_hash_mismatch=True
+    ) == ["branch_d", "branch_b", "branch_a"]
+    assert index.candidates(
+        "options_1", "commit_1", allow_commit_hash_mismatch=True, allow_options_hash_mismatch=True
+    ) == ["branch_d", "branch_c", "branch_b", "branch_a"]
+
+    index.dump(tmp_path / "index.json")
+    loaded_index = OutputLogIndex.load(tmp_path / "index.json")
+    assert loaded_index.main_commit_hash == "abc"
+    assert loaded_index.candidates("options_1", "commit_1") == ["branch_d", "branch_a"]
+
+    assert OutputLogIndex.load(tmp_path / "missing.json") is None
+
+
+def test_columnar_output_log():
+    header = [
+        "output_repo_commit_message", "output_repo_branch", "output_repo_commit_hash",
+        "project_repo_branch", "project_repo_commit_hash", "project_repo_directory_name",
+        "project_repo_remotes", "python_sys_args", "tags", "options_hash", "extra_column",
+    ]
+    rows = [
+        ["first", "2025-01-01_10-00-00_main_aaaaaaa_000001", "c1", "main", "commit_1", "p", "", "", "", "options_1"],
+        ["second", "sweep_2025-02-01_10-00-00_main_aaaaaaa_000002", "c2", "main", "commit_1", "p", "", "", "",
+         "options_2", "value"],
+        ["third", "2025-03-01_10-00-00_dev_bbbbbbb_000003", "c3", "dev", "commit_2", "p", "", "", "", "options_1"],
+    ]
+    content = "\n".join("\t".join(row) for row in [header] + rows) + "\n"
+    output_log = ColumnarOutputLog.from_string(content)
+
+    assert output_log.n_entries == 3
+    assert output_log.header == header
+    assert list(output_log.column("options_hash")) == ["options_1", "options_2", "options_1"]
+    assert output_log._entry_cache == {}
+
+    assert list(output_log.mask(options_hash="options_1")) == [True, False, True]
+    assert list(output_log.mask(project_repo_commit_hash="commit_1")) == [True, True, False]
+    assert list(output_log.mask(branch_prefix="sweep_")) == [False, True, False]
+    assert list(output_log.mask(since=datetime(2025, 1, 15))) == [False, True, True]
+    assert list(output_log.mask(until="2025-02-01T10:00:00", options_hash="options_1")) == [True, False, False]
+    assert output_log._entry_cache == {}
+
+    subset = output_log.filter(options_hash="options_1", project_repo_commit_hash="commit_2")
+    assert subset.n_entries == 1
+    entry = subset[0]
+    assert entry.output_repo_commit_message == "third"
+    assert entry.extra_column == ""
+    assert subset[0] is entry
+
+    entries = output_log.entries
+    assert len(entries) == 3
+    assert "2025-03-01_10-00-00_dev_bbbbbbb_000003" in entries
+    assert entries["sweep_2025-02-01_10-00-00_main_aaaaaaa_000002"].extra_column == "value"
+    assert list(output_log._entry_cache) == [1]
+
+    index = OutputLogIndex.from_columnar_output_log(output_log)
+    reference_index = OutputLogIndex.from_output_log(OutputLog.from_string(content))
+    assert index._rows == reference_index._rows
+
+    empty_log = ColumnarOutputLog.from_string("")
+    assert empty_log.n_entries == 0
+    assert len(empty_log.entries) == 0
+    assert isinstance(empty_log.mask(options_hash="options_1"), np.ndarray)
+
+
+def make_log_entry(branch, **kwargs):
+    return LogEntry(
+        output_repo_commit_message=f"results of {branch}",
+        output_repo_branch=branch,
+        output_repo_commit_hash="c0ffee",
+        project_repo_branch="main",
+        project_repo_commit_hash="abc1234",
+        project_repo_directory_name="project",
+        project_repo_remotes=["git@example.org:project.git"],
+        python_sys_args="['main.py']",
+        tags="",
+        options_hash="options_1",
+        filepath=None,
+        **kwargs
+    )
+
+
+def test_output_log_append_entry(tmp_path):
+    log_path = tmp_path / "log.tsv"
+
+    OutputLog.append_entry(log_path, make_log_entry("branch_a"))
+    OutputLog.append_entry(log_path, make_log_entry("branch_b"))
+    content_before_append = log_path.read_bytes()
+
+    OutputLog.append_entry(log_path, make_log_entry("branch_c"))
+    assert log_path.read_bytes().startswith(content_before_append)
+
+    # A new column only widens the header, previous rows are kept as they are.
+    OutputLog.append_entry(log_path, make_log_entry("branch_d", environment_hash="env_1"))
+    lines = log_path.read_bytes().split(b"\r\n")
+    assert lines[0].endswith(b"\toptions_hash\tenvironment_hash")
+    assert b"\r\n".join(lines[1:]).startswith(content_before_append.split(b"\r\n", 1)[1])
+
+    output_log = OutputLog(log_path)
+    assert list(output_log.entries) == ["branch_a", "branch_b", "branch_c", "branch_d"]
+    assert output_log.entries["branch_a"].environment_hash == ""
+    assert output_log.entries["branch_d"].environment_hash == "env_1"
+    assert output_log.entries["branch_d"].project_repo_remotes == "['git@example.org:project.git']"
+
+    # The result is identical to rewriting the whole log.
+    output_log.write()
+    rewritten_log = OutputLog(log_path)
+    assert {
+        branch: entry.to_dict() for branch, entry in rewritten_log.entries.items()
+    } == {
+        branch: entry.to_dict() for branch, entry in output_log.entries.items()
+    }
+
+
 @pytest.mark.slow
 def test_update_environment():
     subprocess.run(f'conda env remove -n testing_env_cadet_rdm  -y', shell=True)
@@ -176,3 +319,131 @@ def test_update_environment():
     check = subprocess.run("conda env export -n testing_env_cadet_rdm ", shell=True, capture_output=True)
     current_env = Environment.from_yml_string(check.stdout.decode())
     assert current_env.fulfils_environment(target_env)
+
+
+def test_requirement_specs_are_compiled_once(monkeypatch):
+    installed = Environment(conda_packages={"cadet": "4.4.0"}, pip_packages={"xarray": "2024.2.0"})
+    requirements = Environment(conda_packages={"cadet": ">=4.4.0"}, pip_packages={"xarray": "<=2024.2.0"})
+
+    spec_parses = []
+    simple_spec = environment_module.SimpleSpec
+
+    def count_spec_parses(version):
+        spec_parses.append(version)
+        return simple_spec(version)
+
+    monkeypatch.setattr(environment_module, "SimpleSpec", count_spec_parses)
+    monkeypatch.setattr(environment_module, "_fulfils_environment_cache", environment_module.LRUCache(maxsize=16))
+    environment_module._compile_spec.cache_clear()
+
+    assert installed.fulfils_environment(requirements)
+    assert installed.fulfils_environment(eval(repr(requirements)))
+    installed.pip_packages["xarray"] = "2026.1.0"
+    installed.packages["xarray"] = "2026.1.0"
+    assert not installed.fulfils_environment(requirements)
+    assert len(spec_parses) == 2
+
+
+def test_mismatches_are_reported_on_cached_checks(monkeypatch, capsys):
+    monkeypatch.setattr(environment_module, "_fulfils_environment_cache", environment_module.LRUCache(maxsize=16))
+    installed = Environment(pip_packages={"xarray": "2026.1.0"})
+    requirements = Environment(pip_packages={"xarray": "<=2024.2.0"})
+
+    for _ in range(2):
+        assert not installed.fulfils_environment(requirements)
+        assert "Package xarray: 2026.1.0 does not fulfil requirements: <=2024.2.0" in capsys.readouterr().out
+
+
+def test_environment_hash_is_reused_until_packages_change(monkeypatch):
+    environment = Environment(conda_packages={"cadet": "4.4.0"})
+    environment.get_hash()
+
+    hashes = []
+    monkeypatch.setattr(environment_module, "short_hash", lambda content: hashes.append(content) or "hash")
+    environment.get_hash()
+    assert hashes == []
+    environment.packages["numpy"] = "2.0.0"
+    assert environment.get_hash() == "hash"
+    assert len(hashes) == 1
+
+
+def test_recorded_environments_are_parsed_once_per_blob(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    branches = []
+    for index in range(3):
+        with repo.track_results(results_commit_message="Add result") as branch:
+            (repo.output_path / "result.csv").write_text(f"{index}\n")
+        branches.append(branch)
+
+    parses = []
+    from_yml_string = Environment.from_yml_string.__func__
+
+    def count_parses(cls, yml_string):
+        parses.append(yml_string)
+        return from_yml_string(cls, yml_string)
+
+    monkeypatch.setattr(Environment, "from_yml_string", classmethod(count_parses))
+    monkeypatch.setattr(logging_module, "_recorded_environment_cache", environment_module.LRUCache(maxsize=16))
+    monkeypatch.setattr(logging_module, "_environment_match_cache", environment_module.LRUCache(maxsize=16))
+
+    entries = repo.output_repo.columnar_output_log.entries
+    requirements = Environment(pip_packages={"GitPython": ">=3.1"})
+    assert all(entries[branch].fulfils_environment(requirements) for branch in branches)
+    assert len(parses) == 1
+
+    # Changes to one entry's environment do not leak into the others.
+    entries[branches[0]].environment.packages["GitPython"] = "0.1"
+    assert entries[branches[1]].environment.packages["GitPython"] != "0.1"
+    assert len(parses) == 1
+
+
+def test_environment_from_yml_strips_ansi_codes(tmp_path):
+    environment_file = tmp_path / "conda_environment.yml"
+    environment_file.write_text(
+        "name: \x1b[32mtest\x1b[0m\n"
+        "channels:\n  - conda-forge\n"
+        "dependencies:\n  - cadet=4.4.0=h1_0\n  - pip:\n    - xarray==2024.2.0\n"
+    )
+
+    environment = Environment.from_yml(environment_file)
+    assert environment.name == "test"
+    assert environment.channels == ["conda-forge"]
+    assert environment.packages == {"cadet": "4.4.0", "xarray": "2024.2.0"}
+
+
+def test_lru_cache_drops_least_recently_used_items():
+    cache = LRUCache(maxsize=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache.get("a") == 1
+    cache["c"] = 3
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+def test_columnar_output_log_stores_free_text_without_padding():
+    header = [
+        "output_repo_commit_message", "output_repo_branch", "output_repo_commit_hash",
+        "project_repo_branch", "project_repo_commit_hash", "project_repo_directory_name",
+        "project_repo_remotes", "python_sys_args", "tags", "options_hash",
+    ]
+    rows = [
+        [f"run {index}", f"2025-01-01_10-00-00_main_aaaaaaa_{index:06d}", "c", "main", "commit_1", "p", "", "", "",
+         f"options_{index % 2}"]
+        for index in range(1000)
+    ]
+    rows[0][0] = "long message " * 1000
+    content = "\n".join("\t".join(row) for row in [header] + rows) + "\n"
+    output_log = ColumnarOutputLog.from_string(content)
+
+    messages = output_log.column("output_repo_commit_message")
+    assert messages.dtype == object
+    assert messages.nbytes == 1000 * messages.itemsize
+    assert output_log.column("options_hash").dtype.kind == "U"
+    assert output_log[0].output_repo_commit_message == rows[0][0]
+    assert output_log[1].output_repo_commit_message == "run 1"
+    assert output_log.mask(options_hash="options_1").sum() == 500
+    assert output_log.filter(branch_prefix="2025-01-01").n_entries == 1000
@@ -309,3 +309,61 @@ def test_push_with_uncommitted_changes(tmp_path: Path) -> None:
 
         # If reset --hard was used in the active checkout, this would revert.
         assert local_file.read_text(encoding="utf-8") == "LOCAL UNCOMMITTED CHANGE"
+
+
+def test_parallel_push_to_several_remotes(tmp_path: Path) -> None:
+    """Pushing in parallel reaches every remote of both repositories and skips unchanged branches."""
+    import git as gitpython
+    from cadetrdm import initialize_repo
+
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "output")
+    repo = ProjectRepo(path_to_repo)
+    with repo.track_results(results_commit_message="Add result") as result_branch:
+        (repo.output_path / "result.txt").write_text("1\n", encoding="utf-8")
+
+    for name in ("project_a", "project_b", "output_a", "output_b"):
+        gitpython.Repo.init(tmp_path / f"{name}.git", bare=True)
+    for remote_name in ("a", "b"):
+        repo._git.remote("add", remote_name, str(tmp_path / f"project_{remote_name}.git"))
+        repo.output_repo._git.remote("add", remote_name, str(tmp_path / f"output_{remote_name}.git"))
+
+    results = repo.push(parallel=True)
+    assert sorted((result.repository.name, result.remote) for result in results) == [
+        ("output", "a"), ("output", "b"), ("project", "a"), ("project", "b")
+    ]
+    assert all(result.success for result in results), [str(result) for result in results]
+    for remote_name in ("a", "b"):
+        remote_output = gitpython.Repo(tmp_path / f"output_{remote_name}.git")
+        assert result_branch in [head.name for head in remote_output.heads]
+
+    assert repo.push(parallel=True) == []
+
+    with repo.track_results(results_commit_message="Add result") as second_branch:
+        (repo.output_path / "result.txt").write_text("2\n", encoding="utf-8")
+    results = repo.push(parallel=True)
+    output_results = [result for result in results if result.repository.name == "output"]
+    assert len(output_results) == 2
+    for result in output_results:
+        assert sorted(result.refspecs) == sorted(
+            f"refs/heads/{branch}:refs/heads/{branch}" for branch in ("main", second_branch)
+        )
+
+
+def test_failed_push_does_not_wait_after_the_last_attempt(tmp_path: Path, monkeypatch) -> None:
+    """Failed pushes are retried with a growing delay, but report failure right after the last attempt."""
+    from cadetrdm import initialize_repo
+    from cadetrdm import repositories
+
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "output")
+    repo = ProjectRepo(path_to_repo)
+    repo._git.remote("add", "missing", str(tmp_path / "missing.git"))
+
+    delays = []
+    monkeypatch.setattr(repositories.time, "sleep", delays.append)
+    result = repo._push_refspecs("missing", {"refs/heads/main:refs/heads/main": None}, retries=2)
+
+    assert not result.success
+    assert result.attempts == 3
+    assert delays == [1, 2]
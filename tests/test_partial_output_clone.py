@@ -0,0 +1,113 @@
+"""Tests for cloning only the main branch of an output repository."""
+
+import git
+import pytest
+
+from cadetrdm import ProjectRepo, initialize_repo
+from cadetrdm.repositories import OutputRepo
+
+
+def test_result_branches_are_fetched_on_demand(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    with repo.track_results(results_commit_message="Add result") as result_branch:
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+    repo.output_repo._git.branch("keep/first", repo.output_repo.main_branch)
+    repo.output_repo._git.branch("other/second", repo.output_repo.main_branch)
+
+    for name in ("remote_project.git", "remote_output.git"):
+        git.Repo.init(tmp_path / name, bare=True).git.symbolic_ref("HEAD", "refs/heads/main")
+    repo.output_repo.add_remote(str(tmp_path / "remote_output.git"))
+    repo.add_remote(str(tmp_path / "remote_project.git"))
+    repo.output_repo._git.push("origin", "--all")
+    repo._git.push("origin", "main")
+
+    clone = ProjectRepo.clone(
+        url=str(tmp_path / "remote_project.git"),
+        to_path=tmp_path / "clone",
+        repo_kwargs={"output_ref_prefix": "keep/"},
+    )
+    output_repo = clone.output_repo
+    remote_refs = output_repo._git.for_each_ref("--format=%(refname:short)", "refs/remotes").splitlines()
+    assert "origin/main" in remote_refs
+    assert "origin/keep/first" in remote_refs
+    assert "origin/other/second" not in remote_refs
+    assert f"origin/{result_branch}" not in remote_refs
+
+    cache_folder = clone.copy_data_to_cache(result_branch)
+    assert (cache_folder / "result.csv").read_text() == "1,2,3\n"
+    assert output_repo.resolve(f"refs/remotes/origin/{result_branch}") is not None
+    assert output_repo._git.rev_parse("--is-shallow-repository") == "true"
+
+
+def test_results_branches_are_fetched_in_one_fetch(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    result_branches = []
+    for index in range(3):
+        with repo.track_results(results_commit_message="Add result") as result_branch:
+            (repo.output_path / "result.csv").write_text(f"{index}\n")
+        result_branches.append(result_branch)
+
+    git.Repo.init(tmp_path / "remote_output.git", bare=True).git.symbolic_ref("HEAD", "refs/heads/main")
+    repo.output_repo._git.remote("add", "origin", str(tmp_path / "remote_output.git"))
+    repo.output_repo._git.push("origin", "--all")
+    git.Repo.clone_from(tmp_path / "remote_output.git", tmp_path / "output_clone", multi_options=["--single-branch"])
+    output_repo = OutputRepo(tmp_path / "output_clone")
+
+    fetch_calls = []
+
+    def count_fetch(self, *args, **kwargs):
+        fetch_calls.append(args)
+        return self._call_process("fetch", *args, **kwargs)
+
+    monkeypatch.setattr(git.Git, "fetch", count_fetch, raising=False)
+
+    assert output_repo.fetch_branches(result_branches[:2]) == sorted(result_branches[:2])
+    assert len(fetch_calls) == 1
+    assert output_repo.fetch_branches(result_branches[:2]) == []
+    assert len(fetch_calls) == 1
+
+    assert output_repo.fetch_branches([result_branches[2], "missing_branch"]) == [result_branches[2]]
+    assert output_repo.resolve(f"refs/remotes/origin/{result_branches[2]}") is not None
+
+
+def test_branches_of_full_clones_are_fetched_with_full_history(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+
+    git.Repo.init(tmp_path / "remote_output.git", bare=True).git.symbolic_ref("HEAD", "refs/heads/main")
+    repo.output_repo._git.remote("add", "origin", str(tmp_path / "remote_output.git"))
+    repo.output_repo._git.push("origin", "--all")
+    git.Repo.clone_from(tmp_path / "remote_output.git", tmp_path / "output_clone")
+    output_repo = OutputRepo(tmp_path / "output_clone")
+    assert output_repo.fetches_all_branches
+
+    with repo.track_results(results_commit_message="Add result") as result_branch:
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+    repo.output_repo._git.push("origin", result_branch)
+
+    assert output_repo.fetch_branches([result_branch]) == [result_branch]
+    assert output_repo._git.rev_parse("--is-shallow-repository") == "false"
+
+
+def test_single_branch_is_added_to_custom_clone_options(tmp_path, monkeypatch):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    repo._metadata = repo.load_metadata()
+    repo._metadata["output_remotes"]["output_remotes"] = {"origin": str(tmp_path / "remote_output.git")}
+
+    clone_options = []
+    monkeypatch.setattr(
+        OutputRepo, "clone", staticmethod(lambda url, to_path, multi_options: clone_options.append(multi_options))
+    )
+
+    repo._clone_output_repo(multi_options=["--filter=tree:0"], single_branch=True)
+    assert clone_options == [["--filter=tree:0", "--single-branch"]]
+
+    with pytest.raises(ValueError):
+        repo._clone_output_repo(multi_options=["--no-single-branch"], single_branch=True)
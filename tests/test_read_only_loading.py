@@ -5,11 +5,13 @@ observable git state of both repositories, perform a read, and assert the snapsh
 unchanged.
 """
 
+import stat
 from pathlib import Path
 
 import pytest
+from git import GitCommandError
 
-from cadetrdm import ProjectRepo, initialize_repo
+from cadetrdm import Case, Options, ProjectRepo, initialize_repo
 from cadetrdm.io_utils import delete_path
 
 
@@ -122,3 +124,102 @@ def test_copy_data_to_cache_uses_remote_ref_without_creating_local_branch(repo_w
     assert (cache_path / "result.csv").read_text() == "1,2,3\n"
     assert git_state(output_repo) == state_before
     assert result_branch not in [head.name for head in output_repo._git_repo.heads]
+
+
+def partial_cache_folders(cache_root):
+    """Names of temporary folders left behind by an incomplete caching of a branch."""
+    return [
+        path.name for path in cache_root.iterdir()
+        if path.name.startswith(".") and path.name not in (".objects", ".commits", ".partial")
+    ]
+
+
+def test_copy_data_to_cache_extracts_read_only_files(repo_with_results):
+    result_branch = str(repo_with_results.output_repo.active_branch)
+    cache_folder = repo_with_results.cache_folder_for_branch(result_branch)
+    delete_path(cache_folder)
+
+    cache_path = repo_with_results.copy_data_to_cache(result_branch)
+
+    assert (cache_path / "result.csv").read_text() == "1,2,3\n"
+    assert (cache_path / "result.csv").stat().st_mode & 0o777 == stat.S_IREAD
+    assert partial_cache_folders(cache_path.parent) == []
+
+
+def test_copy_data_to_cache_of_missing_branch_leaves_no_cache(repo_with_results):
+    with pytest.raises(GitCommandError):
+        repo_with_results.copy_data_to_cache("missing_branch")
+
+    cache_folder = repo_with_results.cache_folder_for_branch("missing_branch")
+    assert not cache_folder.exists()
+    assert partial_cache_folders(cache_folder.parent) == []
+
+
+def test_results_lookup_uses_index_of_current_main_commit(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    repo = ProjectRepo(path_to_repo)
+    options = Options({"parameter": 1})
+    with repo.track_results(results_commit_message="Add result", options=options) as result_branch:
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+
+    output_repo = repo.output_repo
+    case = Case(project_repo=repo, options=options)
+
+    assert case.results_branch == result_branch
+    assert output_repo.output_log_index_path.exists()
+    assert output_repo.output_log_index.main_commit_hash == output_repo.main_commit_hash
+
+    # A fresh instance reuses the persisted index instead of re-reading log.tsv.
+    fresh_case = Case(project_repo=ProjectRepo(path_to_repo), options=options)
+    assert fresh_case.results_branch == result_branch
+    assert not Case(project_repo=repo, options=Options({"parameter": 2})).has_results_for_this_run
+
+    # Recording another run moves main, which invalidates the stored index.
+    with repo.track_results(results_commit_message="Add second result", options=options) as second_branch:
+        (repo.output_path / "result.csv").write_text("4,5,6\n")
+
+    assert case.results_branch == second_branch
+
+
+def test_output_log_is_parsed_once_per_log_revision(repo_with_results):
+    output_repo = repo_with_results.output_repo
+
+    output_log = output_repo.output_log
+    assert output_repo.output_log is output_log
+    assert output_repo.options_to_commit_map is output_repo.options_to_commit_map
+    assert output_repo.project_repo_branches == {repo_with_results.active_branch.name}
+
+    with repo_with_results.track_results(results_commit_message="Add second result") as new_branch:
+        (repo_with_results.output_path / "result.csv").write_text("4,5,6\n")
+
+    updated_log = output_repo.output_log
+    assert updated_log is not output_log
+    assert new_branch in updated_log.entries
+    assert output_repo.output_log is updated_log
+
+
+def test_recording_a_run_does_not_check_out_main(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+    output_repo = repo.output_repo
+
+    with repo.track_results(results_commit_message="Add result") as new_branch:
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+        reflog_before = output_repo._git.reflog("HEAD").splitlines()
+
+    reflog_after = output_repo._git.reflog("HEAD").splitlines()
+    assert not any("checkout:" in line for line in reflog_after[: len(reflog_after) - len(reflog_before)])
+
+    state_after = git_state(output_repo)
+    assert state_after["branch"] == new_branch
+    assert not state_after["is_dirty"]
+    assert not (output_repo.path / "log.tsv").exists()
+
+    main_files = output_repo._git.ls_tree("-r", "--name-only", output_repo.main_branch).splitlines()
+    assert "log.tsv" in main_files
+    assert f"run_history/{new_branch}/metadata.json" in main_files
+    assert f"run_history/{new_branch}/code.tar" in main_files
+    assert new_branch in output_repo.output_log.entries
@@ -0,0 +1,44 @@
+"""Tests for reading results straight from the git objects of an output branch."""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from cadetrdm import ProjectRepo, initialize_repo
+
+
+def test_results_view_reads_without_extracting(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+    repo = ProjectRepo(path_to_repo)
+
+    lfs_content = b"\x00binary result\x00"
+    oid = hashlib.sha256(lfs_content).hexdigest()
+    pointer = f"version https://git-lfs.github.com/spec/v1\noid sha256:{oid}\nsize {len(lfs_content)}\n"
+
+    with repo.track_results(results_commit_message="Add result") as branch:
+        (repo.output_path / "profiles").mkdir()
+        (repo.output_path / "profiles" / "a.csv").write_text("1,2\n")
+        (repo.output_path / "profiles" / "b.csv").write_text("3,4\n")
+        (repo.output_path / "result.h5").write_text(pointer)
+    repo.remove_cached_files()
+
+    view = repo.results_view(branch)
+    assert (view / "profiles" / "a.csv").read_text() == "1,2\n"
+    with (view / "profiles" / "b.csv").open() as handle:
+        assert handle.read() == "3,4\n"
+    assert sorted(child.name for child in (view / "profiles").iterdir()) == ["a.csv", "b.csv"]
+    assert sorted(path.as_posix() for path in view.glob("**/*.csv")) == ["profiles/a.csv", "profiles/b.csv"]
+    assert not (view / "missing.csv").exists()
+    with pytest.raises(FileNotFoundError):
+        (view / "missing.csv").read_bytes()
+
+    with pytest.raises(FileNotFoundError):
+        (view / "result.h5").read_bytes()
+    lfs_object = Path(repo.output_repo._git_repo.common_dir) / "lfs" / "objects" / oid[0:2] / oid[2:4] / oid
+    lfs_object.parent.mkdir(parents=True)
+    lfs_object.write_bytes(lfs_content)
+    assert (view / "result.h5").read_bytes() == lfs_content
+
+    assert not repo.cache_folder_for_branch(branch).exists()
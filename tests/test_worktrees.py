@@ -0,0 +1,136 @@
+"""Tests for tracking results in separate worktrees of the output repository."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cadetrdm import ProjectRepo, initialize_repo
+from cadetrdm.repositories import worktree_mode
+
+
+def test_track_results_in_worktree_leaves_output_repo_untouched(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    repo = ProjectRepo(path_to_repo, use_worktrees=True)
+    output_repo = repo.output_repo
+    branch_before = str(output_repo.active_branch)
+    scratch_file = output_repo.path / "uncommitted.txt"
+    scratch_file.write_text("work in progress\n")
+
+    with repo.track_results(results_commit_message="Add result") as new_branch:
+        assert repo.output_path != output_repo.path.absolute()
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+        assert not (repo.output_path / "log.tsv").exists()
+
+    assert str(output_repo.active_branch) == branch_before
+    assert scratch_file.read_text() == "work in progress\n"
+    assert not (output_repo.path / "result.csv").exists()
+
+    assert new_branch in output_repo.output_log.entries
+    assert output_repo._git.show(f"{new_branch}:result.csv") == "1,2,3"
+    assert output_repo._git.ls_tree("--name-only", new_branch, "log.tsv") == ""
+    assert output_repo._git.ls_tree(
+        "-r", "--name-only", output_repo.main_branch, f"run_history/{new_branch}/metadata.json"
+    ) != ""
+
+    worktrees = output_repo._git.worktree("list", "--porcelain")
+    assert worktrees.count("worktree ") == 1
+    assert (repo.cache_folder_for_branch(new_branch) / "result.csv").exists()
+
+
+def test_failed_run_in_worktree_leaves_output_repo_untouched(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    repo = ProjectRepo(path_to_repo, use_worktrees=True)
+    output_repo = repo.output_repo
+    with pytest.raises(ValueError):
+        with repo.track_results(results_commit_message="Add result"):
+            (repo.output_path / "result.csv").write_text("1,2,3\n")
+            raise ValueError("Failed run")
+
+    assert output_repo._git.status("--porcelain") == ""
+    assert not (output_repo.path / "error.stack").exists()
+    assert output_repo._git.worktree("list", "--porcelain").count("worktree ") == 1
+
+    kept_error_stacks = list(output_repo.worktrees_path.glob("*.error.stack"))
+    assert len(kept_error_stacks) == 1
+    assert "Failed run" in kept_error_stacks[0].read_text()
+
+
+def test_worktrees_are_placed_next_to_the_output_directory(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    repo = ProjectRepo(path_to_repo, use_worktrees=True)
+    output_repo = repo.output_repo
+    assert output_repo.worktrees_path == (path_to_repo / "results_worktrees").absolute()
+
+    with repo.track_results(results_commit_message="Add result"):
+        assert repo.output_path.parent == output_repo.worktrees_path
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+        assert repo._git.status("--porcelain") == ""
+
+    assert repo._git.status("--porcelain") == ""
+
+
+def test_main_worktree_keeps_the_repository_configuration(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    repo = ProjectRepo(path_to_repo, use_worktrees=True)
+    with repo.track_results(results_commit_message="Add result") as new_branch:
+        (repo.output_path / "result.csv").write_text("1,2,3\n")
+
+    output_repo = repo.output_repo
+    config_before = output_repo._git.config("--list", "--local")
+    with output_repo.main_worktree() as main_worktree:
+        assert (main_worktree.path / "README.md").exists()
+        assert not (main_worktree.path / "run_history").exists()
+        (main_worktree.path / "notes.txt").write_text("notes\n")
+        main_worktree.add(".")
+        main_worktree._git.commit("-m", "Add notes")
+
+    assert output_repo._git.config("--list", "--local") == config_before
+    assert output_repo._git.show(f"{output_repo.main_branch}:notes.txt") == "notes"
+    assert output_repo._git.ls_tree(
+        "-r", "--name-only", output_repo.main_branch, f"run_history/{new_branch}/metadata.json"
+    ) != ""
+
+
+def test_main_branch_is_only_updated_when_remote_urls_change(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    repo = ProjectRepo(path_to_repo, use_worktrees=True)
+    repo._git.remote("add", "origin", "https://example.com/project.git")
+    output_repo = repo.output_repo
+
+    main_worktree = output_repo.main_worktree
+    main_worktree_calls = []
+
+    def count_main_worktree(*args, **kwargs):
+        main_worktree_calls.append(args)
+        return main_worktree(*args, **kwargs)
+
+    output_repo.main_worktree = count_main_worktree
+
+    for _ in range(2):
+        with repo.track_results(results_commit_message="Add result", force=True):
+            (repo.output_path / "result.csv").write_text("1,2,3\n")
+
+    assert len(main_worktree_calls) == 1
+    readme = output_repo._git.show(f"{output_repo.main_branch}:README.md")
+    assert "[Link to Project Repository](https://example.com/project.git)" in readme
+
+
+def test_worktree_mode_only_applies_to_the_current_thread(tmp_path):
+    path_to_repo = tmp_path / "project"
+    initialize_repo(path_to_repo, "results")
+
+    with worktree_mode(True):
+        assert ProjectRepo(path_to_repo)._use_worktrees
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            assert not pool.submit(lambda: ProjectRepo(path_to_repo)._use_worktrees).result()
+    assert not ProjectRepo(path_to_repo)._use_worktrees